@@ -1,24 +1,31 @@
 import os
 import asyncio
 import time
-import threading
 import speech_recognition as sr
-import inspect
-import json
 import logging
 import discord
 import datetime
+import functools
 from discord.ext import commands
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import traceback
-from google.cloud import firestore
-from pydub import AudioSegment
-from typing import List, Tuple
 
 from ylb import config
 from ylb import utils
 from ylb.utils import TextColor
-from ylb.helpers.audio import has_speech
+from ylb.storage import create_storage
+from ylb.cache import MemberCache, ChannelIndex, MessageCache
+from ylb.ratelimit import ModerationScheduler
+from ylb.streaming import send_message, send_reply, stream_chat_completion
+from ylb.cortex.conversation import ConversationStore
+from ylb.batching import MentionBatcher, BATCH_REPLY_PROMPT, format_batch, parse_batch_replies
+from ylb.runs import TurnQueue
+from ylb.wake import create_wake_detector
+from ylb.capture import BoundedWaveSink, CaptureQueue, prepare_for_transcription
+from ylb.session import VoiceSession, VoiceSessionRegistry, active_session
+from ylb.supervisor import TaskSupervisor
+from ylb.engine import ConversationEngine
+from ylb.tokens import TokenAccountant
+from ylb.transcription import create_transcriber
 from ylb.helpers.rswiki import (
     search_osrs_wiki,
     search_osrs_item_value,
@@ -33,6 +40,7 @@ from ylb.helpers.openai import (
 )
 
 from ylb import openai_client as client
+from ylb import async_openai_client as async_client
 
 # General program information
 name = "Your Local Bartender"
@@ -49,9 +57,6 @@ COMMANDS_JOIN = "!join"
 
 r = sr.Recognizer()
 
-# Initialize Firestore
-db = firestore.Client()
-
 class Bartender(commands.Bot):
     """
     Discord bot acting as an AI-powered assistant in voice channels.
@@ -60,9 +65,7 @@ class Bartender(commands.Bot):
     def __init__(self, command_prefix, intents, extra_tools=None):
         super().__init__(command_prefix=command_prefix, intents=intents)
         self._queue = []
-        self._is_recording = False
         self._is_speaking = False
-        self._voice_client = None
         self._tools = [
             self.get_guild_online_users,
             self.get_guild_bot_display_name,
@@ -80,6 +83,9 @@ class Bartender(commands.Bot):
             self.move_user_to_voice_channel,
             self.mute_user,
             self.unmute_user,
+            self.bulk_mute_users,
+            self.bulk_move_users_to_voice_channel,
+            self.bulk_update_user_roles,
             self.get_user_voice_state,
             self.get_guild_users,
             self.create_text_channel,
@@ -132,23 +138,35 @@ class Bartender(commands.Bot):
             logging.error(f"Failed to initialize assistant: {str(e)}{traceback.format_exc()}")
             exit(1)
 
-        self.listen_task = None
         self.assistant_thread = None
         self.assistant = client.beta.assistants.retrieve(config.OPENAI_ASSISTANT_ID)
-        self.current_thread = None
-        self.session_doc_ref = None
-        self.transcript_buffer = []
-        self._speak_lock = asyncio.Lock()
-
-    def task_exception_handler(self, task):
-        try:
-            task.result()
-        except Exception as e:
-            logging.error(f"Task raised an exception: {e}")
+        self.tokens = TokenAccountant()
+        self.engine = ConversationEngine(
+            self._tools,
+            self.assistant.id,
+            owner=self,
+            on_record=self.store_session_record,
+            on_usage=self.account_run_usage,
+        )
+        self.storage = create_storage()
+        self.supervisor = TaskSupervisor()
+        self.voice_sessions = VoiceSessionRegistry(on_close=self.discard_session_tokens)
+        self._synced_guilds = set()
+        self.member_cache = MemberCache()
+        self.channel_index = ChannelIndex()
+        self.message_cache = MessageCache()
+        self.moderation = ModerationScheduler()
+        self.conversations = ConversationStore()
+        self.mention_batcher = MentionBatcher(self.handle_mentions)
+        self.transcriber = create_transcriber()
+        self.wake_detector = None
+        if config.CONTINUOUS_LISTEN_TRANSCRIPTION == "wake":
+            self.wake_detector = create_wake_detector(lambda wav: self.transcribe_wav("wake probe", wav))
 
     async def close(self):
-        if self._voice_client and self._voice_client.is_connected():
-            await self._voice_client.disconnect()
+        logging.info(f"Supervised task health at shutdown: {self.supervisor.health()}")
+        await self.voice_sessions.close()
+        await self.supervisor.close()
         await super().close()
         
     async def on_ready(self):
@@ -160,19 +178,97 @@ class Bartender(commands.Bot):
                 f" - {TextColor.OKGREEN}{guild.name}{TextColor.ENDC} "
                 f"(ID: {guild.id}) | Members: {guild.member_count}"
             )
-            await self.store_guild_info(guild)
+            self.member_cache.load_guild(guild)
+            self.channel_index.load_guild(guild)
+
+        # on_ready fires again after reconnects; guilds that were already synced
+        # are kept up to date by the member join/leave handlers
+        await asyncio.gather(
+            *[
+                self.store_guild_info(guild)
+                for guild in self.guilds
+                if guild.id not in self._synced_guilds
+            ]
+        )
+
+    async def on_guild_join(self, guild):
+        """Event handler that runs when the bot is added to a guild."""
+        self.member_cache.load_guild(guild)
+        self.channel_index.load_guild(guild)
+        await self.store_guild_info(guild)
+
+    async def on_guild_remove(self, guild):
+        """Event handler that runs when the bot is removed from a guild."""
+        self.member_cache.drop_guild(guild.id)
+        self.channel_index.drop_guild(guild.id)
+        self._synced_guilds.discard(guild.id)
+
+    async def on_guild_channel_create(self, channel):
+        """Event handler that indexes newly created channels."""
+        self.channel_index.add(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        """Event handler that refreshes indexed channels."""
+        self.channel_index.add(after)
+
+    async def on_guild_channel_delete(self, channel):
+        """Event handler that removes deleted channels from the index."""
+        self.channel_index.remove(channel.id)
+
+    async def on_raw_message_delete(self, payload):
+        """Event handler that evicts deleted messages from the message cache."""
+        self.message_cache.remove(payload.message_id)
+
+    async def on_member_join(self, member):
+        """Event handler that records a member joining a guild."""
+        self.member_cache.update(member)
+        if member.guild.id in self._synced_guilds:
+            await asyncio.to_thread(
+                self.storage.add_guild_members, member.guild.id, [member.id]
+            )
+
+    async def on_member_remove(self, member):
+        """Event handler that records a member leaving a guild."""
+        self.member_cache.remove(member.guild.id, member.id)
+        if member.guild.id in self._synced_guilds:
+            await asyncio.to_thread(
+                self.storage.remove_guild_members, member.guild.id, [member.id]
+            )
+
+    async def on_member_update(self, before, after):
+        """Event handler that refreshes a member's cached names."""
+        self.member_cache.update(after)
+
+    async def on_user_update(self, before, after):
+        """Event handler that refreshes cached names after a username change."""
+        for guild in after.mutual_guilds:
+            member = guild.get_member(after.id)
+            if member:
+                self.member_cache.update(member)
+
+    async def on_presence_update(self, before, after):
+        """Event handler that refreshes a member's cached status."""
+        self.member_cache.update(after)
+
+    async def on_voice_state_update(self, member, before, after):
+        """Event handler that caches members as they join or move between voice channels."""
+        self.member_cache.update(member)
 
     async def store_guild_info(self, guild):
-        """Stores guild information in Firestore."""
-        users = [member.id for member in guild.members]
-        doc_ref = db.collection("instances").document(str(guild.id))
-        doc_ref.set(
-            {
-                "guild_id": str(guild.id),
-                "server_name": guild.name,
-                "users": users,
-            }
-        )
+        """Stores a full guild snapshot in the configured storage backend."""
+        try:
+            await asyncio.to_thread(
+                self.storage.store_guild_info,
+                guild.id,
+                {
+                    "guild_id": str(guild.id),
+                    "server_name": guild.name,
+                },
+                [member.id for member in guild.members],
+            )
+            self._synced_guilds.add(guild.id)
+        except Exception as e:
+            logging.error(f"Failed to store guild info for {guild.id}: {e}")
 
     async def on_message(self, message):
         """
@@ -181,46 +277,16 @@ class Bartender(commands.Bot):
         Args:
             message (discord.Message): The incoming message.
         """
+        self.message_cache.add(message)
+
         if config.CONTINUOUS_LISTEN_ACTIVATION_PHRASE in message.content.lower():
             if message.author == self.user:
                 return
             if message.author.bot:
                 return
 
-            try:
-                if self._voice_client and self._voice_client.is_connected():
-                    logging.info(f"Adding text message to current thread: \"{message.content}\"")
-                    # Add the message to the current thread
-                    client.beta.threads.messages.create(
-                        thread_id=self.current_thread.id, role="user", content=message.content
-                    )
-                else:
-                    # Perform a one-time chat completion
-                    completion = client.chat.completions.create(
-                        model=config.OPENAI_MODEL,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": config.SYSTEM_PROMPT.format(name=config.OPENAI_ASSISTANT_NAME),
-                            },
-                            {
-                                "role": "user",
-                                "content": message.content,
-                            },
-                        ],
-                        temperature=config.OPENAI_MODEL_TEMPERATURE,
-                    )
-
-                    # Extract the assistant's response
-                    response = completion.choices[0].message.content
-
-                    # Send the response back to the channel
-                    await message.reply(response)
-
-            except Exception as e:
-                # Handle any errors during the API call
-                logging.error(f"Error generating chat completion: {e}")
-                await message.reply("Sorry, I couldn't generate a response due to an error.")
+            # Near-simultaneous mentions in a channel are answered together
+            self.mention_batcher.submit(message)
 
         elif message.content.startswith(COMMANDS_JOIN):
             logging.info(f"Received join command from {message.author.display_name}")
@@ -230,8 +296,112 @@ class Bartender(commands.Bot):
                 logging.error(
                     f"Error while listening in voice channel: {e}{traceback.format_exc()}"
                 )
-                if self._voice_client:
-                    await self._voice_client.disconnect()
+                await self.voice_sessions.remove(message.guild.id)
+
+    async def handle_mentions(self, messages):
+        """
+        Answers a batch of messages from one channel that mentioned the activation phrase.
+
+        Args:
+            messages (list): The batched Discord messages, oldest first.
+        """
+        session = self.voice_sessions.get(messages[0].guild.id) if messages[0].guild else None
+        try:
+            if session and session.connected and session.turn_queue:
+                content = "\n".join(
+                    f"{message.author.display_name} (id: {message.author.id}): {message.content}"
+                    for message in messages
+                )
+                logging.info(f"Adding text message to the voice session thread: \"{content}\"")
+                # Queue the messages for the session's thread without starting a run. Not awaited:
+                # they wait for the active run to finish, which must not hold up the mention batcher
+                session.turn_queue.submit(content, run=False, discord_user_id=messages[-1].author.id)
+            elif len(messages) == 1:
+                await self.reply_to_message(messages[0])
+            else:
+                await self.reply_to_messages(messages)
+        except Exception as e:
+            # Handle any errors during the API call
+            logging.error(f"Error generating chat completion: {e}")
+            for message in messages:
+                await message.reply("Sorry, I couldn't generate a response due to an error.")
+
+    async def reply_to_message(self, message):
+        """
+        Answers a single message with a chat completion using the channel's conversation memory.
+
+        Args:
+            message (discord.Message): The message to answer.
+        """
+        content = f"{message.author.display_name}: {message.content}"
+        messages = self.conversations.build_messages(
+            message.channel.id,
+            config.SYSTEM_PROMPT.format(name=config.OPENAI_ASSISTANT_NAME),
+            content,
+        )
+
+        if config.DISCORD_STREAM_REPLIES:
+            # Stream the response into a progressively edited reply
+            response = await stream_chat_completion(
+                async_client,
+                message,
+                messages,
+                model=config.OPENAI_MODEL,
+                temperature=config.OPENAI_MODEL_TEMPERATURE,
+            )
+            if response is None:
+                # The reply already shows the error notice
+                return
+        else:
+            completion = client.chat.completions.create(
+                model=config.OPENAI_MODEL,
+                messages=messages,
+                temperature=config.OPENAI_MODEL_TEMPERATURE,
+            )
+
+            # Extract the assistant's response
+            response = completion.choices[0].message.content
+
+            # Send the response back to the channel
+            await send_reply(message, response)
+
+        await self.conversations.add_exchange(
+            message.channel.id, content, response, client=async_client
+        )
+
+    async def reply_to_messages(self, messages):
+        """
+        Answers several messages from one channel with a single chat completion,
+        replying to each message with its part of the answer.
+
+        Args:
+            messages (list): The messages to answer, oldest first.
+        """
+        channel_id = messages[0].channel.id
+        content = format_batch(messages)
+        completion = await async_client.chat.completions.create(
+            model=config.OPENAI_MODEL,
+            messages=self.conversations.build_messages(
+                channel_id,
+                config.SYSTEM_PROMPT.format(name=config.OPENAI_ASSISTANT_NAME)
+                + "\n\n"
+                + BATCH_REPLY_PROMPT,
+                content,
+            ),
+            temperature=config.OPENAI_MODEL_TEMPERATURE,
+            response_format={"type": "json_object"},
+        )
+
+        replies = parse_batch_replies(completion.choices[0].message.content, messages)
+        for message, reply in replies:
+            await send_reply(message, reply)
+
+        await self.conversations.add_exchange(
+            channel_id,
+            content,
+            "\n".join(f"[reply to {message.id}] {reply}" for message, reply in replies),
+            client=async_client,
+        )
 
     async def join(self, message):
         """
@@ -245,83 +415,158 @@ class Bartender(commands.Bot):
             await message.reply("You are not in a voice channel.")
             return
 
-        # Connect to the user's voice channel
+        # Connect to the user's voice channel, replacing any session already running in this guild
         channel = message.author.voice.channel
-        if self._voice_client and self._voice_client.is_connected():
-            await self._voice_client.move_to(channel)
+        previous = self.voice_sessions.get(message.guild.id)
+        if previous and previous.connected:
+            await self.voice_sessions.remove(message.guild.id, disconnect=False)
+            voice_client = previous.voice_client
+            await voice_client.move_to(channel)
         else:
-            self._voice_client = await channel.connect()
+            voice_client = await channel.connect()
+
+        await self.start_session(channel, voice_client, message.channel, message.author.display_name, message.id)
+        await message.add_reaction("✅")
+
+    async def start_session(self, channel, voice_client, text_channel, started_by, message_id=None):
+        """
+        Starts a voice conversation session on a connected voice client.
+
+        Creates the session's assistant thread, turn and capture queues and
+        session record, registers the session and starts its continuous
+        listening loop.
+
+        Args:
+            channel (discord.VoiceChannel): The voice channel the session listens to.
+            voice_client (discord.VoiceClient): The voice client connected to ``channel``.
+            text_channel (discord.abc.Messageable): Where the session posts replies and notices.
+            started_by (str): Display name of whoever started the conversation.
+            message_id (int, optional): ID of the message that started the session.
+
+        Returns:
+            VoiceSession: The started session.
+        """
+        # A previous session whose connection dropped still holds its queues and tasks
+        if self.voice_sessions.get(channel.guild.id) is not None:
+            await self.voice_sessions.remove(channel.guild.id, disconnect=False)
+
+        session = VoiceSession(channel.guild.id, voice_client, text_channel)
 
         # Create a new thread for the assistant
-        self.current_thread = client.beta.threads.create()
+        session.thread = await asyncio.to_thread(client.beta.threads.create)
+        session.turn_queue = TurnQueue(
+            session.thread.id,
+            functools.partial(self.post_turn_message, session),
+            functools.partial(self.run_assistant, session),
+        )
+        session.capture_queue = CaptureQueue(functools.partial(self.process_windows, session))
+        session.capture_queue.start()
 
         # Prepare the assistant's pre-prompt for the conversation
         start_prompt = (
-            f"You are now participating in a voice conversation in the Discord server '{message.guild.name}' (id: {message.guild.id}) "
-            f"and voice channel '{channel.name}' (id: {channel.id}). The conversation was started by '{message.author.display_name}'. You will receive messages in chunks. Messages are stored by the program until your name ({config.OPENAI_ASSISTANT_NAME}) is mentioned. All messages stored up to that point are then sent to you for processing. You should consider the messages in the order received. Each message includes a timestamp, the name and id of the speaker, and the message content. Respond with the speak tool."
+            f"You are now participating in a voice conversation in the Discord server '{channel.guild.name}' (id: {channel.guild.id}) "
+            f"and voice channel '{channel.name}' (id: {channel.id}). The conversation was started by '{started_by}'. You will receive messages in chunks. Messages are stored by the program until your name ({config.OPENAI_ASSISTANT_NAME}) is mentioned. All messages stored up to that point are then sent to you for processing. You should consider the messages in the order received. Each message includes a timestamp, the name and id of the speaker, and the message content. Respond with the speak tool."
         )
 
         # Start the conversation thread with the assistant
-        client.beta.threads.messages.create(
-            thread_id=self.current_thread.id, role="user", content=start_prompt
-        )
+        await self.engine.add_message(session.thread.id, start_prompt)
 
-        # Create a new Firestore document for the session
-        self.session_doc_ref = db.collection("sessions").document()
-        self.session_doc_ref.set(
+        # Create a new session record
+        session.session_id = await asyncio.to_thread(
+            self.storage.create_session,
             {
-                "id": self.session_doc_ref.id,
                 "openai_assistant_id": config.OPENAI_ASSISTANT_ID,
-                "discord_guild_id": message.guild.id,
-                "discord_message_id": message.id,
-                "openai_thread_id": self.current_thread.id,
-                "created_at": firestore.SERVER_TIMESTAMP,
-                "updated_at": firestore.SERVER_TIMESTAMP,
+                "discord_guild_id": channel.guild.id,
+                "discord_message_id": message_id,
+                "openai_thread_id": session.thread.id,
                 "instruction_prompt": config.INSTRUCTION_PROMPT,
                 "start_prompt": start_prompt,
                 "temperature": config.OPENAI_MODEL_TEMPERATURE,
-            }
+            },
         )
 
-        # Start the continuous recording loop
-        self.listen_task = asyncio.create_task(self.continuous_listen(message.channel))
-        self.listen_task.add_done_callback(self.task_exception_handler)
+        # Start the session's continuous recording loop
+        self.voice_sessions.add(session)
+        session.listen_task = self.supervisor.start(
+            f"continuous_listen:{session.guild_id}",
+            functools.partial(self.continuous_listen, session),
+            on_failure=functools.partial(self.end_failed_session, session),
+        )
 
-        await message.add_reaction("✅")
+        return session
 
-    async def continuous_listen(self, text_channel):
+    async def end_failed_session(self, session, error):
+        """
+        Ends a voice session whose listening loop kept crashing and tells its text channel.
+
+        Without this the bot would stay in the voice channel without hearing anyone.
+
+        Args:
+            session (VoiceSession): The session whose listening loop was given up on.
+            error (str): The loop's latest error.
+        """
+        logging.error(f"Ending voice session in guild {session.guild_id}, task health: {self.supervisor.health()}")
+        if self.voice_sessions.get(session.guild_id) is session:
+            await self.voice_sessions.remove(session.guild_id)
+        if session.text_channel is not None:
+            try:
+                await session.text_channel.send(
+                    f"⚠️ I stopped listening after repeated errors ({error}) and left the voice channel. "
+                    f"Use `{COMMANDS_JOIN}` to start again."
+                )
+            except discord.HTTPException as e:
+                logging.error(f"Failed to send session failure notice: {e}")
+
+    async def continuous_listen(self, session):
         """
         Continuously records audio in intervals, processes it, and manages assistant responses.
 
+        Runs under the task supervisor: an error stops the current recording
+        and propagates, and the supervisor restarts the loop with backoff.
+
         Args:
-            text_channel (discord.TextChannel): Discord text channel to send messages.
+            session (VoiceSession): The voice session to record.
         """
         while True:
             try:
-                if not self._voice_client.is_connected():
+                if not session.connected:
                     logging.warning(
-                        "Voice client is not connected, exiting continuous_listen"
+                        f"Voice client is not connected, exiting continuous_listen in guild {session.guild_id}"
                     )
+                    if self.voice_sessions.get(session.guild_id) is session:
+                        await self.voice_sessions.remove(session.guild_id)
                     break
 
-                if not self._is_recording:
-                    self._voice_client.start_recording(
-                        discord.sinks.WaveSink(), self.once_done, text_channel
+                if not session.is_recording:
+                    # Under the block policy, capture pauses while processing catches up
+                    await session.capture_queue.wait_for_space()
+                    sink = BoundedWaveSink(
+                        session.buffer_pool,
+                        on_flush=lambda user_id, wav: asyncio.run_coroutine_threadsafe(
+                            session.capture_queue.put({user_id: wav}, partial=True), self.loop
+                        ),
                     )
-                    self._is_recording = True
+                    session.voice_client.start_recording(sink, self.once_done, session)
+                    session.is_recording = True
 
                 await asyncio.sleep(config.CONTINUOUS_LISTEN_RECORDING_DURATION)
 
-                if self._is_recording:
-                    self._voice_client.stop_recording()
-                    self._is_recording = False
+                if session.is_recording:
+                    session.voice_client.stop_recording()
+                    session.is_recording = False
 
                 await asyncio.sleep(config.CONTINUOUS_LISTEN_PAUSE_DURATION)
 
-            except Exception as e:
-                logging.error(f"Error in continuous_listen: {str(e)}")
+            except Exception:
+                if session.is_recording and session.connected:
+                    try:
+                        session.voice_client.stop_recording()
+                    except Exception as e:
+                        logging.error(f"Failed to stop recording in guild {session.guild_id}: {e}")
+                session.is_recording = False
+                raise
 
-    async def once_done(self, sink: discord.sinks, channel: discord.TextChannel):
+    async def once_done(self, sink: discord.sinks, session: VoiceSession):
         """
         Processes recorded audio data after a recording session ends.
 
@@ -330,20 +575,41 @@ class Bartender(commands.Bot):
 
         Args:
             sink (discord.sinks): The sink object containing recorded audio data.
-            channel (discord.TextChannel): The text channel to send messages to.
+            session (VoiceSession): The voice session the audio was recorded in.
+        """
+        windows = {user_id: audio.file.getvalue() for user_id, audio in sink.audio_data.items()}
+        if windows:
+            await session.capture_queue.put(windows)
+
+    async def process_windows(self, session, windows, partial=False):
+        """
+        Transcribes (or buffers, in wake mode) one recording window per speaker.
+
+        Args:
+            session (VoiceSession): The voice session the audio was recorded in.
+            windows (dict): WAV bytes of the recorded audio, keyed by speaker ID.
+            partial (bool, optional): Whether the windows were flushed early and only cover some speakers.
         """
+        channel = session.text_channel
+
+        # Join speech cut by the previous window boundary to this window
+        if session.stitcher:
+            windows = await asyncio.to_thread(session.stitcher.stitch, windows, not partial)
+
         # Check if any users were recorded
-        if not sink.audio_data:
+        if not windows:
             return
 
-        self.transcript_buffer = []
+        if self.wake_detector:
+            await self.buffer_until_wake(session, windows)
+            return
 
         start_time = time.time()
 
-        for user_id, audio in sink.audio_data.items():
+        for user_id, wav in windows.items():
             user_nick = await self.get_username_from_id(user_id, channel.guild)
             if user_nick:
-                raw_transcript = await self.transcribe_audio_stream(user_id, audio)
+                raw_transcript = await self.transcribe_wav(user_id, wav)
 
                 if not raw_transcript:
                     continue
@@ -353,185 +619,213 @@ class Bartender(commands.Bot):
 
                 logging.info(f"{TextColor.OKGREEN}{tagged_transcript}{TextColor.ENDC}")
 
-                self.transcript_buffer.append(tagged_transcript)
+                session.transcript_buffer.append(tagged_transcript)
 
                 # Check if the activation phrase is in the transcript
                 if config.CONTINUOUS_LISTEN_ACTIVATION_PHRASE.lower() in raw_transcript.lower():
                     # Combine all transcripts in the buffer
-                    combined_transcript = "\n".join(self.transcript_buffer)
-                    self.transcript_buffer.clear()
+                    combined_transcript = session.transcript_buffer.flush()
 
-                    # Add the combined transcript as a message to the assistant thread
-                    msg = client.beta.threads.messages.create(
-                        thread_id=self.current_thread.id, role="user", content=combined_transcript
+                    # Queue the combined transcript for the assistant thread
+                    session.turn_queue.submit(
+                        combined_transcript, run=True, channel=channel, discord_user_id=user_id
                     )
+            logging.info(f"Processed {len(windows)} audio streams in {time.time() - start_time:.2f} seconds")
 
-                    # Store the message in the Firestore subcollection
-                    self.session_doc_ref.collection("messages").add(
-                        {
-                            "openai_thread_id": self.current_thread.id,
-                            "openai_message_id": msg.id,
-                            "discord_user_id": user_id,
-                            "content": combined_transcript,
-                            "timestamp": firestore.SERVER_TIMESTAMP,
-                            "tool_call": None,
-                        }
-                    )
+    async def buffer_until_wake(self, session, windows):
+        """
+        Buffers recorded audio and transcribes it only once the activation phrase is heard.
 
-                    # Poll the assistant for a response
-                    run = client.beta.threads.runs.create_and_poll(
-                        thread_id=self.current_thread.id,
-                        assistant_id=self.assistant.id,
-                        instructions=config.INSTRUCTION_PROMPT,
-                        temperature=config.OPENAI_MODEL_TEMPERATURE,
-                    )
+        Each speaker's window is added to the compressed audio ring buffer and
+        checked by the wake detector. When a window contains the activation
+        phrase, every buffered window is transcribed in one batch and the
+        combined transcript is queued for the assistant thread.
 
-                    while True:
-                        run = client.beta.threads.runs.retrieve(
-                            thread_id=self.current_thread.id, run_id=run.id
-                        )
-                        if run.status == "completed":
-                            messages = client.beta.threads.messages.list(
-                                thread_id=self.current_thread.id, limit=1
-                            )
-                            for message in messages:
-                                if message.role == "assistant":
-                                    try:
-                                        assistant_message = message.content[0].text.value
-                                        logging.info(
-                                            f"{TextColor.BOLD}{TextColor.GRAY}[{config.OPENAI_ASSISTANT_NAME} 💭] {assistant_message}{TextColor.ENDC}\n"
-                                        )
-                                        if config.ENABLE_THOUGHT_MESSAGES:
-                                            await channel.send(f"💭 {assistant_message}")
-
-                                        # Store the assistant message in the Firestore subcollection
-                                        self.session_doc_ref.collection("messages").add(
-                                            {
-                                                "openai_thread_id": self.current_thread.id,
-                                                "openai_message_id": message.id,
-                                                "content": message.content[0].text.value,
-                                                "timestamp": firestore.SERVER_TIMESTAMP,
-                                                "tool_call": None,
-                                            }
-                                        )
-                                        break
-                                    except Exception:
-                                        logging.error(
-                                            "Failed to print assistant message: %s",
-                                            message,
-                                        )
-                                        logging.error(traceback.format_exc())
-                            logging.info(f"Run {run.id} completed")
-                            break
-                        elif run.status == "requires_action":
-                            logging.info(
-                                f"Required action in {run.id} → {run.thread_id}"
-                            )
-                            await self.handle_requires_action(run, run.id)
-                        elif run.status == "failed":
-                            logging.error(
-                                f"Run {run.id} failed with error: {run.last_error.code} -> {run.last_error.message}"
-                            )
-                            break
-                        else:
-                            pass
-                        await asyncio.sleep(0.1)
-            logging.info(f"Processed {len(sink.audio_data)} audio streams in {time.time() - start_time:.2f} seconds")
-
-    async def handle_requires_action(self, data, run_id):
-        """
-        Handle the required action when function calls are needed by submitting tool outputs.
-        """
-        tool_outputs = []
-        if hasattr(data.required_action.submit_tool_outputs, "tool_calls"):
-            tool_calls = data.required_action.submit_tool_outputs.tool_calls
-            tasks = [
-                self.fetch_tool_output(
-                    tool_call.function.name, json.loads(tool_call.function.arguments)
-                )
-                for tool_call in tool_calls
+        Args:
+            session (VoiceSession): The voice session the audio was recorded in.
+            windows (dict): WAV bytes of the recorded window, keyed by speaker ID.
+        """
+        channel = session.text_channel
+        start_time = time.time()
+        woken_by = None
+
+        for user_id, wav in windows.items():
+            user_nick = await self.get_username_from_id(user_id, channel.guild)
+            if not user_nick:
+                continue
+
+            woke, transcript = await self.wake_detector.detect(wav)
+            session.audio_buffer.add(user_id, wav, f"{user_nick} (id: {user_id})", start_time, transcript)
+            if woke:
+                woken_by = user_id
+
+        logging.info(
+            f"Buffered {len(windows)} audio streams in {time.time() - start_time:.2f} seconds "
+            f"({session.audio_buffer.size} bytes buffered)"
+        )
+        if woken_by is None:
+            return
+
+        windows = session.audio_buffer.drain()
+        transcripts = {}
+
+        async def transcribe_window(index, user_id, wav, transcript):
+            transcripts[index] = transcript if transcript is not None else await self.transcribe_wav(user_id, wav)
+
+        await asyncio.gather(
+            *[
+                transcribe_window(index, user_id, wav, transcript)
+                for index, (user_id, _, _, wav, transcript) in enumerate(windows)
             ]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            for tool_call, result in zip(tool_calls, results):
-                tool_call_id = tool_call.id
-                fname = tool_call.function.name
-                fargs = tool_call.function.arguments
-                if isinstance(result, Exception):
-                    logging.error(
-                        f"Error during tool call {tool_call_id}: {str(result)}"
-                    )
-                    output = f"Error during tool call: {str(result)}"
-                else:
-                    output = result
+        )
 
-                tool_outputs.append(
-                    {"tool_call_id": tool_call_id, "output": output}
-                )
+        for index, (user_id, timestamp, label, _, _) in enumerate(windows):
+            transcript = transcripts.get(index)
+            if not transcript:
+                continue
+            timestamp = datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+            tagged_transcript = f"[{timestamp}] [{label}] {transcript}"
+            logging.info(f"{TextColor.OKGREEN}{tagged_transcript}{TextColor.ENDC}")
+            session.transcript_buffer.append(tagged_transcript)
 
-                # Store the tool call in the Firestore subcollection
-                self.session_doc_ref.collection("messages").add(
-                    {
-                        "openai_thread_id": self.current_thread.id,
-                        "openai_message_id": None,
-                        "content": None,
-                        "timestamp": firestore.SERVER_TIMESTAMP,
-                        "tool_call": {
-                            "tool_call_id": tool_call_id,
-                            "function_name": fname,
-                            "arguments": json.loads(fargs),
-                            "output": output,
-                        },
-                    }
-                )
-                logging.info(
-                    f"Tool call completed -> {TextColor.HEADER}{tool_call.function.name}(){TextColor.ENDC}"
-                )
-        else:
-            logging.info("No tool calls found in the required action.")
+        logging.info(f"Transcribed {len(windows)} buffered audio windows in {time.time() - start_time:.2f} seconds")
 
-        client.beta.threads.runs.submit_tool_outputs(
-            thread_id=self.current_thread.id, run_id=run_id, tool_outputs=tool_outputs
+        # Queue the combined transcript for the assistant thread
+        session.turn_queue.submit(
+            session.transcript_buffer.flush(), run=True, channel=channel, discord_user_id=woken_by
         )
 
-    async def fetch_tool_output(self, function_name, arguments):
+    async def post_turn_message(self, session, content, turns):
         """
-        Fetches outputs for function calls, handling both async and sync functions.
+        Adds a queued turn to the session's assistant thread and stores it in the session history.
 
-        Parameters:
-        - function_name (str): The name of the function to call.
-        - arguments (dict): The arguments to pass to the function.
+        Args:
+            session (VoiceSession): The voice session the turn belongs to.
+            content (str): The combined content of the turn's inputs.
+            turns (list): The queued inputs making up the turn.
+        """
+        await self.engine.add_message(
+            session.thread.id, content, context=session, discord_user_id=turns[-1].metadata.get("discord_user_id")
+        )
+        # Voice turns carry the channel to reply in; text mentions don't
+        category = "transcript" if any(turn.metadata.get("channel") for turn in turns) else "prompt"
+        self.tokens.count(session.session_id, session.guild_id, category, content)
 
-        Returns:
-        - The response from the function call.
+    async def run_assistant(self, session, turns):
         """
+        Runs the assistant on the session's thread and waits for the run to finish.
+
+        Only one run is active on a thread at a time; the turn queue calls this
+        once per turn. Tool calls made during the run resolve their voice
+        session through ``active_session``.
+
+        Args:
+            session (VoiceSession): The voice session the turn belongs to.
+            turns (list): The queued inputs making up the turn.
+        """
+        channel = next(
+            (turn.metadata["channel"] for turn in reversed(turns) if turn.metadata.get("channel")),
+            session.text_channel,
+        )
+        active_session.set(session)
+
+        if self.tokens.over_budget(session.session_id):
+            total = self.tokens.session_totals(session.session_id)["total"]
+            logging.warning(
+                f"Voice session in guild {session.guild_id} used its token budget "
+                f"({total} tokens), not running the assistant"
+            )
+            if channel:
+                await channel.send(
+                    f"⚠️ This conversation used its token budget ({total} of {self.tokens.session_budget} tokens), "
+                    f"so I can't answer anymore. Use `{COMMANDS_JOIN}` to start a new one."
+                )
+            return
+
+        assistant_message = await self.engine.run(session.thread.id, context=session)
+        if assistant_message:
+            self.tokens.count(session.session_id, session.guild_id, "completion", assistant_message)
+            logging.info(
+                f"{TextColor.BOLD}{TextColor.GRAY}[{config.OPENAI_ASSISTANT_NAME} 💭] {assistant_message}{TextColor.ENDC}\n"
+            )
+            if config.ENABLE_THOUGHT_MESSAGES and channel:
+                await send_message(channel, f"💭 {assistant_message}")
+
         logging.info(
-            f"Processing tool call -> {TextColor.HEADER}{function_name}({json.dumps(arguments, indent=2)}){TextColor.ENDC}"
+            f"Tokens in guild {session.guild_id}: session {self.tokens.session_totals(session.session_id)}, "
+            f"guild {self.tokens.guild_totals(session.guild_id)}, "
+            f"top sources {self.tokens.top_sources(session.session_id, 3)}"
         )
-        for tool in self._tools:
-            if tool.info["function"]["name"] == function_name:
-                try:
-                    # Check if the tool function is a member of self
-                    if hasattr(self, tool.func.__name__):
-                        # Check if the tool function is async
-                        if inspect.iscoroutinefunction(tool.func):
-                            function_response = await tool(self, **arguments)
-                        else:
-                            # If sync, call directly
-                            function_response = tool(self, **arguments)
-                    else:
-                        # If the function is not a member of self, call without self
-                        if inspect.iscoroutinefunction(tool.func):
-                            function_response = await tool(**arguments)
-                        else:
-                            function_response = tool(**arguments)
-                    return str(function_response)
-                except Exception as e:
-                    logging.warning(
-                        f"Error during tool call: {str(e)}\n{traceback.format_exc()}"
-                    )
-                    return f"Error during tool call: {str(e)}\n{traceback.format_exc()}"
-        logging.warning(f"Tool function '{function_name}' not found.")
-        return f"Error: Tool function '{function_name}' not found."
+
+    def discard_session_tokens(self, session):
+        """
+        Logs a closed voice session's final token totals and drops its token counts.
+
+        Args:
+            session (VoiceSession): The closed voice session.
+        """
+        if session.session_id is None:
+            return
+        logging.info(f"Tokens of closed session in guild {session.guild_id}: {self.tokens.session_totals(session.session_id)}")
+        self.tokens.discard(session.session_id)
+
+    def account_run_usage(self, usage, session):
+        """
+        Records the billed token usage of an assistant run in the token accountant.
+
+        Args:
+            usage (openai.types.beta.threads.run.Usage): The run's token usage.
+            session (VoiceSession): The voice session the run belongs to.
+        """
+        if session is not None:
+            self.tokens.add_usage(session.session_id, session.guild_id, usage)
+
+    async def store_session_record(self, record, session):
+        """
+        Stores a conversation engine record in the voice session's history.
+
+        Args:
+            record (dict): The message or tool call record.
+            session (VoiceSession): The voice session the record belongs to.
+        """
+        if session is None or session.session_id is None:
+            return
+        await asyncio.to_thread(self.storage.add_session_message, session.session_id, record)
+        if record["tool_call"]:
+            self.tokens.count(
+                session.session_id,
+                session.guild_id,
+                "tool_output",
+                record["tool_call"]["output"],
+                source=record["tool_call"]["function_name"],
+            )
+
+    async def get_cached_member(self, user_id, guild):
+        """
+        Retrieves a member's cached names, falling back to the gateway cache and
+        then to a REST request only when the member has not been seen yet.
+
+        Args:
+            user_id (int): The ID of the user.
+            guild (discord.Guild): The Discord guild to search for the user.
+
+        Returns:
+            dict or None: The member's ``display_name`` and ``nick`` if found, otherwise None.
+        """
+        cached = self.member_cache.get(guild.id, user_id)
+        if cached:
+            return cached
+
+        member = guild.get_member(user_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(user_id)
+            except Exception as e:
+                logging.info(f"Error fetching member for user ID {user_id}: {str(e)}")
+                return None
+
+        self.member_cache.update(member)
+        return self.member_cache.get(guild.id, user_id)
 
     async def get_username_from_id(self, user_id, guild):
         """
@@ -544,14 +838,9 @@ class Bartender(commands.Bot):
         Returns:
             str or None: The user's display name if found, otherwise None.
         """
-        try:
-            user = await guild.fetch_member(user_id)
-            if user:
-                return user.display_name
-        except Exception as e:
-            logging.info(f"Error fetching username for user ID {user_id}: {str(e)}")
-        return None
-    
+        member = await self.get_cached_member(user_id, guild)
+        return member["display_name"] if member else None
+
     async def get_nick_from_id(self, user_id, guild):
         """
         Retrieves the nickname of a user from their ID within a guild.
@@ -563,17 +852,69 @@ class Bartender(commands.Bot):
         Returns:
             str or None: The user's nickname if found, otherwise None.
         """
+        member = await self.get_cached_member(user_id, guild)
+        return member["nick"] if member else None
+
+    def resolve_guild(self, guild_id):
+        """
+        Resolves a guild from its ID using the client's guild map.
+
+        Args:
+            guild_id (int): The ID of the guild.
+
+        Returns:
+            discord.Guild or None: The guild if found, otherwise None.
+        """
+        return self.get_guild(int(guild_id))
+
+    def resolve_channel(self, channel_id):
+        """
+        Resolves a channel from its ID using the channel index, falling back to
+        the client cache for channels the index does not track (e.g. threads).
+
+        Args:
+            channel_id (int): The ID of the channel.
+
+        Returns:
+            discord.abc.GuildChannel or None: The channel if found, otherwise None.
+        """
+        channel_id = int(channel_id)
+        return self.channel_index.get(channel_id) or self.get_channel(channel_id)
+
+    async def resolve_message(self, message_id):
+        """
+        Resolves a message from its ID, using the message cache first and a
+        single REST request against the message's known channel otherwise.
+
+        Args:
+            message_id (int): The ID of the message.
+
+        Returns:
+            discord.Message or None: The message if found, otherwise None.
+        """
+        message_id = int(message_id)
+        message = self.message_cache.get(message_id)
+        if message is not None:
+            return message
+
+        channel_id = self.message_cache.channel_id_for(message_id)
+        channel = self.resolve_channel(channel_id) if channel_id else None
+        if channel is None:
+            logging.info(f"No known channel for message ID {message_id}")
+            return None
+
         try:
-            user = await guild.fetch_member(user_id)
-            if user:
-                return user.nick
-        except Exception as e:
-            logging.info(f"Error fetching nickname for user ID {user_id}: {str(e)}")
-        return None
+            message = await channel.fetch_message(message_id)
+        except discord.HTTPException as e:
+            logging.info(f"Error fetching message ID {message_id}: {str(e)}")
+            return None
+
+        self.message_cache.add(message)
+        return message
 
     async def transcribe_audio_stream(self, user_id, audio):
         """
-        Processes an audio stream to transcribe speech using OpenAI's Whisper API.
+        Processes an audio stream to transcribe speech with the configured transcription backend.
 
         Args:
             user_id (str): The ID of the user associated with the audio.
@@ -582,25 +923,26 @@ class Bartender(commands.Bot):
         Returns:
             str: The transcribed text from the audio stream.
         """
-        filename = f"generated_audio/request-{user_id}.wav"
-        
-        # Output the audio data to a WAV file
-        with open(filename, "wb") as f:
-            f.write(audio.file.getbuffer())
-        
-        # Convert the audio file to correct WAV format
-        audio_file = open(filename, "rb")
-        sound = AudioSegment.from_file(audio_file)
-        sound.export(filename, format="wav")
-        
-        if not has_speech(filename):
-            return ""
+        return await self.transcribe_wav(user_id, audio.file.getvalue())
 
-        transcript = client.audio.transcriptions.create(
-            model=config.OPENAI_VOICE_MODEL, file=audio_file, response_format="text"
-        )
+    async def transcribe_wav(self, user_id, wav):
+        """
+        Transcribes WAV audio with the configured transcription backend.
 
-        return str(transcript)
+        Args:
+            user_id (str): The ID of the user associated with the audio.
+            wav (bytes): The audio as WAV bytes.
+
+        Returns:
+            str: The transcribed text, or an empty string if the audio contains no speech.
+        """
+        # Cut silence, downmix and resample before uploading
+        speech = await asyncio.to_thread(prepare_for_transcription, wav)
+        if not speech:
+            return ""
+        logging.info(f"Prepared {len(speech)} of {len(wav)} bytes of audio from {user_id} for transcription")
+
+        return await asyncio.to_thread(self.transcriber.transcribe, speech)
 
     @utils.function_info
     async def speak(self, message):
@@ -612,10 +954,15 @@ class Bartender(commands.Bot):
         :return: The spoken message.
         :rtype: string
         """
+        session = self.voice_sessions.current()
+        if session is None or not session.connected:
+            return "Bot is not connected to a voice channel."
+
         try:
-            filename = "generated_audio/output.mp3"
-            async with self._speak_lock:
-                response = client.audio.speech.create(
+            filename = f"generated_audio/output-{session.guild_id}.mp3"
+            async with session.speak_lock:
+                response = await asyncio.to_thread(
+                    client.audio.speech.create,
                     model=config.OPENAI_TTS_MODEL,
                     voice=config.OPENAI_TTS_VOICE,
                     input=message,
@@ -636,10 +983,10 @@ class Bartender(commands.Bot):
                         options=f'-af "atempo=1.1" -v "quiet"',
                     )
                 # Play the audio file using FFmpeg
-                self._voice_client.play(audio)
+                session.voice_client.play(audio)
 
                 # Wait for playback to finish
-                while self._voice_client.is_playing():
+                while session.voice_client.is_playing():
                     await asyncio.sleep(1)
         except Exception as e:
             logging.warning(f"Failed to generate TTS audio: {e}")
@@ -647,24 +994,48 @@ class Bartender(commands.Bot):
             return f"Failed to speak: {e}"
 
     @utils.function_info
-    def get_guild_online_users(self, guild_id: int):
-        """Gets a list of online users from the specified guild.
+    def get_guild_online_users(
+        self,
+        guild_id: int,
+        role: str = "",
+        in_voice: bool = None,
+        name_prefix: str = "",
+        limit: int = config.DISCORD_MEMBER_QUERY_LIMIT,
+        cursor: str = "",
+    ):
+        """Gets a page of online users from the specified guild, ordered by user ID.
 
         :param guild_id: The ID of the Discord guild.
         :type guild_id: integer
-        :return: A list of display names of online users.
-        :rtype: list
+        :param role: Only include users with a role of this name or ID.
+        :type role: string
+        :param in_voice: Only include users that are (true) or are not (false) in a voice channel. Omit to include everyone.
+        :type in_voice: boolean
+        :param name_prefix: Only include users whose display name, nickname or username starts with this text.
+        :type name_prefix: string
+        :param limit: Maximum number of users to return.
+        :type limit: integer
+        :param cursor: The next_cursor value returned by a previous call, to fetch the following page.
+        :type cursor: string
+        :return: The display names of matching online users and the cursor of the next page.
+        :rtype: dict
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
-        if guild is None:
-            return []
-
-        online_members = [
-            member.display_name
-            for member in guild.members
-            if member.status == discord.Status.online
-        ]
-        return online_members
+        page = self.query_guild_members(
+            guild_id,
+            status=str(discord.Status.online),
+            role=role,
+            in_voice=in_voice,
+            name_prefix=name_prefix,
+            fields="display_name",
+            limit=limit,
+            cursor=cursor,
+        )
+        if isinstance(page, str):
+            return page
+        return {
+            "users": [member["display_name"] for member in page["users"]],
+            "next_cursor": page["next_cursor"],
+        }
 
     @utils.function_info
     def get_guild_text_channels(self, guild_id: int):
@@ -675,7 +1046,7 @@ class Bartender(commands.Bot):
         :return: A list of dictionaries containing the id and name of each text channel.
         :rtype: list
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return []
 
@@ -694,7 +1065,7 @@ class Bartender(commands.Bot):
         :return: A list of dictionaries containing the id and name of each voice channel.
         :rtype: list
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return []
 
@@ -713,7 +1084,7 @@ class Bartender(commands.Bot):
         :return: The bot's display name in the guild.
         :rtype: string
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return "Bartender"
 
@@ -729,7 +1100,7 @@ class Bartender(commands.Bot):
         :return: A list of display names of users in the same voice channel, or None if the channel is not found.
         :rtype: string
         """
-        channel = discord.utils.get(self.get_all_channels(), id=channel_id)
+        channel = self.resolve_channel(channel_id)
         if channel is None or not isinstance(channel, discord.VoiceChannel):
             return None
 
@@ -746,7 +1117,7 @@ class Bartender(commands.Bot):
         :return: The new display name of the bot in the guild.
         :rtype: string
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return config.OPENAI_ASSISTANT_NAME
 
@@ -772,12 +1143,12 @@ class Bartender(commands.Bot):
         :return: The sent message object.
         :rtype: string
         """
-        channel = discord.utils.get(self.get_all_channels(), id=channel_id)
+        channel = self.resolve_channel(channel_id)
         if channel is None:
             return f"Channel with ID {channel_id} not found."
 
         try:
-            await channel.send(message)
+            await send_message(channel, message)
             return "Message sent successfully."
         except discord.HTTPException as e:
             logging.error(f"Error sending message: {e}")
@@ -794,12 +1165,12 @@ class Bartender(commands.Bot):
         :return: The sent reply message object.
         :rtype: string
         """
-        message = await self.get_message(message_id)
+        message = await self.resolve_message(message_id)
         if message is None:
             return f"Message with ID {message_id} not found."
 
         try:
-            await message.reply(reply)
+            await send_reply(message, reply)
             return "Reply sent successfully."
         except discord.HTTPException as e:
             logging.error(f"Error sending reply message: {e}")
@@ -816,7 +1187,7 @@ class Bartender(commands.Bot):
         :return: Whether the reaction was added successfully.
         :rtype: boolean
         """
-        message = await self.get_message(message_id)
+        message = await self.resolve_message(message_id)
         if message is None:
             return f"Message with ID {message_id} not found."
 
@@ -838,7 +1209,7 @@ class Bartender(commands.Bot):
         :return: Whether the reaction was removed successfully.
         :rtype: boolean
         """
-        message = await self.get_message(message_id)
+        message = await self.resolve_message(message_id)
         if message is None:
             return f"Message with ID {message_id} not found."
 
@@ -858,12 +1229,18 @@ class Bartender(commands.Bot):
         :return: Whether the bot successfully joined the channel.
         :rtype: boolean
         """
-        channel = discord.utils.get(self.get_all_channels(), id=channel_id)
+        channel = self.resolve_channel(channel_id)
         if channel is None or not isinstance(channel, discord.VoiceChannel):
             return f"Voice channel with ID {channel_id} not found."
 
         try:
-            self._voice_client = await channel.connect()
+            session = self.voice_sessions.get(channel.guild.id)
+            if session and session.connected:
+                await session.voice_client.move_to(channel)
+            else:
+                # Voice channels have their own text chat, which takes the session's replies
+                voice_client = await channel.connect()
+                await self.start_session(channel, voice_client, channel, config.OPENAI_ASSISTANT_NAME)
             return f"Successfully joined voice channel {channel.name}."
         except discord.HTTPException as e:
             logging.error(f"Error joining voice channel: {e}")
@@ -876,9 +1253,10 @@ class Bartender(commands.Bot):
         :return: Whether the bot successfully left the channel.
         :rtype: boolean
         """
-        if self._voice_client and self._voice_client.is_connected():
+        session = self.voice_sessions.current()
+        if session and session.connected:
             try:
-                await self._voice_client.disconnect()
+                await self.voice_sessions.remove(session.guild_id)
                 return f"Successfully left voice channel."
             except discord.HTTPException as e:
                 logging.error(f"Error leaving voice channel: {e}")
@@ -897,20 +1275,21 @@ class Bartender(commands.Bot):
         :return: A message indicating the result of the operation.
         :rtype: string
         """
-        if not self._voice_client or not self._voice_client.is_connected():
+        session = self.voice_sessions.current()
+        if session is None or not session.connected:
             return "Bot is not connected to any voice channel."
 
-        guild = self._voice_client.guild
+        guild = session.voice_client.guild
         member = guild.get_member(user_id)
         if member is None:
             return f"User with ID {user_id} not found."
 
-        channel = discord.utils.get(guild.voice_channels, id=channel_id)
-        if channel is None:
+        channel = self.resolve_channel(channel_id)
+        if channel is None or not isinstance(channel, discord.VoiceChannel) or channel.guild != guild:
             return f"Voice channel with ID {channel_id} not found."
 
         try:
-            await member.move_to(channel)
+            await self.moderation.edit_member(member, voice_channel=channel)
             return f"Successfully moved user {member.display_name} to voice channel {channel.name}."
         except discord.HTTPException as e:
             logging.error(f"Error moving user to voice channel: {e}")
@@ -927,7 +1306,7 @@ class Bartender(commands.Bot):
         :return: A message indicating the result of the operation.
         :rtype: string
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return f"Guild with ID {guild_id} not found."
 
@@ -936,7 +1315,7 @@ class Bartender(commands.Bot):
             return f"User with ID {user_id} not found."
 
         try:
-            await member.edit(mute=True)
+            await self.moderation.edit_member(member, mute=True)
             return f"Successfully muted user {member.display_name}."
         except discord.HTTPException as e:
             logging.error(f"Error muting user: {e}")
@@ -953,7 +1332,7 @@ class Bartender(commands.Bot):
         :return: A message indicating the result of the operation.
         :rtype: string
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return f"Guild with ID {guild_id} not found."
 
@@ -962,12 +1341,179 @@ class Bartender(commands.Bot):
             return f"User with ID {user_id} not found."
 
         try:
-            await member.edit(mute=False)
+            await self.moderation.edit_member(member, mute=False)
             return f"Successfully unmuted user {member.display_name}."
         except discord.HTTPException as e:
             logging.error(f"Error unmuting user: {e}")
             return f"Error unmuting user."
         
+    def resolve_members(self, guild, user_ids):
+        """
+        Resolves a comma-separated list of user IDs to guild members.
+
+        Args:
+            guild (discord.Guild): The guild the users belong to.
+            user_ids (str): Comma-separated user IDs.
+
+        Returns:
+            tuple: The resolved members and the IDs that were not found.
+        """
+        members, missing = [], []
+        for user_id in str(user_ids).split(","):
+            user_id = user_id.strip()
+            if not user_id:
+                continue
+            member = guild.get_member(int(user_id)) if user_id.isdigit() else None
+            if member is None:
+                missing.append(user_id)
+            else:
+                members.append(member)
+        return members, missing
+
+    def moderation_progress(self, action):
+        """
+        Creates a progress callback for a bulk moderation action.
+
+        Progress is logged and posted to the text channel of the voice session
+        the tool call belongs to, editing one status message as the batch advances.
+
+        Args:
+            action (str): Description of the action shown in the status message.
+
+        Returns:
+            callable: Coroutine called with ``(done, total)``.
+        """
+        session = self.voice_sessions.current()
+        channel = session.text_channel if session else None
+        status = None
+
+        async def report(done, total):
+            nonlocal status
+            logging.info(f"{action}: {done}/{total}")
+            if channel is None:
+                return
+            content = f"{'✅' if done == total else '⏳'} {action}: {done}/{total}"
+            if status is None:
+                status = await channel.send(content)
+            else:
+                await status.edit(content=content)
+
+        return report
+
+    @utils.function_info
+    async def bulk_mute_users(self, guild_id: int, user_ids: str, mute: bool = True):
+        """Mutes or unmutes many users in the specified guild at once. Prefer this over repeated mute_user calls.
+
+        :param guild_id: The ID of the Discord guild.
+        :type guild_id: integer
+        :param user_ids: Comma-separated IDs of the users to mute or unmute.
+        :type user_ids: string
+        :param mute: True to mute the users, false to unmute them.
+        :type mute: boolean
+        :return: The users that were and were not updated.
+        :rtype: dict
+        """
+        guild = self.resolve_guild(guild_id)
+        if guild is None:
+            return f"Guild with ID {guild_id} not found."
+
+        members, missing = self.resolve_members(guild, user_ids)
+        result = await self.moderation.edit_members(
+            [(member, {"mute": bool(mute)}) for member in members],
+            progress=self.moderation_progress("Muting users" if mute else "Unmuting users"),
+        )
+        result["not_found"] = missing
+        return result
+
+    @utils.function_info
+    async def bulk_move_users_to_voice_channel(self, guild_id: int, channel_id: int, user_ids: str = ""):
+        """Moves many users to the specified voice channel at once. Prefer this over repeated move_user_to_voice_channel calls.
+
+        :param guild_id: The ID of the Discord guild.
+        :type guild_id: integer
+        :param channel_id: The ID of the voice channel to move the users to.
+        :type channel_id: integer
+        :param user_ids: Comma-separated IDs of the users to move. Omit to move everyone currently in another voice channel of the guild.
+        :type user_ids: string
+        :return: The users that were and were not moved.
+        :rtype: dict
+        """
+        guild = self.resolve_guild(guild_id)
+        if guild is None:
+            return f"Guild with ID {guild_id} not found."
+
+        channel = self.resolve_channel(channel_id)
+        if channel is None or not isinstance(channel, discord.VoiceChannel) or channel.guild != guild:
+            return f"Voice channel with ID {channel_id} not found."
+
+        if user_ids:
+            members, missing = self.resolve_members(guild, user_ids)
+        else:
+            members, missing = [
+                member
+                for voice_channel in guild.voice_channels
+                if voice_channel != channel
+                for member in voice_channel.members
+            ], []
+
+        result = await self.moderation.edit_members(
+            [(member, {"voice_channel": channel}) for member in members],
+            progress=self.moderation_progress(f"Moving users to {channel.name}"),
+        )
+        result["not_found"] = missing
+        return result
+
+    @utils.function_info
+    async def bulk_update_user_roles(
+        self, guild_id: int, user_ids: str, add_role_ids: str = "", remove_role_ids: str = ""
+    ):
+        """Adds and/or removes roles for many users in the specified guild at once, with one request per user.
+
+        :param guild_id: The ID of the Discord guild.
+        :type guild_id: integer
+        :param user_ids: Comma-separated IDs of the users to update.
+        :type user_ids: string
+        :param add_role_ids: Comma-separated IDs of the roles to add.
+        :type add_role_ids: string
+        :param remove_role_ids: Comma-separated IDs of the roles to remove.
+        :type remove_role_ids: string
+        :return: The users that were and were not updated.
+        :rtype: dict
+        """
+        guild = self.resolve_guild(guild_id)
+        if guild is None:
+            return f"Guild with ID {guild_id} not found."
+
+        def parse_roles(role_ids):
+            roles = []
+            for role_id in str(role_ids).split(","):
+                role_id = role_id.strip()
+                if role_id:
+                    role = guild.get_role(int(role_id)) if role_id.isdigit() else None
+                    if role is None:
+                        raise ValueError(f"Role with ID {role_id} not found.")
+                    roles.append(role)
+            return roles
+
+        try:
+            add_roles = parse_roles(add_role_ids)
+            remove_roles = parse_roles(remove_role_ids)
+        except ValueError as e:
+            return str(e)
+
+        members, missing = self.resolve_members(guild, user_ids)
+        edits = []
+        for member in members:
+            roles = [role for role in member.roles if not role.is_default() and role not in remove_roles]
+            roles += [role for role in add_roles if role not in roles]
+            edits.append((member, {"roles": roles}))
+
+        result = await self.moderation.edit_members(
+            edits, progress=self.moderation_progress("Updating user roles")
+        )
+        result["not_found"] = missing
+        return result
+
     @utils.function_info
     async def create_voice_channel(self, guild_id: int, channel_name: str):
         """Creates a new voice channel in the specified guild.
@@ -979,7 +1525,7 @@ class Bartender(commands.Bot):
         :return: A message indicating the result of the operation.
         :rtype: string
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return f"Guild with ID {guild_id} not found."
 
@@ -1001,7 +1547,7 @@ class Bartender(commands.Bot):
         :return: A message indicating the result of the operation.
         :rtype: string
         """
-        channel = discord.utils.get(self.get_all_channels(), id=channel_id)
+        channel = self.resolve_channel(channel_id)
         if channel is None or not isinstance(channel, discord.VoiceChannel):
             return f"Voice channel with ID {channel_id} not found."
 
@@ -1023,7 +1569,7 @@ class Bartender(commands.Bot):
         :return: A message indicating the result of the operation.
         :rtype: string
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
             return f"Guild with ID {guild_id} not found."
 
@@ -1045,7 +1591,7 @@ class Bartender(commands.Bot):
         :return: A message indicating the result of the operation.
         :rtype: string
         """
-        channel = discord.utils.get(self.get_all_channels(), id=channel_id)
+        channel = self.resolve_channel(channel_id)
         if channel is None or not isinstance(channel, discord.TextChannel):
             return f"Text channel with ID {channel_id} not found."
 
@@ -1065,10 +1611,11 @@ class Bartender(commands.Bot):
         :return: A dictionary containing the voice state of the user.
         :rtype: dict
         """
-        if not self._voice_client or not self._voice_client.is_connected():
+        session = self.voice_sessions.current()
+        if session is None or not session.connected:
             return "Bot is not connected to any voice channel."
 
-        guild = self._voice_client.guild
+        guild = session.voice_client.guild
         member = guild.get_member(user_id)
         if member is None:
             return f"User with ID {user_id} not found."
@@ -1083,28 +1630,98 @@ class Bartender(commands.Bot):
         }
     
     @utils.function_info
-    async def get_guild_users(self, guild_id: int):
-        """Gets a list of users in the specified guild.
+    async def get_guild_users(
+        self,
+        guild_id: int,
+        status: str = "",
+        role: str = "",
+        in_voice: bool = None,
+        name_prefix: str = "",
+        fields: str = "id,display_name,status,joined_at",
+        limit: int = config.DISCORD_MEMBER_QUERY_LIMIT,
+        cursor: str = "",
+    ):
+        """Gets a page of users in the specified guild, ordered by user ID. Use the filters to fetch only the users you need.
 
         :param guild_id: The ID of the Discord guild.
         :type guild_id: integer
-        :return: A list of dictionaries containing user information.
-        :rtype: list
+        :param status: Only include users with this status (online, idle, dnd or offline).
+        :type status: string
+        :param role: Only include users with a role of this name or ID.
+        :type role: string
+        :param in_voice: Only include users that are (true) or are not (false) in a voice channel. Omit to include everyone.
+        :type in_voice: boolean
+        :param name_prefix: Only include users whose display name, nickname or username starts with this text.
+        :type name_prefix: string
+        :param fields: Comma-separated user fields to return. Available: id, display_name, nick, username, status, roles, role_ids, voice_channel_id, joined_at, bot.
+        :type fields: string
+        :param limit: Maximum number of users to return.
+        :type limit: integer
+        :param cursor: The next_cursor value returned by a previous call, to fetch the following page.
+        :type cursor: string
+        :return: The matching users and the cursor of the next page.
+        :rtype: dict
+        """
+        return self.query_guild_members(
+            guild_id,
+            status=status,
+            role=role,
+            in_voice=in_voice,
+            name_prefix=name_prefix,
+            fields=fields,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    def query_guild_members(
+        self,
+        guild_id,
+        status=None,
+        role=None,
+        in_voice=None,
+        name_prefix=None,
+        fields=None,
+        limit=config.DISCORD_MEMBER_QUERY_LIMIT,
+        cursor=None,
+    ):
+        """
+        Queries the member index of a guild on behalf of the member listing tools.
+
+        Args:
+            guild_id (int): The ID of the Discord guild.
+            status (str, optional): Status filter.
+            role (str, optional): Role name or ID filter.
+            in_voice (bool, optional): Voice presence filter.
+            name_prefix (str, optional): Name prefix filter.
+            fields (str, optional): Comma-separated record fields to return.
+            limit (int, optional): Page size, capped at the configured maximum.
+            cursor (str, optional): Cursor returned by the previous page.
+
+        Returns:
+            dict or str: The page of users and the next cursor, or an error message.
         """
-        guild = discord.utils.get(self.guilds, id=guild_id)
+        guild = self.resolve_guild(guild_id)
         if guild is None:
-            return []
+            return f"Guild with ID {guild_id} not found."
 
-        users = [
-            {
-                "id": member.id,
-                "name": member.display_name,
-                "status": str(member.status),
-                "joined_at": str(member.joined_at),
-            }
-            for member in guild.members
-        ]
-        return users
+        try:
+            users, next_cursor = self.member_cache.query(
+                guild.id,
+                status=status.lower() if status else None,
+                role=role,
+                in_voice=in_voice,
+                name_prefix=name_prefix,
+                fields=[field.strip() for field in fields.split(",")] if fields else None,
+                limit=max(1, min(int(limit or config.DISCORD_MEMBER_QUERY_LIMIT), config.DISCORD_MEMBER_QUERY_MAX_LIMIT)),
+                cursor=int(cursor) if cursor else None,
+            )
+        except ValueError as e:
+            return f"Invalid member query: {e}"
+
+        return {
+            "users": users,
+            "next_cursor": str(next_cursor) if next_cursor else None,
+        }
 
 def print_welcome_screen():
     """Prints the ASCII logo and basic program details."""
@@ -1160,6 +1777,8 @@ if __name__ == "__main__":
 
     intents = discord.Intents.default()
     intents.message_content = True
+    intents.members = True
+    intents.presences = True
     bot = Bartender(
         command_prefix=COMMAND_PREFIX, intents=intents, extra_tools=extra_tools
     )
@@ -24,6 +24,8 @@ from ylb.helpers.openai import (
     openai_update_assistant_code_interpreter,
 )
 from ylb import utils
+from ylb.cache import ChannelHistory, PresenceSnapshot
+from ylb.transcription import create_transcriber
 
 TOOLS = [
     openai_get_vector_store_file_ids,
@@ -71,16 +73,20 @@ class Bartender(commands.Bot):
         self._voice_client = None
         self._queue = []
         self._is_recording = False
+        self.transcriber = create_transcriber()
         self._is_speaking = False
         self.pool = mafic.NodePool(self)
         self.listen_thread = None
         self.conversation_manager = None  # Add this line
+        self.channel_history = ChannelHistory()
+        self.presence = PresenceSnapshot()
+        self._seeding_channels = set()
 
         self.loop.create_task(self.add_nodes())
 
-    async def get_last_x_messages(self, channel, x):
+    def recent_messages(self, channel, x):
         """
-        Retrieves the last X messages from a specified text channel.
+        Retrieves the last X messages of a text channel from the rolling history buffer.
 
         Args:
             channel (discord.TextChannel): The text channel to retrieve messages from.
@@ -92,18 +98,34 @@ class Bartender(commands.Bot):
         if channel is None:
             return {}  # Return an empty dictionary if the channel is not found
 
-        messages = await channel.history(
-            limit=x
-        ).flatten()  # Get the last X messages from the channel
+        if not self.channel_history.is_seeded(channel.id) and channel.id not in self._seeding_channels:
+            # Seed in the background; this prompt uses whatever is buffered so far
+            self.loop.create_task(self.seed_channel_history(channel))
 
         message_dict = {}
-        for message in messages:
-            sender_name = message.author.name
-            message_content = message.content
+        for sender_name, message_content in self.channel_history.recent(channel.id, x):
             message_dict[sender_name] = message_content
 
         return message_dict
 
+    async def seed_channel_history(self, channel):
+        """
+        Seeds a channel's rolling history buffer with a single history request.
+
+        Args:
+            channel (discord.TextChannel): The text channel to seed.
+        """
+        if self.channel_history.is_seeded(channel.id) or channel.id in self._seeding_channels:
+            return
+        self._seeding_channels.add(channel.id)
+        try:
+            messages = await channel.history(
+                limit=self.channel_history.max_messages
+            ).flatten()  # Get the last X messages from the channel
+            self.channel_history.seed(channel.id, messages)
+        finally:
+            self._seeding_channels.discard(channel.id)
+
     async def online_users(self, message):
         """
         Gets a list of online users from the given message's guild.
@@ -115,13 +137,7 @@ class Bartender(commands.Bot):
             list: A list of display names of online users.
         """
 
-        online_members = [
-            member.display_name
-            for member in message.guild.members
-            if member.status == discord.Status.online
-        ]
-
-        return online_members
+        return self.presence.online_users(message.guild)
 
     async def bot_display_name(self, message):
         """
@@ -307,7 +323,7 @@ class Bartender(commands.Bot):
 
     async def process_audio_stream(self, user_name, audio):
         """
-        Processes an audio stream to transcribe speech using OpenAI's Whisper API.
+        Processes an audio stream to transcribe speech with the configured transcription backend.
 
         Args:
             user_name (str): The name of the user associated with the audio.
@@ -316,17 +332,8 @@ class Bartender(commands.Bot):
         Returns:
             str: The transcribed text from the audio stream.
         """
-        filename = f"generated_audio/request-{user_name}.wav"
-
-        with open(filename, "wb") as f:
-            f.write(audio.file.getbuffer())
-
-        audio_file = open(filename, "rb")
-
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            response_format="text",
+        transcript = await asyncio.to_thread(
+            self.transcriber.transcribe, audio.file.getvalue()
         )
         print(f"[{user_name}]: {transcript}")
 
@@ -447,7 +454,7 @@ class Bartender(commands.Bot):
                     community_name=await self.bot_display_name(message),
                     online_users=await self.online_users(message),
                     same_channel_users=await self.users_in_voice_channel(message),
-                    recent_messages=await self.get_last_x_messages(channel, 50),
+                    recent_messages=self.recent_messages(channel, 50),
                 ),
             },
         ]
@@ -761,6 +768,36 @@ class Bartender(commands.Bot):
     async def on_ready(self):
         """Event handler that runs when the bot is ready."""
         print(f"Logged in as {self.user.name}")
+        for guild in self.guilds:
+            channel = discord.utils.get(guild.text_channels, name="𝚖𝚎𝚣𝚣𝚊𝚗𝚒𝚗𝚎")
+            if channel:
+                await self.seed_channel_history(channel)
+
+    async def on_message_edit(self, before, after):
+        """Event handler that keeps the rolling history buffer in sync with edits."""
+        self.channel_history.edit(after)
+
+    async def on_raw_message_delete(self, payload):
+        """Event handler that removes deleted messages from the rolling history buffer."""
+        self.channel_history.delete(payload.channel_id, payload.message_id)
+
+    async def on_presence_update(self, before, after):
+        """Event handler that invalidates the cached online users of a guild."""
+        if before.status != after.status:
+            self.presence.invalidate(after.guild.id)
+
+    async def on_member_join(self, member):
+        """Event handler that invalidates the cached online users of a guild."""
+        self.presence.invalidate(member.guild.id)
+
+    async def on_member_remove(self, member):
+        """Event handler that invalidates the cached online users of a guild."""
+        self.presence.invalidate(member.guild.id)
+
+    async def on_member_update(self, before, after):
+        """Event handler that invalidates the cached online users after a name change."""
+        if before.display_name != after.display_name:
+            self.presence.invalidate(after.guild.id)
 
     async def on_message(self, message):
         """
@@ -769,6 +806,8 @@ class Bartender(commands.Bot):
         Args:
             message (discord.Message): The incoming message.
         """
+        self.channel_history.add(message)
+
         if message.content.startswith(COMMANDS_SAY):
             print(f"Handling SAY")
             try:
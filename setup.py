@@ -21,6 +21,14 @@ setuptools.setup(
     include_package_data=True,
     setup_requires=[],
     install_requires=[],
+    extras_require={
+        # Transcription on the local CPU/GPU instead of the OpenAI API
+        "local-whisper": ["faster-whisper"],
+        # Compact FLAC/Opus transcription uploads; pydub needs ffmpeg on the PATH
+        "upload-encoding": ["soundfile", "pydub"],
+        # Local keyword spotting for the wake transcription mode
+        "wake-word": ["pocketsphinx"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent",
@@ -0,0 +1,4 @@
+import os
+
+# ylb creates its OpenAI clients at import time
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,32 @@
+import io
+import wave
+
+import numpy as np
+
+RATE = 16000
+
+
+def voice(seconds, rate=RATE, pitch=140):
+    """Voice-like audio: a harmonic-rich tone with a syllable-rate envelope, which webrtcvad accepts as speech."""
+    t = np.arange(int(rate * seconds)) / rate
+    signal = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 20))
+    signal *= 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    return (signal / np.abs(signal).max() * 12000).astype(np.int16)
+
+
+def silence(seconds, rate=RATE):
+    return np.zeros(int(rate * seconds), dtype=np.int16)
+
+
+def pcm(*parts):
+    return np.concatenate(parts).tobytes()
+
+
+def wav(*parts, rate=RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm(*parts))
+    return buffer.getvalue()
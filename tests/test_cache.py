@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ylb.cache import MemberCache
+
+
+def make_member(member_id, name, status="online"):
+    return SimpleNamespace(
+        id=member_id,
+        display_name=name,
+        nick=None,
+        name=name,
+        status=status,
+        roles=[],
+        voice=None,
+        joined_at=None,
+        bot=False,
+    )
+
+
+@pytest.fixture
+def cache():
+    cache = MemberCache()
+    members = [make_member(member_id, f"user{member_id}") for member_id in (3, 1, 4, 2, 5)]
+    cache.load_guild(SimpleNamespace(id=10, members=members))
+    return cache
+
+
+def test_query_pages_through_members_by_id(cache):
+    first, cursor = cache.query(10, fields=["display_name"], limit=2)
+    assert first == [{"id": 1, "display_name": "user1"}, {"id": 2, "display_name": "user2"}]
+    assert cursor == 2
+
+    second, cursor = cache.query(10, fields=["display_name"], limit=2, cursor=cursor)
+    assert [member["id"] for member in second] == [3, 4]
+
+    last, cursor = cache.query(10, limit=2, cursor=cursor)
+    assert [member["id"] for member in last] == [5]
+    assert cursor is None
+
+
+def test_query_returns_no_cursor_when_the_page_holds_every_match(cache):
+    members, cursor = cache.query(10, limit=5)
+
+    assert len(members) == 5
+    assert cursor is None
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_query_rejects_limits_below_one(cache, limit):
+    with pytest.raises(ValueError):
+        cache.query(10, limit=limit)
@@ -0,0 +1,256 @@
+import asyncio
+
+import pytest
+from synth import silence, voice, wav
+
+from ylb.capture import (
+    BoundedWaveSink,
+    CaptureQueue,
+    SpeakerBuffer,
+    SpeakerBufferPool,
+    UtteranceStitcher,
+    read_wav,
+)
+
+
+def duration(audio):
+    params, frames = read_wav(audio)
+    return params.nframes / params.framerate
+
+
+def test_window_ending_in_silence_passes_through():
+    stitcher = UtteranceStitcher(min_pause=0.3, max_carry=5)
+    window = wav(voice(0.6), silence(0.6))
+
+    assert stitcher.stitch({1: window}) == {1: window}
+
+
+def test_trailing_speech_is_carried_into_the_next_window():
+    stitcher = UtteranceStitcher(min_pause=0.3, max_carry=5)
+
+    first = stitcher.stitch({1: wav(voice(0.6), silence(0.6), voice(0.6))})
+    # Only the finished utterance is released; the one still being spoken is held
+    assert abs(duration(first[1]) - 1.2) < 0.05
+
+    second = stitcher.stitch({1: wav(voice(0.3), silence(0.9))})
+    # The held run is prepended to the speaker's next window
+    assert abs(duration(second[1]) - (0.6 + 1.2)) < 0.05
+    assert stitcher.stitch({1: wav(silence(0.6))}) == {1: wav(silence(0.6))}
+
+
+def test_window_that_is_all_speech_is_held_whole():
+    stitcher = UtteranceStitcher(min_pause=0.3, max_carry=5)
+
+    assert stitcher.stitch({1: wav(voice(0.9))}) == {}
+
+
+def test_held_audio_is_released_when_the_speaker_goes_quiet():
+    stitcher = UtteranceStitcher(min_pause=0.3, max_carry=5)
+    stitcher.stitch({1: wav(silence(0.3), voice(0.9))})
+
+    # Partial windows that do not cover the speaker keep holding
+    assert stitcher.stitch({2: wav(silence(0.6))}, release_absent=False) == {2: wav(silence(0.6))}
+
+    released = stitcher.stitch({2: wav(silence(0.6))})
+    assert set(released) == {1, 2}
+    assert abs(duration(released[1]) - 0.9) < 0.1
+
+
+def test_runs_longer_than_max_carry_are_not_held():
+    stitcher = UtteranceStitcher(min_pause=0.3, max_carry=0.5)
+    window = wav(silence(0.3), voice(0.9))
+
+    assert stitcher.stitch({1: window}) == {1: window}
+
+
+def test_unreadable_audio_passes_through():
+    stitcher = UtteranceStitcher()
+
+    assert stitcher.stitch({1: b"not a wav"}) == {1: b"not a wav"}
+
+
+def test_speaker_buffer_wraps_and_overwrites_the_oldest_audio():
+    buffer = SpeakerBuffer(8)
+
+    assert buffer.write(b"abcde") == 0
+    assert buffer.write(b"fgh") == 0
+    assert buffer.free == 0
+    assert buffer.write(b"ij") == 2
+    assert buffer.read() == b"cdefghij"
+
+    assert buffer.write(b"0123456789") == 10
+    assert buffer.read() == b"23456789"
+
+    buffer.clear()
+    assert buffer.read() == b""
+    assert buffer.free == 8
+
+
+def test_speaker_buffer_pool_reuses_buffers_within_its_cap():
+    pool = SpeakerBufferPool(max_seconds=1, max_bytes=2 * 4000, sample_rate=1000, channels=2, sample_width=2)
+
+    first, second = pool.acquire(), pool.acquire()
+    assert second is not first
+    assert second.capacity == 4000
+    assert pool.acquire() is None
+    first.write(b"data")
+    pool.release(first)
+
+    assert pool.acquire() is first
+    assert first.length == 0
+    assert pool.metrics()["allocated_bytes"] == 8000
+    assert pool.metrics()["peak_speakers"] == 2
+
+
+def make_pool(buffer_seconds=1, speakers=2):
+    # 1000 Hz mono 16-bit: 2000 bytes per second
+    return SpeakerBufferPool(
+        max_seconds=buffer_seconds,
+        max_bytes=speakers * buffer_seconds * 2000,
+        sample_rate=1000,
+        channels=1,
+        sample_width=2,
+    )
+
+
+def test_bounded_sink_drops_the_oldest_audio_when_full():
+    pool = make_pool()
+    sink = BoundedWaveSink(pool, overflow="drop_oldest")
+
+    sink.write(b"\x01\x00" * 800, 1)
+    sink.write(b"\x02\x00" * 800, 1)
+    sink.cleanup()
+
+    params, pcm = read_wav(sink.audio_data[1].file.getvalue())
+    assert params.framerate == 1000
+    assert pcm == b"\x01\x00" * 200 + b"\x02\x00" * 800
+    assert pool.metrics()["dropped_bytes"] == 1200
+    assert pool.in_use == 0
+
+
+def test_bounded_sink_flushes_full_buffers():
+    flushed = []
+    pool = make_pool()
+    sink = BoundedWaveSink(pool, overflow="flush", on_flush=lambda user, audio: flushed.append((user, audio)))
+
+    sink.write(b"\x01\x00" * 800, 1)
+    sink.write(b"\x02\x00" * 800, 1)
+    sink.cleanup()
+
+    assert [(user, read_wav(audio)[1]) for user, audio in flushed] == [(1, b"\x01\x00" * 800)]
+    assert read_wav(sink.audio_data[1].file.getvalue())[1] == b"\x02\x00" * 800
+    assert pool.metrics()["flushes"] == 1
+    assert pool.metrics()["dropped_bytes"] == 0
+
+
+def test_bounded_sink_skips_speakers_beyond_the_pool_cap():
+    pool = make_pool(speakers=1)
+    sink = BoundedWaveSink(pool, overflow="drop_oldest")
+
+    sink.write(b"\x01\x00" * 100, 1)
+    sink.write(b"\x02\x00" * 100, 2)
+    sink.cleanup()
+
+    assert list(sink.audio_data) == [1]
+    assert pool.metrics()["dropped_bytes"] == 200
+
+
+def test_flush_policy_requires_a_callback():
+    with pytest.raises(ValueError):
+        BoundedWaveSink(make_pool(), overflow="flush")
+
+
+class GatedHandler:
+    """Records handled windows; each call waits until ``gate`` is set, so windows pile up in the queue."""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.handled = []
+
+    async def __call__(self, windows, partial):
+        self.handled.append((windows, partial))
+        await self.gate.wait()
+
+
+async def fill(queue, handler):
+    """Starts the worker on window "a", then queues "b" so the one-slot queue is full."""
+    queue.start()
+    await queue.put({"a": wav(voice(0.1))})
+    await asyncio.sleep(0)
+    assert len(handler.handled) == 1
+    await queue.put({"b": wav(voice(0.1))})
+
+
+def test_capture_queue_coalesces_into_the_newest_window():
+    handler = GatedHandler()
+
+    async def main():
+        queue = CaptureQueue(handler, max_size=1, policy="coalesce")
+        await fill(queue, handler)
+        await queue.put({"b": wav(voice(0.2)), "c": wav(voice(0.1))}, partial=True)
+        assert queue.depth == 1
+        handler.gate.set()
+        await asyncio.sleep(0.05)
+        await queue.close()
+        return queue.metrics()
+
+    metrics = asyncio.run(main())
+
+    assert [sorted(windows) for windows, _ in handler.handled] == [["a"], ["b", "c"]]
+    merged, partial = handler.handled[1]
+    assert abs(duration(merged["b"]) - 0.3) < 0.01
+    assert not partial
+    assert metrics["coalesced"] == 1
+    assert metrics["processed"] == 2
+
+
+def test_capture_queue_drops_the_oldest_window():
+    handler = GatedHandler()
+
+    async def main():
+        queue = CaptureQueue(handler, max_size=1, policy="drop_oldest")
+        await fill(queue, handler)
+        await queue.put({"c": wav(voice(0.1))})
+        handler.gate.set()
+        await asyncio.sleep(0.05)
+        await queue.close()
+        return queue.metrics()
+
+    metrics = asyncio.run(main())
+
+    assert [list(windows) for windows, _ in handler.handled] == [["a"], ["c"]]
+    assert metrics["dropped"] == 1
+    assert metrics["enqueued"] == 3
+
+
+def test_capture_queue_blocks_the_producer_until_there_is_room():
+    handler = GatedHandler()
+
+    async def main():
+        queue = CaptureQueue(handler, max_size=1, policy="block")
+        await fill(queue, handler)
+        put = asyncio.create_task(queue.put({"c": wav(voice(0.1))}))
+        await asyncio.sleep(0.05)
+        assert not put.done()
+
+        handler.gate.set()
+        await asyncio.wait_for(put, 1)
+        await asyncio.sleep(0.05)
+        await queue.close()
+
+    asyncio.run(main())
+
+    assert [list(windows) for windows, _ in handler.handled] == [["a"], ["b"], ["c"]]
+
+
+def test_capture_queue_close_discards_queued_windows():
+    handler = GatedHandler()
+
+    async def main():
+        queue = CaptureQueue(handler, max_size=1, policy="drop_oldest")
+        await fill(queue, handler)
+        await queue.close()
+        return queue.depth
+
+    assert asyncio.run(main()) == 0
+    assert len(handler.handled) == 1
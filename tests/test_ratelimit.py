@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from ylb.ratelimit import ModerationScheduler, retry_after
+
+
+def rate_limited(headers):
+    response = SimpleNamespace(status=429, reason="Too Many Requests", headers=headers)
+    return discord.HTTPException(response, "You are being rate limited.")
+
+
+class FakeMember:
+    def __init__(self, member_id, errors=()):
+        self.id = member_id
+        self.display_name = f"member-{member_id}"
+        self.guild = SimpleNamespace(id=1)
+        self.errors = list(errors)
+        self.edits = []
+
+    async def edit(self, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.edits.append(kwargs)
+
+
+def test_retry_after_reads_response_headers():
+    assert retry_after(rate_limited({"Retry-After": "0.25"})) == 0.25
+    assert retry_after(rate_limited({"X-RateLimit-Reset-After": "1.5"})) == 1.5
+    assert retry_after(rate_limited({})) is None
+
+
+def test_edit_member_retries_when_discord_says_how_long():
+    member = FakeMember(1, errors=[rate_limited({"Retry-After": "0.01"})])
+    asyncio.run(ModerationScheduler().edit_member(member, mute=True))
+    assert member.edits == [{"mute": True}]
+
+
+def test_edit_member_does_not_guess_a_retry_delay():
+    member = FakeMember(1, errors=[rate_limited({})])
+    with pytest.raises(discord.HTTPException):
+        asyncio.run(ModerationScheduler().edit_member(member, mute=True))
+    assert member.edits == []
+
+
+def test_edit_members_coalesces_and_reports_counts():
+    ok, broken = FakeMember(1), FakeMember(2, errors=[RuntimeError("boom")])
+    reports = []
+
+    async def progress(done, total):
+        reports.append((done, total))
+
+    result = asyncio.run(
+        ModerationScheduler().edit_members(
+            [(ok, {"mute": True}), (ok, {"voice_channel": None}), (broken, {"mute": True})],
+            progress=progress,
+            progress_every=1,
+        )
+    )
+
+    assert ok.edits == [{"mute": True, "voice_channel": None}]
+    assert result["succeeded_count"] == 1
+    assert result["failed_count"] == 1
+    assert result["failed"] == {"member-2": "boom"}
+    assert reports[-1] == (2, 2)
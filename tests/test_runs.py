@@ -0,0 +1,159 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ylb import utils
+from ylb.engine import ConversationEngine
+from ylb.runs import TurnQueue
+
+
+class FakeThread:
+    """Records posted messages and runs; each run takes ``run_time`` seconds."""
+
+    def __init__(self, run_time=0.05):
+        self.run_time = run_time
+        self.posted = []
+        self.runs = 0
+
+    async def post_message(self, content, turns):
+        self.posted.append(content)
+
+    async def run_assistant(self, turns):
+        self.runs += 1
+        await asyncio.sleep(self.run_time)
+
+
+def make_queue(thread):
+    return TurnQueue("thread", thread.post_message, thread.run_assistant)
+
+
+def test_inputs_during_a_run_are_merged_and_posted_exactly_once():
+    thread = FakeThread()
+
+    async def main():
+        queue = make_queue(thread)
+        first = queue.submit("one")
+        await asyncio.sleep(0.01)
+        # Arrive while the first run is active
+        later = [queue.submit("two"), queue.submit("three", run=False), queue.submit("four")]
+        assert queue.depth == 3
+        await asyncio.gather(first, *later)
+        await queue.close()
+        return queue.metrics()
+
+    metrics = asyncio.run(main())
+
+    assert thread.posted == ["one", "two\nthree\nfour"]
+    assert thread.runs == 2
+    assert metrics["turns"] == 2
+    assert metrics["inputs"] == 4
+    assert metrics["max_depth"] == 3
+    assert metrics["depth"] == 0
+
+
+def test_inputs_without_run_are_posted_but_not_run():
+    thread = FakeThread()
+
+    async def main():
+        queue = make_queue(thread)
+        await queue.submit("context", run=False)
+
+    asyncio.run(main())
+    assert thread.posted == ["context"]
+    assert thread.runs == 0
+
+
+def test_failed_turn_fails_its_futures_and_queue_keeps_going():
+    thread = FakeThread()
+    calls = []
+
+    async def post_message(content, turns):
+        calls.append(content)
+        if content == "bad":
+            raise RuntimeError("post failed")
+
+    async def main():
+        queue = TurnQueue("thread", post_message, thread.run_assistant)
+        bad = queue.submit("bad")
+        with pytest.raises(RuntimeError):
+            await bad
+        await queue.submit("good")
+
+    asyncio.run(main())
+    assert calls == ["bad", "good"]
+    assert thread.runs == 1
+
+
+def test_submitting_does_not_wait_for_the_active_run():
+    thread = FakeThread(run_time=0.2)
+
+    async def main():
+        queue = make_queue(thread)
+        queue.submit("one")
+        await asyncio.sleep(0.01)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        future = queue.submit("two", run=False)
+        submitted = loop.time() - started
+        await future
+        await queue.close()
+        return submitted
+
+    assert asyncio.run(main()) < 0.05
+
+
+def test_close_waits_for_queued_turns():
+    thread = FakeThread()
+
+    async def main():
+        queue = make_queue(thread)
+        queue.submit("one")
+        queue.submit("two")
+        await queue.close()
+        assert not queue.busy
+
+    asyncio.run(main())
+    assert thread.posted == ["one\ntwo"]
+
+
+def test_tool_call_closing_its_own_queue_does_not_deadlock():
+    # leave_voice_channel closes the session's turn queue from inside a turn; the
+    # engine runs tool calls in gathered child tasks of the queue's worker
+    closed = []
+    queue = None
+
+    @utils.function_info
+    async def leave() -> str:
+        """
+        Leave.
+
+        :return: Done.
+        :rtype: string
+        """
+        await queue.close()
+        closed.append(True)
+        return "left"
+
+    engine = ConversationEngine([leave], "assistant", client=SimpleNamespace())
+    tool_call = SimpleNamespace(id="call", function=SimpleNamespace(name="leave", arguments="{}"))
+    run = SimpleNamespace(required_action=SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=[tool_call])))
+    outputs = []
+
+    async def post_message(content, turns):
+        pass
+
+    async def run_assistant(turns):
+        outputs.extend(await engine.dispatch_tool_calls("thread", run))
+
+    async def main():
+        nonlocal queue
+        queue = TurnQueue("thread", post_message, run_assistant)
+        await asyncio.wait_for(queue.submit("bye"), 1)
+        # Closing from outside still waits for the worker
+        await asyncio.wait_for(queue.close(), 1)
+
+    asyncio.run(main())
+
+    assert closed == [True]
+    assert outputs == [{"tool_call_id": "call", "output": "left"}]
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from ylb.storage import MemoryStorage, SQLiteStorage, Storage, create_storage
+
+
+def stored_guild(storage, guild_id):
+    if isinstance(storage, MemoryStorage):
+        return storage.instances[str(guild_id)]
+    row = storage.conn.execute("SELECT data FROM instances WHERE guild_id = ?", (str(guild_id),)).fetchone()
+    return json.loads(row[0])
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request):
+    return MemoryStorage() if request.param == "memory" else SQLiteStorage(":memory:")
+
+
+def test_member_deltas_update_member_list(storage):
+    storage.store_guild_info(1, {"name": "guild"}, [1, 2, 3])
+    storage.add_guild_members(1, [4, 5])
+    storage.remove_guild_members(1, [1])
+
+    assert storage.get_guild_member_ids(1) == {2, 3, 4, 5}
+
+
+def test_member_deltas_keep_member_count_current(storage):
+    storage.store_guild_info(1, {"name": "guild"}, [1, 2, 3])
+    assert stored_guild(storage, 1)["member_count"] == 3
+
+    storage.add_guild_members(1, [4, 5])
+    assert stored_guild(storage, 1)["member_count"] == 5
+
+    storage.remove_guild_members(1, [1, 2])
+    assert stored_guild(storage, 1) == {"name": "guild", "member_count": 3}
+
+
+def test_create_storage_selects_backend_by_name():
+    assert isinstance(create_storage("Memory"), MemoryStorage)
+    with pytest.raises(ValueError, match="Unknown storage backend 'nope'"):
+        create_storage("nope")
+
+
+def test_storage_interface_is_abstract():
+    with pytest.raises(TypeError):
+        Storage()
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+from ylb.streaming import DISCORD_MESSAGE_LIMIT, send_reply, split_message, stream_chat_completion
+
+
+class FakeMessage:
+    def __init__(self, channel):
+        self.channel = channel
+        self.content = None
+
+    async def reply(self, content):
+        return await self.channel.send(content)
+
+    async def edit(self, content):
+        self.content = content
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content):
+        message = FakeMessage(self)
+        message.content = content
+        self.sent.append(message)
+        return message
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeClient:
+    def __init__(self, chunks, error=None):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.chunks = chunks
+        self.error = error
+
+    async def create(self, **kwargs):
+        async def stream():
+            for text in self.chunks:
+                yield chunk(text)
+            if self.error:
+                raise self.error
+
+        return stream()
+
+
+def test_streams_reply_and_splits_long_text():
+    channel = FakeChannel()
+    text = ("word " * 500).strip()
+    response = asyncio.run(stream_chat_completion(FakeClient([text[:1000], text[1000:]]), FakeMessage(channel), []))
+
+    assert response == text
+    assert len(channel.sent) == 2
+    assert all(len(message.content) <= DISCORD_MESSAGE_LIMIT for message in channel.sent)
+    assert "".join(message.content for message in channel.sent) == text
+
+
+def test_failed_stream_sends_exactly_one_error_notice():
+    channel = FakeChannel()
+    response = asyncio.run(stream_chat_completion(FakeClient([], RuntimeError("down")), FakeMessage(channel), []))
+
+    # The failure is reported in the reply itself and not raised for callers to report again
+    assert response is None
+    assert [message.content for message in channel.sent] == ["⚠️ Sorry, I couldn't finish this reply."]
+
+
+def test_failed_stream_keeps_partial_text():
+    channel = FakeChannel()
+    asyncio.run(stream_chat_completion(FakeClient(["Hello"], RuntimeError("down")), FakeMessage(channel), []))
+
+    assert len(channel.sent) == 1
+    assert channel.sent[0].content.startswith("Hello\n\n⚠️")
+
+
+def test_split_message_keeps_parts_within_the_limit():
+    text = ("line of text\n" * 400).strip()
+    parts = split_message(text)
+
+    assert len(parts) == 3
+    assert all(len(part) <= DISCORD_MESSAGE_LIMIT for part in parts)
+    assert all(part.endswith("\n") for part in parts[:-1])
+    assert "".join(parts) == text
+    assert split_message("") == []
+
+
+def test_long_replies_continue_in_follow_up_messages():
+    channel = FakeChannel()
+    text = "x" * (DISCORD_MESSAGE_LIMIT + 10)
+
+    asyncio.run(send_reply(FakeMessage(channel), text))
+
+    assert [len(message.content) for message in channel.sent] == [DISCORD_MESSAGE_LIMIT, 10]
@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+from ylb import supervisor as supervisor_module
+from ylb.supervisor import TaskSupervisor
+
+
+def make_supervisor(**kwargs):
+    options = dict(initial_backoff=0.01, max_backoff=0.04, max_restarts=3, restart_window=10, healthy_after=10)
+    options.update(kwargs)
+    return TaskSupervisor(**options)
+
+
+def test_backoff_doubles_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(supervisor_module.random, "uniform", lambda low, high: 1.0)
+    supervisor = make_supervisor()
+
+    delays = [supervisor._backoff(SimpleNamespace(consecutive_failures=n)) for n in range(1, 6)]
+
+    assert delays == [0.01, 0.02, 0.04, 0.04, 0.04]
+
+
+def test_crashing_task_is_restarted_then_given_up_on():
+    attempts = []
+    failures = []
+
+    async def crash():
+        attempts.append(1)
+        raise RuntimeError("boom")
+
+    async def on_failure(error):
+        failures.append(error)
+
+    async def main():
+        supervisor = make_supervisor()
+        task = supervisor.start("crash", crash, on_failure=on_failure)
+        await asyncio.wait_for(task, 1)
+        await asyncio.sleep(0)
+        return supervisor.health()
+
+    health = asyncio.run(main())
+
+    # The first run plus max_restarts restarts
+    assert len(attempts) == 4
+    assert health["crash"]["state"] == "failed"
+    assert health["crash"]["restarts"] == 3
+    assert health["crash"]["last_error"] == "RuntimeError: boom"
+    assert failures == ["RuntimeError: boom"]
+
+
+def test_task_recovering_within_its_restart_limit_keeps_running():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("flaky")
+
+    async def main():
+        supervisor = make_supervisor()
+        await asyncio.wait_for(supervisor.start("flaky", flaky, on_failure=lambda error: 1 / 0), 1)
+        return supervisor.health()
+
+    # Tasks that return normally are not restarted and leave the health report
+    assert asyncio.run(main()) == {}
+    assert len(attempts) == 3
+
+
+def test_cancelled_task_is_not_restarted():
+    started = []
+
+    async def forever():
+        started.append(1)
+        await asyncio.Event().wait()
+
+    async def main():
+        supervisor = make_supervisor()
+        supervisor.start("forever", forever)
+        await asyncio.sleep(0.01)
+        assert supervisor.health()["forever"]["state"] == "running"
+        await supervisor.close()
+        await asyncio.sleep(0.02)
+        return supervisor.health()
+
+    assert asyncio.run(main()) == {}
+    assert len(started) == 1
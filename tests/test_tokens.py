@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ylb import utils
+from ylb.tokens import TokenAccountant
+
+
+class WordEncoding:
+    """Stands in for a tiktoken encoding: one token per word."""
+
+    def encode_ordinary(self, text):
+        return text.split()
+
+
+@pytest.fixture
+def accountant(monkeypatch):
+    monkeypatch.setattr(utils, "get_encoding_for_model", lambda model: WordEncoding())
+    return TokenAccountant(model="test", session_budget=10)
+
+
+def test_estimates_are_counted_by_category_and_source(accountant):
+    assert accountant.count("s1", 1, "prompt", "hello there") == 2
+    accountant.count("s1", 1, "tool_output", "a b c", source="search")
+    accountant.count("s1", 1, "tool_output", "d", source="weather")
+
+    totals = accountant.session_totals("s1")
+    assert totals["prompt"] == 2
+    assert totals["tool_output"] == 4
+    assert totals["total"] == 6
+    assert accountant.top_sources("s1", 2) == [(("tool_output", "search"), 3), (("prompt", "prompt"), 2)]
+
+    with pytest.raises(ValueError):
+        accountant.count("s1", 1, "other", "text")
+
+
+def test_budget_stops_the_session_once_reached(accountant):
+    accountant.count("s1", 1, "transcript", "one two three four five six seven eight nine")
+    assert not accountant.over_budget("s1")
+
+    accountant.count("s1", 1, "completion", "ten")
+    assert accountant.over_budget("s1")
+    assert not accountant.over_budget("s2")
+
+
+def test_billed_usage_replaces_estimates_for_the_budget(accountant):
+    accountant.count("s1", 1, "prompt", "one two three four five six seven eight nine ten eleven")
+    accountant.add_usage("s1", 1, SimpleNamespace(prompt_tokens=4, completion_tokens=2))
+
+    assert accountant.session_totals("s1")["total"] == 6
+    assert not accountant.over_budget("s1")
+
+
+def test_reading_unknown_sessions_does_not_create_them(accountant):
+    assert accountant.session_totals("missing")["total"] == 0
+    assert accountant.top_sources("missing") == []
+    assert accountant.guild_totals(1) == {}
+    assert not accountant._sessions
+
+
+def test_discarded_sessions_stay_in_guild_totals(accountant):
+    accountant.count("s1", 1, "prompt", "a b")
+    accountant.count("s2", 1, "prompt", "c")
+    accountant.count("s3", 2, "prompt", "d e f")
+
+    accountant.discard("s1")
+    accountant.discard("s1")
+
+    assert "s1" not in accountant._sessions
+    assert accountant.session_totals("s1")["total"] == 0
+    assert accountant.guild_totals(1)["total"] == 3
+    assert accountant.guild_totals(2)["total"] == 3
+
+
+def test_counts_after_discard_go_to_the_guild_without_recreating_the_session(accountant):
+    accountant.count("s1", 1, "prompt", "a b")
+    accountant.add_usage("s1", 1, SimpleNamespace(prompt_tokens=5, completion_tokens=1))
+    accountant.discard("s1")
+
+    # The rest of the run that ended the session, e.g. through the leave tool
+    accountant.count("s1", 1, "tool_output", "left the channel", source="leave_voice_channel")
+    accountant.add_usage("s1", 1, SimpleNamespace(prompt_tokens=7, completion_tokens=2))
+    accountant.count("s1", 1, "completion", "bye")
+
+    assert "s1" not in accountant._sessions
+    totals = accountant.guild_totals(1)
+    assert totals["tool_output"] == 3
+    assert totals["completion"] == 1
+    assert totals["runs"] == 2
+    assert totals["billed_prompt"] == 12
+    assert totals["total"] == 15
@@ -0,0 +1,29 @@
+import io
+
+import pytest
+from synth import voice, wav
+
+from ylb.transcription import encode_audio, encode_audio_with_encoder
+
+
+def test_wav_uploads_are_not_reencoded():
+    audio = wav(voice(0.3))
+
+    assert encode_audio_with_encoder(audio, "wav") == (audio, "none")
+
+
+def test_flac_is_lossless_and_reports_its_encoder():
+    soundfile = pytest.importorskip("soundfile")
+    audio = wav(voice(0.3))
+
+    encoded, encoder = encode_audio_with_encoder(audio, "flac")
+
+    assert encoder == "soundfile"
+    assert encoded == encode_audio(audio, "flac")
+    decoded, _ = soundfile.read(io.BytesIO(encoded), dtype="int16")
+    assert decoded.tobytes() == voice(0.3).tobytes()
+
+
+def test_unknown_upload_format_is_rejected():
+    with pytest.raises(ValueError):
+        encode_audio(wav(voice(0.3)), "mp3")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from synth import RATE, pcm, silence, voice
+
+from ylb.vad import contains_speech, speech_frames, speech_segments
+
+
+def test_speech_frames_marks_voiced_frames():
+    frames = speech_frames(pcm(silence(0.3), voice(0.6), silence(0.3)), RATE)
+
+    assert len(frames) == 40
+    assert not frames[:10].any()
+    assert frames[10:30].all()
+    assert not frames[30:].any()
+
+
+def test_quiet_and_noisy_frames_are_rejected_before_the_vad():
+    rng = np.random.default_rng(0)
+    hiss = rng.integers(-8000, 8000, RATE, dtype=np.int16)
+
+    assert not speech_frames(pcm(voice(0.6) // 1000), RATE).any()
+    assert not speech_frames(pcm(hiss), RATE, max_zero_crossing_rate=0.3).any()
+
+
+def test_first_only_stops_after_the_first_speech_frame():
+    frames = speech_frames(pcm(silence(0.3), voice(0.6)), RATE, first_only=True)
+
+    assert np.flatnonzero(frames).tolist() == [10]
+
+
+def test_stereo_audio_is_downmixed():
+    mono = voice(0.6)
+    stereo = np.stack([mono, mono], axis=1).reshape(-1)
+
+    assert speech_frames(stereo.tobytes(), RATE, channels=2).all()
+
+
+def test_unsupported_frame_duration_is_rejected():
+    with pytest.raises(ValueError):
+        speech_frames(pcm(voice(0.3)), RATE, frame_duration=25)
+
+
+def test_contains_speech():
+    assert contains_speech(pcm(silence(0.3), voice(0.3)), RATE)
+    assert not contains_speech(pcm(silence(0.6)), RATE)
+
+
+def test_speech_segments_are_timestamped_and_merged_across_short_pauses():
+    audio = pcm(silence(0.3), voice(0.6), silence(0.6), voice(0.3), silence(0.15), voice(0.3))
+
+    assert speech_segments(audio, RATE, min_pause=0.3) == [(0.3, 0.9), (1.5, 2.25)]
+
+
+def test_speech_segments_drops_short_segments():
+    audio = pcm(silence(0.3), voice(0.06), silence(0.6), voice(0.6))
+
+    assert speech_segments(audio, RATE, min_pause=0.3, min_speech=0.1) == [(0.96, 1.56)]
+    assert speech_segments(pcm(silence(0.6)), RATE) == []
@@ -0,0 +1,48 @@
+import asyncio
+
+from synth import silence, voice, wav
+
+from ylb.capture import read_wav
+from ylb.wake import ProbeWakeDetector
+
+
+class FakeTranscriber:
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+
+    async def __call__(self, audio):
+        self.calls.append(audio)
+        return self.text
+
+
+def test_probe_transcribes_only_a_short_slice_of_speech():
+    transcribe = FakeTranscriber("Hey Bartender, what's up")
+    detector = ProbeWakeDetector(transcribe, phrase="bartender", probe_seconds=1.0)
+
+    woke, transcript = asyncio.run(detector.detect(wav(silence(2.0), voice(4.0))))
+
+    assert woke
+    # The window itself is transcribed in full on wake
+    assert transcript is None
+    params, pcm = read_wav(transcribe.calls[0])
+    assert params.nframes / params.framerate == 1.0
+    # The slice starts shortly before the speech, not at the start of the window
+    assert pcm[: int(0.1 * params.framerate) * 2] == silence(0.1).tobytes()
+    assert pcm[-200:] != silence(0.1).tobytes()[:200]
+
+
+def test_probe_skips_windows_without_speech():
+    transcribe = FakeTranscriber("bartender")
+    detector = ProbeWakeDetector(transcribe, phrase="bartender")
+
+    assert asyncio.run(detector.detect(wav(silence(3.0)))) == (False, "")
+    assert transcribe.calls == []
+
+
+def test_probe_without_the_phrase_does_not_wake():
+    detector = ProbeWakeDetector(FakeTranscriber("just chatting"), phrase="bartender")
+
+    woke, _ = asyncio.run(detector.detect(wav(voice(1.0))))
+
+    assert not woke
@@ -0,0 +1,68 @@
+"""
+Compares transcription upload formats.
+
+For each format the audio is encoded several times to measure encode CPU
+time and the size of the request body, and to show which encoder ran
+(the Opus bitrate only applies to ffmpeg). With --upload the encoded audio is
+also sent to the OpenAI transcription endpoint to measure request latency.
+
+    python tools/benchmark_upload_formats.py recording.wav --runs 5 --upload
+"""
+import time
+import argparse
+import statistics
+
+from ylb import config
+from ylb.capture import prepare_for_transcription
+from ylb.transcription import UPLOAD_FORMATS, encode_audio_with_encoder
+
+
+def benchmark(wav, upload_format, runs, upload):
+    encode_times, cpu_times, upload_times = [], [], []
+    for _ in range(runs):
+        started, cpu_started = time.perf_counter(), time.process_time()
+        audio, encoder = encode_audio_with_encoder(wav, upload_format)
+        encode_times.append(time.perf_counter() - started)
+        cpu_times.append(time.process_time() - cpu_started)
+
+        if upload:
+            from ylb import openai_client as client
+
+            started = time.perf_counter()
+            client.audio.transcriptions.create(
+                model=config.OPENAI_VOICE_MODEL, file=(f"audio.{upload_format}", audio), response_format="text"
+            )
+            upload_times.append(time.perf_counter() - started)
+
+    return {
+        "format": upload_format,
+        "encoder": encoder,
+        "bytes": len(audio),
+        "ratio": len(wav) / len(audio),
+        "encode_ms": statistics.median(encode_times) * 1000,
+        "cpu_ms": statistics.median(cpu_times) * 1000,
+        "request_ms": statistics.median(upload_times) * 1000 if upload_times else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare transcription upload formats.")
+    parser.add_argument("wav", help="16-bit PCM WAV file to encode")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per format")
+    parser.add_argument("--raw", action="store_true", help="Skip silence trimming and resampling")
+    parser.add_argument("--upload", action="store_true", help="Also time transcription requests (uses the API)")
+    args = parser.parse_args()
+
+    with open(args.wav, "rb") as f:
+        wav = f.read()
+    if not args.raw:
+        wav = prepare_for_transcription(wav) or wav
+
+    print(f"{'format':<8}{'encoder':<11}{'bytes':>10}{'ratio':>8}{'encode ms':>12}{'cpu ms':>10}{'request ms':>13}")
+    for upload_format in UPLOAD_FORMATS:
+        result = benchmark(wav, upload_format, args.runs, args.upload)
+        request_ms = f"{result['request_ms']:.0f}" if result["request_ms"] is not None else "-"
+        print(
+            f"{result['format']:<8}{result['encoder']:<11}{result['bytes']:>10}{result['ratio']:>8.1f}"
+            f"{result['encode_ms']:>12.1f}{result['cpu_ms']:>10.1f}{request_ms:>13}"
+        )
@@ -1,4 +1,5 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from ylb import config
 
 openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
+async_openai_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
@@ -0,0 +1,121 @@
+import json
+import time
+import asyncio
+import logging
+
+from ylb import config
+
+
+class MentionBatcher:
+    """
+    Coalesces bursts of messages in the same channel into a single batch.
+
+    Each new message restarts a short debounce window for its channel. When
+    the window passes without new messages (or the batch has waited
+    ``max_wait`` seconds, or reached ``max_batch`` messages) the handler is
+    called once with every message collected, so one model call can answer
+    them all.
+    """
+
+    def __init__(self, handler, window=None, max_wait=None, max_batch=None):
+        """
+        Args:
+            handler (callable): Coroutine called with the list of batched messages.
+            window (float, optional): Seconds of quiet that close a batch.
+            max_wait (float, optional): Maximum seconds a batch is held open.
+            max_batch (int, optional): Maximum number of messages in a batch.
+        """
+        self.handler = handler
+        self.window = window if window is not None else config.TEXT_BATCH_WINDOW
+        self.max_wait = max_wait if max_wait is not None else config.TEXT_BATCH_MAX_WAIT
+        self.max_batch = max_batch or config.TEXT_BATCH_MAX_SIZE
+        self._pending = {}
+        self._timers = {}
+        self.batches = 0
+        self.messages = 0
+
+    def submit(self, message):
+        """
+        Adds a message to its channel's pending batch.
+
+        Args:
+            message (discord.Message): The message to batch.
+        """
+        channel_id = message.channel.id
+        started, messages = self._pending.setdefault(channel_id, (time.monotonic(), []))
+        messages.append(message)
+        self.messages += 1
+
+        timer = self._timers.get(channel_id)
+        if timer:
+            timer.cancel()
+
+        if len(messages) >= self.max_batch:
+            delay = 0
+        else:
+            delay = min(self.window, max(0, started + self.max_wait - time.monotonic()))
+        self._timers[channel_id] = asyncio.create_task(self._flush_after(channel_id, delay))
+
+    async def _flush_after(self, channel_id, delay):
+        await asyncio.sleep(delay)
+        self._timers.pop(channel_id, None)
+        _, messages = self._pending.pop(channel_id, (None, []))
+        if not messages:
+            return
+
+        self.batches += 1
+        if len(messages) > 1:
+            logging.info(f"Coalesced {len(messages)} messages in channel {channel_id} into one batch")
+        try:
+            await self.handler(messages)
+        except Exception as e:
+            logging.error(f"Error handling message batch in channel {channel_id}: {e}")
+
+
+BATCH_REPLY_PROMPT = (
+    "Several users wrote to you at nearly the same time. Each of their messages "
+    "is prefixed with its message_id. Answer every message that needs an answer. "
+    'Respond with a JSON object of the form {"replies": [{"message_id": "<id>", '
+    '"reply": "<text>"}]}. Messages that are fully answered by another reply may be omitted.'
+)
+
+
+def format_batch(messages):
+    """
+    Formats a batch of messages as a single user turn.
+
+    Args:
+        messages (list): The batched Discord messages.
+
+    Returns:
+        str: One line per message, tagged with its ID and author.
+    """
+    return "\n".join(
+        f"[message_id: {message.id}] {message.author.display_name}: {message.content}"
+        for message in messages
+    )
+
+
+def parse_batch_replies(raw, messages):
+    """
+    Maps a batched JSON completion back onto the messages it answers.
+
+    Args:
+        raw (str): The completion text, expected to follow BATCH_REPLY_PROMPT.
+        messages (list): The batched Discord messages.
+
+    Returns:
+        list: ``(message, reply)`` pairs. If the completion cannot be parsed the
+        whole text is returned as a reply to the latest message.
+    """
+    by_id = {str(message.id): message for message in messages}
+    try:
+        replies = [
+            (by_id[str(entry["message_id"])], entry["reply"])
+            for entry in json.loads(raw).get("replies", [])
+            if str(entry.get("message_id")) in by_id and entry.get("reply")
+        ]
+    except (ValueError, AttributeError, TypeError, KeyError) as e:
+        logging.warning(f"Failed to parse batched replies: {e}")
+        replies = []
+    return replies or [(messages[-1], raw)]
@@ -0,0 +1,454 @@
+import bisect
+import logging
+from collections import OrderedDict
+
+from ylb import config
+
+
+class MemberCache:
+    """
+    In-memory index of guild members, keyed by guild ID and user ID.
+
+    The index is filled from the gateway member cache and kept current from
+    member, presence and voice events. Name lookups in the audio path never
+    need a REST request unless a member has not been seen yet, and member
+    listing tools can filter and paginate over lightweight precomputed
+    records instead of walking ``guild.members``.
+    """
+
+    # Fields a member record exposes to callers
+    FIELDS = (
+        "id",
+        "display_name",
+        "nick",
+        "username",
+        "status",
+        "roles",
+        "role_ids",
+        "voice_channel_id",
+        "joined_at",
+        "bot",
+    )
+
+    def __init__(self):
+        self._guilds = {}
+        self._sorted_ids = {}
+
+    def load_guild(self, guild):
+        """
+        Loads every member currently known to the gateway for a guild.
+
+        Args:
+            guild (discord.Guild): The guild to load.
+        """
+        self._guilds[guild.id] = {
+            member.id: self._record(member) for member in guild.members
+        }
+        self._sorted_ids[guild.id] = sorted(self._guilds[guild.id])
+        logging.info(f"Cached {len(self._guilds[guild.id])} members of guild {guild.id}")
+
+    def drop_guild(self, guild_id):
+        """
+        Forgets every cached member of a guild.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        self._guilds.pop(guild_id, None)
+        self._sorted_ids.pop(guild_id, None)
+
+    def update(self, member):
+        """
+        Adds or refreshes a single member.
+
+        Args:
+            member (discord.Member): The member to cache.
+        """
+        members = self._guilds.setdefault(member.guild.id, {})
+        if member.id not in members:
+            bisect.insort(self._sorted_ids.setdefault(member.guild.id, []), member.id)
+        members[member.id] = self._record(member)
+
+    def remove(self, guild_id, user_id):
+        """
+        Removes a single member.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            user_id (int): The ID of the member.
+        """
+        if self._guilds.get(guild_id, {}).pop(user_id, None) is not None:
+            sorted_ids = self._sorted_ids[guild_id]
+            del sorted_ids[bisect.bisect_left(sorted_ids, user_id)]
+
+    def get(self, guild_id, user_id):
+        """
+        Returns the cached record of a member.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            user_id (int): The ID of the member.
+
+        Returns:
+            dict or None: The member's record, or None if not cached.
+        """
+        return self._guilds.get(guild_id, {}).get(user_id)
+
+    def query(
+        self,
+        guild_id,
+        status=None,
+        role=None,
+        in_voice=None,
+        name_prefix=None,
+        fields=None,
+        limit=50,
+        cursor=None,
+    ):
+        """
+        Lists cached members of a guild matching the given filters, ordered by ID.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            status (str, optional): Only include members with this status (online, idle, dnd, offline).
+            role (str, optional): Only include members with a role of this name or ID.
+            in_voice (bool, optional): Only include members that are (True) or are not (False) in a voice channel.
+            name_prefix (str, optional): Only include members whose display name, nickname or username starts with this.
+            fields (list, optional): Record fields to return. Defaults to every field. The ID is always
+                returned, since it is the paging key.
+            limit (int, optional): Maximum number of members to return. Must be at least 1.
+            cursor (int, optional): Only include members with an ID greater than this (the previous page's cursor).
+
+        Returns:
+            tuple: The list of matching member records and the cursor of the next page (None on the last page).
+
+        Raises:
+            ValueError: If ``limit`` is less than 1.
+        """
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        members = self._guilds.get(guild_id, {})
+        sorted_ids = self._sorted_ids.get(guild_id, [])
+        fields = ["id"] + [field for field in (fields or self.FIELDS) if field in self.FIELDS and field != "id"]
+        role = str(role).lower() if role else None
+        name_prefix = name_prefix.lower() if name_prefix else None
+
+        results = []
+        start = bisect.bisect_right(sorted_ids, int(cursor)) if cursor else 0
+        for index in range(start, len(sorted_ids)):
+            record = members[sorted_ids[index]]
+            if status and record["status"] != status:
+                continue
+            if role and role not in record["_role_keys"]:
+                continue
+            if in_voice is not None and (record["voice_channel_id"] is not None) != in_voice:
+                continue
+            if name_prefix and not any(
+                name.startswith(name_prefix) for name in record["_names"]
+            ):
+                continue
+            if len(results) == limit:
+                # Another match exists, so hand out a cursor for the next page
+                return results, results[-1]["id"]
+            results.append({field: record[field] for field in fields})
+        return results, None
+
+    @staticmethod
+    def _record(member):
+        roles = [role for role in member.roles if not role.is_default()]
+        names = [member.display_name, member.nick, member.name]
+        return {
+            "id": member.id,
+            "display_name": member.display_name,
+            "nick": member.nick,
+            "username": member.name,
+            "status": str(member.status),
+            "roles": [role.name for role in roles],
+            "role_ids": [role.id for role in roles],
+            "voice_channel_id": member.voice.channel.id if member.voice and member.voice.channel else None,
+            "joined_at": str(member.joined_at),
+            "bot": member.bot,
+            # Precomputed lookup keys used by query()
+            "_names": [name.lower() for name in names if name],
+            "_role_keys": {role.name.lower() for role in roles} | {str(role.id) for role in roles},
+        }
+
+
+class ChannelIndex:
+    """
+    Dict index of guild channels by channel ID.
+
+    Avoids scanning every channel of every guild when a tool resolves a
+    channel ID. The index is rebuilt per guild on ready/guild join and kept
+    current from channel create/update/delete events.
+    """
+
+    def __init__(self):
+        self._channels = {}
+
+    def load_guild(self, guild):
+        """
+        Indexes every channel of a guild.
+
+        Args:
+            guild (discord.Guild): The guild to index.
+        """
+        for channel in guild.channels:
+            self._channels[channel.id] = channel
+
+    def drop_guild(self, guild_id):
+        """
+        Removes every indexed channel belonging to a guild.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        self._channels = {
+            channel_id: channel
+            for channel_id, channel in self._channels.items()
+            if channel.guild.id != guild_id
+        }
+
+    def add(self, channel):
+        """
+        Adds or replaces a channel in the index.
+
+        Args:
+            channel (discord.abc.GuildChannel): The channel to index.
+        """
+        self._channels[channel.id] = channel
+
+    def remove(self, channel_id):
+        """
+        Removes a channel from the index.
+
+        Args:
+            channel_id (int): The ID of the channel.
+        """
+        self._channels.pop(channel_id, None)
+
+    def get(self, channel_id):
+        """
+        Returns an indexed channel.
+
+        Args:
+            channel_id (int): The ID of the channel.
+
+        Returns:
+            discord.abc.GuildChannel or None: The channel if indexed, otherwise None.
+        """
+        return self._channels.get(channel_id)
+
+
+class MessageCache:
+    """
+    Bounded LRU cache of recently seen messages.
+
+    Alongside the message objects it keeps a larger, equally bounded map of
+    message ID to channel ID, so a message that has been evicted (or was
+    never cached by the client) can still be fetched with a single REST
+    request against the right channel.
+    """
+
+    def __init__(self, max_messages=None, max_locations=None):
+        self.max_messages = max_messages or config.DISCORD_MESSAGE_CACHE_SIZE
+        self.max_locations = max_locations or config.DISCORD_MESSAGE_LOCATION_CACHE_SIZE
+        self._messages = OrderedDict()
+        self._locations = OrderedDict()
+
+    def add(self, message):
+        """
+        Caches a message, evicting the least recently used entries if full.
+
+        Args:
+            message (discord.Message): The message to cache.
+        """
+        self._messages[message.id] = message
+        self._messages.move_to_end(message.id)
+        if len(self._messages) > self.max_messages:
+            self._messages.popitem(last=False)
+        self.remember_location(message.id, message.channel.id)
+
+    def remember_location(self, message_id, channel_id):
+        """
+        Records which channel a message belongs to.
+
+        Args:
+            message_id (int): The ID of the message.
+            channel_id (int): The ID of the channel the message was sent in.
+        """
+        self._locations[message_id] = channel_id
+        self._locations.move_to_end(message_id)
+        if len(self._locations) > self.max_locations:
+            self._locations.popitem(last=False)
+
+    def remove(self, message_id):
+        """
+        Removes a message and its location from the cache.
+
+        Args:
+            message_id (int): The ID of the message.
+        """
+        self._messages.pop(message_id, None)
+        self._locations.pop(message_id, None)
+
+    def get(self, message_id):
+        """
+        Returns a cached message and marks it as recently used.
+
+        Args:
+            message_id (int): The ID of the message.
+
+        Returns:
+            discord.Message or None: The message if cached, otherwise None.
+        """
+        message = self._messages.get(message_id)
+        if message is not None:
+            self._messages.move_to_end(message_id)
+        return message
+
+    def channel_id_for(self, message_id):
+        """
+        Returns the ID of the channel a message was seen in.
+
+        Args:
+            message_id (int): The ID of the message.
+
+        Returns:
+            int or None: The channel ID if known, otherwise None.
+        """
+        return self._locations.get(message_id)
+
+
+class ChannelHistory:
+    """
+    Rolling per-channel buffer of recent messages.
+
+    Kept current from message create/edit/delete events so prompt assembly
+    can read recent channel history from memory instead of paging
+    ``channel.history`` over REST on every message.
+    """
+
+    def __init__(self, max_messages=None):
+        self.max_messages = max_messages or config.DISCORD_HISTORY_MAX_MESSAGES
+        self._channels = {}
+        self._seeded = set()
+
+    def is_seeded(self, channel_id):
+        """
+        Returns whether a channel's buffer has been seeded from its history.
+
+        Args:
+            channel_id (int): The ID of the channel.
+
+        Returns:
+            bool: True if the buffer has been seeded.
+        """
+        return channel_id in self._seeded
+
+    def seed(self, channel_id, messages):
+        """
+        Fills a channel's buffer from previously fetched history.
+
+        Messages already buffered from live events are kept.
+
+        Args:
+            channel_id (int): The ID of the channel.
+            messages (list): Messages fetched from the channel, in any order.
+        """
+        buffer = self._channels.setdefault(channel_id, OrderedDict())
+        live = list(buffer.items())
+        buffer.clear()
+        for message in sorted(messages, key=lambda message: message.id):
+            buffer[message.id] = (message.author.name, message.content)
+        for message_id, entry in live:
+            buffer[message_id] = entry
+        while len(buffer) > self.max_messages:
+            buffer.popitem(last=False)
+        self._seeded.add(channel_id)
+
+    def add(self, message):
+        """
+        Appends a new message to its channel's buffer.
+
+        Args:
+            message (discord.Message): The message to buffer.
+        """
+        buffer = self._channels.setdefault(message.channel.id, OrderedDict())
+        buffer[message.id] = (message.author.name, message.content)
+        if len(buffer) > self.max_messages:
+            buffer.popitem(last=False)
+
+    def edit(self, message):
+        """
+        Updates a buffered message after an edit.
+
+        Args:
+            message (discord.Message): The edited message.
+        """
+        buffer = self._channels.get(message.channel.id, {})
+        if message.id in buffer:
+            buffer[message.id] = (message.author.name, message.content)
+
+    def delete(self, channel_id, message_id):
+        """
+        Removes a deleted message from its channel's buffer.
+
+        Args:
+            channel_id (int): The ID of the channel.
+            message_id (int): The ID of the deleted message.
+        """
+        self._channels.get(channel_id, {}).pop(message_id, None)
+
+    def recent(self, channel_id, x):
+        """
+        Returns the last X buffered messages of a channel, newest first.
+
+        Args:
+            channel_id (int): The ID of the channel.
+            x (int): The number of messages to return.
+
+        Returns:
+            list: ``(author name, content)`` tuples.
+        """
+        buffer = self._channels.get(channel_id, {})
+        return list(reversed(buffer.values()))[:x]
+
+
+class PresenceSnapshot:
+    """
+    Cached list of online member display names per guild.
+
+    The snapshot is rebuilt lazily the first time it is read after a
+    presence or membership change invalidated it.
+    """
+
+    def __init__(self):
+        self._online = {}
+
+    def invalidate(self, guild_id):
+        """
+        Marks a guild's snapshot as stale.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        self._online.pop(guild_id, None)
+
+    def online_users(self, guild):
+        """
+        Returns the display names of a guild's online members.
+
+        Args:
+            guild (discord.Guild): The guild.
+
+        Returns:
+            list: Display names of online members.
+        """
+        if guild.id not in self._online:
+            self._online[guild.id] = [
+                member.display_name
+                for member in guild.members
+                if str(member.status) == "online"
+            ]
+        return self._online[guild.id]
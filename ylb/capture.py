@@ -0,0 +1,601 @@
+import io
+import time
+import wave
+import asyncio
+import logging
+import threading
+from collections import deque
+
+import discord
+import numpy as np
+
+from ylb import config
+from ylb.vad import speech_frames, speech_segments, to_mono
+
+
+def read_wav(wav):
+    """
+    Splits WAV bytes into their parameters and raw PCM frames.
+
+    Args:
+        wav (bytes): The WAV audio.
+
+    Returns:
+        tuple: The ``wave`` parameters and the raw PCM bytes.
+    """
+    with wave.open(io.BytesIO(wav), "rb") as wf:
+        return wf.getparams(), wf.readframes(wf.getnframes())
+
+
+def write_wav(params, pcm):
+    """
+    Builds WAV bytes from parameters and raw PCM frames.
+
+    Args:
+        params (wave._wave_params): The ``wave`` parameters of the audio.
+        pcm (bytes): The raw PCM frames.
+
+    Returns:
+        bytes: The WAV audio.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(params.nchannels)
+        wf.setsampwidth(params.sampwidth)
+        wf.setframerate(params.framerate)
+        wf.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def resample(samples, from_rate, to_rate):
+    """
+    Resamples mono audio.
+
+    Integer downsampling ratios (48 kHz to 16 kHz) average each block of
+    samples before decimating, which doubles as a simple anti-aliasing
+    filter. Other ratios use linear interpolation.
+
+    Args:
+        samples (numpy.ndarray): Mono int16 samples.
+        from_rate (int): Sample rate of the input.
+        to_rate (int): Target sample rate.
+
+    Returns:
+        numpy.ndarray: The resampled int16 samples.
+    """
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    if from_rate % to_rate == 0:
+        factor = from_rate // to_rate
+        blocks = samples[: len(samples) // factor * factor].reshape(-1, factor)
+        return blocks.mean(axis=1).astype(np.int16)
+    duration = len(samples) / from_rate
+    positions = np.arange(int(duration * to_rate)) * from_rate / to_rate
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+
+
+def prepare_for_transcription(wav, sample_rate=None, padding=None):
+    """
+    Reduces a recorded window to the audio a transcriber needs.
+
+    Non-speech regions are cut using the VAD segments (keeping a little
+    padding around each so word edges survive), and the remaining speech is
+    downmixed to mono and resampled to the configured rate.
+
+    Args:
+        wav (bytes): The recorded window as 16-bit PCM WAV bytes.
+        sample_rate (int, optional): Target sample rate. Defaults to CONTINUOUS_LISTEN_SAMPLE_RATE.
+        padding (float, optional): Seconds of audio kept around each speech segment.
+
+    Returns:
+        bytes or None: Mono WAV bytes containing only speech, or None if the window has no speech.
+    """
+    sample_rate = sample_rate or config.CONTINUOUS_LISTEN_SAMPLE_RATE
+    padding = config.CONTINUOUS_LISTEN_TRIM_PADDING if padding is None else padding
+
+    params, pcm = read_wav(wav)
+    if params.sampwidth != 2:
+        return wav
+
+    samples = to_mono(pcm, params.nchannels)
+    segments = speech_segments(samples.tobytes(), params.framerate)
+    if not segments:
+        return None
+
+    pieces = []
+    end = 0
+    for start, stop in segments:
+        start = max(int((start - padding) * params.framerate), end)
+        end = min(int((stop + padding) * params.framerate), len(samples))
+        pieces.append(samples[start:end])
+    speech = resample(np.concatenate(pieces), params.framerate, sample_rate)
+
+    return write_wav(params._replace(nchannels=1, framerate=sample_rate), speech.tobytes())
+
+
+class UtteranceStitcher:
+    """
+    Carries speech that runs across a recording window boundary into the next window.
+
+    Recording windows have fixed lengths, so a sentence (or the activation
+    phrase itself) that is still being spoken when a window stops would be
+    transcribed as two halves. When VAD shows a speaker's window ending in
+    speech, the trailing voiced run (everything after the last pause) is held
+    back and prepended to that speaker's next window. A held run is released
+    on its own if the speaker is silent in the next window, and runs longer
+    than ``max_carry`` seconds are never held so continuous talkers are not
+    delayed indefinitely.
+    """
+
+    FRAME_DURATION = 30
+
+    def __init__(self, min_pause=None, max_carry=None):
+        """
+        Args:
+            min_pause (float, optional): Seconds of silence that end an utterance.
+            max_carry (float, optional): Maximum seconds of trailing speech carried into the next window.
+        """
+        self.min_pause = min_pause if min_pause is not None else config.CONTINUOUS_LISTEN_STITCH_MIN_PAUSE
+        self.max_carry = max_carry if max_carry is not None else config.CONTINUOUS_LISTEN_STITCH_MAX_CARRY
+        self._carry = {}
+
+    def stitch(self, windows, release_absent=True):
+        """
+        Stitches a set of per-speaker recording windows to the previous set.
+
+        Args:
+            windows (dict): WAV bytes of the new window, keyed by speaker ID.
+            release_absent (bool, optional): Release audio held for speakers missing from ``windows``.
+                Disabled for partial windows that only cover some speakers.
+
+        Returns:
+            dict: WAV bytes ready to transcribe, keyed by speaker ID. Speakers whose
+            whole window was carried over are omitted.
+        """
+        stitched = {}
+
+        # Speakers that went quiet: release what was held for them
+        for user_id in list(self._carry):
+            if release_absent and user_id not in windows:
+                params, pcm = self._carry.pop(user_id)
+                stitched[user_id] = write_wav(params, pcm)
+
+        for user_id, wav in windows.items():
+            try:
+                params, pcm = read_wav(wav)
+            except (wave.Error, EOFError) as e:
+                logging.warning(f"Failed to read audio of {user_id} for stitching: {e}")
+                stitched[user_id] = wav
+                continue
+
+            carried = self._carry.pop(user_id, None)
+            if carried and carried[0][:3] == params[:3]:
+                pcm = carried[1] + pcm
+
+            head, tail = self._split_trailing_speech(params, pcm)
+            if tail:
+                self._carry[user_id] = (params, tail)
+            if head:
+                stitched[user_id] = write_wav(params, head)
+
+        return stitched
+
+    def _split_trailing_speech(self, params, pcm):
+        if params.sampwidth != 2:
+            return pcm, b""
+
+        frames = speech_frames(pcm, params.framerate, params.nchannels, self.FRAME_DURATION)
+        if len(frames) == 0 or not frames[-1]:
+            return pcm, b""
+
+        # Find where the trailing voiced run starts: after the last long enough pause
+        min_pause_frames = max(1, int(self.min_pause * 1000 / self.FRAME_DURATION))
+        start = 0
+        silent = 0
+        for index in range(len(frames) - 1, -1, -1):
+            if frames[index]:
+                silent = 0
+                continue
+            silent += 1
+            if silent >= min_pause_frames:
+                start = index + silent
+                break
+
+        if (len(frames) - start) * self.FRAME_DURATION / 1000 > self.max_carry:
+            return pcm, b""
+
+        frame_bytes = int(params.framerate * self.FRAME_DURATION / 1000) * params.sampwidth * params.nchannels
+        split = start * frame_bytes
+        return pcm[:split], pcm[split:]
+
+
+class SpeakerBuffer:
+    """
+    Fixed-size ring buffer of raw PCM audio for one speaker.
+
+    The backing ``bytearray`` is allocated once and written through a
+    ``memoryview``, so recording never grows or copies the buffer. When it
+    is full the oldest audio is overwritten.
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity (int): Size of the buffer in bytes.
+        """
+        self.capacity = capacity
+        self._data = bytearray(capacity)
+        self._view = memoryview(self._data)
+        self._start = 0
+        self.length = 0
+
+    @property
+    def free(self):
+        """Number of bytes that can be written without overwriting audio."""
+        return self.capacity - self.length
+
+    def write(self, data):
+        """
+        Appends audio, overwriting the oldest audio if the buffer is full.
+
+        Args:
+            data (bytes): Raw PCM audio.
+
+        Returns:
+            int: Number of bytes of older audio that were overwritten.
+        """
+        size = len(data)
+        if size >= self.capacity:
+            dropped = self.length + size - self.capacity
+            self._view[:] = data[size - self.capacity :]
+            self._start, self.length = 0, self.capacity
+            return dropped
+
+        dropped = max(0, size - self.free)
+        self._start = (self._start + dropped) % self.capacity
+        self.length -= dropped
+
+        end = (self._start + self.length) % self.capacity
+        first = min(size, self.capacity - end)
+        self._view[end : end + first] = data[:first]
+        self._view[: size - first] = data[first:]
+        self.length += size
+        return dropped
+
+    def read(self):
+        """
+        Returns the buffered audio, oldest first.
+
+        Returns:
+            bytes: The buffered PCM audio.
+        """
+        end = self._start + self.length
+        if end <= self.capacity:
+            return bytes(self._view[self._start : end])
+        return bytes(self._view[self._start :]) + bytes(self._view[: end - self.capacity])
+
+    def clear(self):
+        """Empties the buffer without releasing its memory."""
+        self._start = 0
+        self.length = 0
+
+
+class SpeakerBufferPool:
+    """
+    Reusable speaker buffers shared by every recording window of a voice session.
+
+    Buffers are allocated the first time they are needed and handed back
+    after each window, so a session reuses the same memory for its whole
+    lifetime. The total allocation is capped at ``max_bytes``; speakers
+    beyond the cap are not recorded until a buffer frees up.
+    """
+
+    def __init__(self, max_seconds=None, max_bytes=None, sample_rate=48000, channels=2, sample_width=2):
+        """
+        Args:
+            max_seconds (float, optional): Seconds of audio held per speaker.
+            max_bytes (int, optional): Maximum bytes allocated across all buffers.
+            sample_rate (int, optional): Sample rate of the recorded PCM.
+            channels (int, optional): Number of channels of the recorded PCM.
+            sample_width (int, optional): Bytes per sample of the recorded PCM.
+        """
+        max_seconds = max_seconds or config.CAPTURE_BUFFER_SECONDS
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        frame_size = channels * sample_width
+        self.buffer_size = int(max_seconds * sample_rate) * frame_size
+        self.max_bytes = max_bytes or config.CAPTURE_MAX_MEMORY_MB * 1024 * 1024
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.in_use = 0
+        self.peak_allocated = 0
+        self.peak_speakers = 0
+        self.dropped_bytes = 0
+        self.flushes = 0
+
+    def acquire(self):
+        """
+        Takes a buffer from the pool, allocating one if the cap allows.
+
+        Returns:
+            SpeakerBuffer or None: An empty buffer, or None if the pool is exhausted.
+        """
+        with self._lock:
+            if self._free:
+                buffer = self._free.pop()
+            elif self.allocated + self.buffer_size <= self.max_bytes:
+                buffer = SpeakerBuffer(self.buffer_size)
+                self.allocated += self.buffer_size
+                if self.allocated > self.peak_allocated:
+                    self.peak_allocated = self.allocated
+                    logging.info(
+                        f"Allocated speaker buffer ({self.allocated / 1024 / 1024:.1f} MB for "
+                        f"{self.allocated // self.buffer_size} speakers)"
+                    )
+            else:
+                return None
+            self.in_use += 1
+            self.peak_speakers = max(self.peak_speakers, self.in_use)
+            return buffer
+
+    def release(self, buffer):
+        """
+        Returns a buffer to the pool.
+
+        Args:
+            buffer (SpeakerBuffer): The buffer to return.
+        """
+        buffer.clear()
+        with self._lock:
+            self.in_use -= 1
+            self._free.append(buffer)
+
+    def metrics(self):
+        """
+        Returns the pool's memory metrics.
+
+        Returns:
+            dict: Allocated and peak bytes, peak concurrent speakers, dropped bytes and forced flushes.
+        """
+        return {
+            "allocated_bytes": self.allocated,
+            "peak_allocated_bytes": self.peak_allocated,
+            "peak_speakers": self.peak_speakers,
+            "dropped_bytes": self.dropped_bytes,
+            "flushes": self.flushes,
+        }
+
+
+class BoundedWaveSink(discord.sinks.Sink):
+    """
+    Recording sink that keeps each speaker's audio in a fixed-size buffer.
+
+    Unlike ``discord.sinks.WaveSink``, memory does not grow with the window
+    length or the number of speakers: audio goes into buffers borrowed from
+    a ``SpeakerBufferPool``. When a speaker's buffer fills up, the overflow
+    policy either drops the oldest audio (``drop_oldest``) or hands the
+    buffered audio to ``on_flush`` as a WAV file and starts over
+    (``flush``). On cleanup ``audio_data`` is filled with WAV files, like
+    ``WaveSink``.
+    """
+
+    OVERFLOW_POLICIES = ("drop_oldest", "flush")
+
+    def __init__(self, pool, overflow=None, on_flush=None, *, filters=None):
+        """
+        Args:
+            pool (SpeakerBufferPool): The pool to borrow speaker buffers from.
+            overflow (str, optional): The overflow policy (drop_oldest or flush).
+            on_flush (callable, optional): Called with ``(user_id, wav)`` from the recording thread when a buffer is flushed.
+            filters (dict, optional): py-cord sink filters.
+        """
+        super().__init__(filters=filters)
+        self.encoding = "wav"
+        self.pool = pool
+        self.overflow = overflow or config.CAPTURE_OVERFLOW
+        if self.overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy '{self.overflow}'. Expected one of: {', '.join(self.OVERFLOW_POLICIES)}"
+            )
+        if self.overflow == "flush" and on_flush is None:
+            raise ValueError("The flush overflow policy requires an on_flush callback")
+        self.on_flush = on_flush
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    @discord.sinks.Filters.container
+    def write(self, data, user):
+        flushed = None
+        with self._lock:
+            buffer = self._buffers.get(user)
+            if buffer is None:
+                buffer = self._buffers[user] = self.pool.acquire()
+            if buffer is None:
+                # Pool exhausted: this speaker is not recorded in this window
+                self._buffers.pop(user)
+                self.pool.dropped_bytes += len(data)
+                return
+
+            if self.overflow == "flush" and len(data) > buffer.free:
+                flushed = self._to_wav(buffer.read())
+                buffer.clear()
+                self.pool.flushes += 1
+            self.pool.dropped_bytes += buffer.write(data)
+
+        if flushed:
+            self.on_flush(user, flushed)
+
+    def cleanup(self):
+        self.finished = True
+        with self._lock:
+            for user, buffer in self._buffers.items():
+                if buffer.length:
+                    audio = discord.sinks.AudioData(io.BytesIO(self._to_wav(buffer.read())))
+                    audio.finished = True
+                    self.audio_data[user] = audio
+                self.pool.release(buffer)
+            self._buffers.clear()
+
+    def _to_wav(self, pcm):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(self.pool.channels)
+            wf.setsampwidth(self.pool.sample_width)
+            wf.setframerate(self.pool.sample_rate)
+            wf.writeframes(pcm)
+        return buffer.getvalue()
+
+
+def merge_windows(older, newer):
+    """
+    Merges two sets of per-speaker recording windows into one.
+
+    Audio of a speaker present in both is concatenated, oldest first.
+
+    Args:
+        older (dict): WAV bytes keyed by speaker ID.
+        newer (dict): WAV bytes keyed by speaker ID, recorded after ``older``.
+
+    Returns:
+        dict: The merged WAV bytes keyed by speaker ID.
+    """
+    merged = dict(older)
+    for user_id, wav in newer.items():
+        if user_id not in merged:
+            merged[user_id] = wav
+            continue
+        old_params, old_pcm = read_wav(merged[user_id])
+        params, pcm = read_wav(wav)
+        merged[user_id] = write_wav(params, old_pcm + pcm) if old_params[:3] == params[:3] else wav
+    return merged
+
+
+class CaptureQueue:
+    """
+    Bounded queue of recorded windows waiting to be processed.
+
+    Windows are processed one at a time, in order, by a single worker, so a
+    slow transcription or assistant run cannot make windows pile up and
+    run concurrently. When the queue is full the overflow policy decides
+    what happens to a new window:
+
+    - ``coalesce``: merge it into the newest queued window.
+    - ``drop_oldest``: discard the oldest queued window.
+    - ``block``: make the producer wait; capture pauses until there is room.
+    """
+
+    POLICIES = ("coalesce", "drop_oldest", "block")
+
+    def __init__(self, handler, max_size=None, policy=None):
+        """
+        Args:
+            handler (callable): Coroutine called with ``(windows, partial)`` for each queued window.
+            max_size (int, optional): Maximum number of queued windows.
+            policy (str, optional): The overflow policy (coalesce, drop_oldest or block).
+        """
+        self.handler = handler
+        self.max_size = max_size or config.CAPTURE_QUEUE_SIZE
+        self.policy = policy or config.CAPTURE_QUEUE_POLICY
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Unknown queue policy '{self.policy}'. Expected one of: {', '.join(self.POLICIES)}")
+        self._items = deque()
+        self._condition = asyncio.Condition()
+        self._worker = None
+        self.max_depth = 0
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag = None
+        self.max_lag = 0.0
+
+    @property
+    def depth(self):
+        """Number of windows waiting to be processed."""
+        return len(self._items)
+
+    def metrics(self):
+        """
+        Returns the queue's metrics.
+
+        Returns:
+            dict: Current and peak depth, window counts by outcome, and the latest and peak lag in seconds.
+        """
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+        }
+
+    def start(self):
+        """Starts the worker that processes queued windows."""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._work())
+
+    async def close(self):
+        """Stops the worker, discarding queued windows."""
+        if self._worker and self._worker is not asyncio.current_task():
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        self._items.clear()
+
+    async def wait_for_space(self):
+        """With the block policy, waits until the queue has room for another window."""
+        if self.policy != "block":
+            return
+        async with self._condition:
+            await self._condition.wait_for(lambda: len(self._items) < self.max_size)
+
+    async def put(self, windows, partial=False):
+        """
+        Queues a recorded window, applying the overflow policy if the queue is full.
+
+        Args:
+            windows (dict): WAV bytes keyed by speaker ID.
+            partial (bool, optional): Whether the window was flushed early and only covers some speakers.
+        """
+        async with self._condition:
+            self.enqueued += 1
+            if len(self._items) >= self.max_size:
+                if self.policy == "block":
+                    await self._condition.wait_for(lambda: len(self._items) < self.max_size)
+                elif self.policy == "drop_oldest":
+                    self._items.popleft()
+                    self.dropped += 1
+                    logging.warning(f"Capture queue full, dropped the oldest window ({self.dropped} dropped)")
+                else:
+                    older, older_partial, enqueued_at = self._items.pop()
+                    merged = await asyncio.to_thread(merge_windows, older, windows)
+                    self._items.append((merged, older_partial and partial, enqueued_at))
+                    self.coalesced += 1
+                    logging.warning(f"Capture queue full, coalesced a window ({self.coalesced} coalesced)")
+                    return
+
+            self._items.append((windows, partial, time.monotonic()))
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._condition.notify_all()
+
+    async def _work(self):
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: self._items)
+                windows, partial, enqueued_at = self._items.popleft()
+                self._condition.notify_all()
+
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+            if self.last_lag > config.CONTINUOUS_LISTEN_RECORDING_DURATION:
+                logging.warning(f"Processing is {self.last_lag:.2f}s behind capture ({self.depth} windows queued)")
+
+            try:
+                await self.handler(windows, partial)
+            except Exception as e:
+                logging.error(f"Error processing recorded window: {e}")
+            self.processed += 1
@@ -99,6 +99,40 @@ INSTRUCTION_PROMPT = (
 )
 SYNOPSIS_PROMPT = "Return a summary of the content in 1-2 sentences."
 
+# Persistence
+STORAGE_BACKEND = config_yaml.get("storage", {}).get("backend", "firestore")
+STORAGE_GUILD_MEMBER_CHUNKS = config_yaml.get("storage", {}).get("guild_member_chunks", 64)
+STORAGE_SQLITE_PATH = config_yaml.get("storage", {}).get("sqlite_path", os.path.join(__location__, "../ylb.sqlite3"))
+
+# Background task supervision
+SUPERVISOR_INITIAL_BACKOFF = config_yaml.get("supervisor", {}).get("initial_backoff", 1.0)
+SUPERVISOR_MAX_BACKOFF = config_yaml.get("supervisor", {}).get("max_backoff", 60.0)
+SUPERVISOR_MAX_RESTARTS = config_yaml.get("supervisor", {}).get("max_restarts", 5)
+SUPERVISOR_RESTART_WINDOW = config_yaml.get("supervisor", {}).get("restart_window", 300)
+SUPERVISOR_HEALTHY_AFTER = config_yaml.get("supervisor", {}).get("healthy_after", 60)
+
+# Local (microphone) voice mode
+LOCAL_VOICE_SAMPLE_RATE = config_yaml.get("local_voice", {}).get("sample_rate", 16000)
+LOCAL_VOICE_FRAME_DURATION = config_yaml.get("local_voice", {}).get("frame_duration", 30)
+LOCAL_VOICE_PRE_ROLL = config_yaml.get("local_voice", {}).get("pre_roll", 0.3)
+LOCAL_VOICE_ENDPOINT_SILENCE = config_yaml.get("local_voice", {}).get("endpoint_silence", 0.8)
+LOCAL_VOICE_INPUT_DEVICE = config_yaml.get("local_voice", {}).get("input_device")
+LOCAL_VOICE_OUTPUT_DEVICE = config_yaml.get("local_voice", {}).get("output_device")
+
+# Transcription
+TRANSCRIPTION_BACKEND = config_yaml.get("transcription", {}).get("backend", "openai")
+TRANSCRIPTION_UPLOAD_FORMAT = config_yaml.get("transcription", {}).get("upload", {}).get("format", "flac")
+TRANSCRIPTION_UPLOAD_BITRATE = config_yaml.get("transcription", {}).get("upload", {}).get("bitrate", "24k")
+TRANSCRIPTION_UPLOAD_WORKERS = config_yaml.get("transcription", {}).get("upload", {}).get("workers", 0)
+TRANSCRIPTION_LOCAL_MODEL = config_yaml.get("transcription", {}).get("local", {}).get("model", "base.en")
+TRANSCRIPTION_LOCAL_DEVICE = config_yaml.get("transcription", {}).get("local", {}).get("device", "cpu")
+TRANSCRIPTION_LOCAL_COMPUTE_TYPE = config_yaml.get("transcription", {}).get("local", {}).get("compute_type", "int8")
+TRANSCRIPTION_LOCAL_CPU_THREADS = config_yaml.get("transcription", {}).get("local", {}).get("cpu_threads", 0)
+TRANSCRIPTION_LOCAL_BEAM_SIZE = config_yaml.get("transcription", {}).get("local", {}).get("beam_size", 1)
+TRANSCRIPTION_LOCAL_LANGUAGE = config_yaml.get("transcription", {}).get("local", {}).get("language", "en")
+TRANSCRIPTION_FAKE_TEXT = config_yaml.get("transcription", {}).get("fake", {}).get("text")
+TRANSCRIPTION_FAKE_LATENCY = config_yaml.get("transcription", {}).get("fake", {}).get("latency", 0.0)
+
 # Memory
 OUTPUT_DIRECTORY = "/output"
 DEEP_MEMORY_FILENAME = ".memory/deep_memory.json"
@@ -114,6 +148,46 @@ CONTINUOUS_LISTEN_RECORDING_DURATION = config_yaml.get("discord", {}).get("conti
 CONTINUOUS_LISTEN_PAUSE_DURATION = config_yaml.get("discord", {}).get("continuous_listen", {}).get("pause_duration", 0.1)
 CONTINUOUS_LISTEN_ACTIVATION_PHRASE = config_yaml.get("discord", {}).get("continuous_listen", {}).get("activation_phrase", "bartender")
 CONTINUOUS_LISTEN_SAMPLE_RATE = config_yaml.get("discord", {}).get("continuous_listen", {}).get("sample_rate", 16000)
+CONTINUOUS_LISTEN_CONTEXT_MAX_TOKENS = config_yaml.get("discord", {}).get("continuous_listen", {}).get("context", {}).get("max_tokens", 2000)
+CONTINUOUS_LISTEN_CONTEXT_MAX_SECONDS = config_yaml.get("discord", {}).get("continuous_listen", {}).get("context", {}).get("max_seconds", 300)
+CONTINUOUS_LISTEN_TRANSCRIPTION = config_yaml.get("discord", {}).get("continuous_listen", {}).get("transcription", "eager")
+CONTINUOUS_LISTEN_WAKE_DETECTOR = config_yaml.get("discord", {}).get("continuous_listen", {}).get("wake", {}).get("detector", "sphinx")
+CONTINUOUS_LISTEN_WAKE_SENSITIVITY = config_yaml.get("discord", {}).get("continuous_listen", {}).get("wake", {}).get("sensitivity", 0.8)
+CONTINUOUS_LISTEN_WAKE_BUFFER_SECONDS = config_yaml.get("discord", {}).get("continuous_listen", {}).get("wake", {}).get("buffer_seconds", 120)
+CONTINUOUS_LISTEN_WAKE_PROBE_SECONDS = config_yaml.get("discord", {}).get("continuous_listen", {}).get("wake", {}).get("probe_seconds", 2.0)
+CONTINUOUS_LISTEN_STITCH = config_yaml.get("discord", {}).get("continuous_listen", {}).get("stitch", {}).get("enabled", True)
+CONTINUOUS_LISTEN_STITCH_MIN_PAUSE = config_yaml.get("discord", {}).get("continuous_listen", {}).get("stitch", {}).get("min_pause", 0.3)
+CONTINUOUS_LISTEN_STITCH_MAX_CARRY = config_yaml.get("discord", {}).get("continuous_listen", {}).get("stitch", {}).get("max_carry", 5)
+VAD_AGGRESSIVENESS = config_yaml.get("discord", {}).get("continuous_listen", {}).get("vad", {}).get("aggressiveness", 3)
+VAD_ENERGY_THRESHOLD = config_yaml.get("discord", {}).get("continuous_listen", {}).get("vad", {}).get("energy_threshold", -50.0)
+VAD_MAX_ZERO_CROSSING_RATE = config_yaml.get("discord", {}).get("continuous_listen", {}).get("vad", {}).get("max_zero_crossing_rate", 0.6)
+VAD_MIN_PAUSE = config_yaml.get("discord", {}).get("continuous_listen", {}).get("vad", {}).get("min_pause", 0.3)
+VAD_MIN_SPEECH = config_yaml.get("discord", {}).get("continuous_listen", {}).get("vad", {}).get("min_speech", 0.1)
+CONTINUOUS_LISTEN_TRIM_PADDING = config_yaml.get("discord", {}).get("continuous_listen", {}).get("trim_padding", 0.2)
+CAPTURE_BUFFER_SECONDS = config_yaml.get("discord", {}).get("continuous_listen", {}).get("sink", {}).get("buffer_seconds", CONTINUOUS_LISTEN_RECORDING_DURATION + 1)
+CAPTURE_MAX_MEMORY_MB = config_yaml.get("discord", {}).get("continuous_listen", {}).get("sink", {}).get("max_memory_mb", 64)
+CAPTURE_OVERFLOW = config_yaml.get("discord", {}).get("continuous_listen", {}).get("sink", {}).get("overflow", "flush")
+CAPTURE_QUEUE_SIZE = config_yaml.get("discord", {}).get("continuous_listen", {}).get("queue", {}).get("max_size", 3)
+CAPTURE_QUEUE_POLICY = config_yaml.get("discord", {}).get("continuous_listen", {}).get("queue", {}).get("policy", "coalesce")
+DISCORD_MESSAGE_CACHE_SIZE = config_yaml.get("discord", {}).get("cache", {}).get("max_messages", 1000)
+DISCORD_MESSAGE_LOCATION_CACHE_SIZE = config_yaml.get("discord", {}).get("cache", {}).get("max_message_locations", 100000)
+DISCORD_HISTORY_MAX_MESSAGES = config_yaml.get("discord", {}).get("cache", {}).get("max_history_messages", 50)
+DISCORD_STREAM_REPLIES = config_yaml.get("discord", {}).get("text", {}).get("stream_replies", True)
+DISCORD_STREAM_EDIT_INTERVAL = config_yaml.get("discord", {}).get("text", {}).get("stream_edit_interval", 1.0)
+TEXT_MEMORY_MAX_TOKENS = config_yaml.get("discord", {}).get("text", {}).get("memory", {}).get("max_tokens", 3000)
+TEXT_MEMORY_MAX_CHANNELS = config_yaml.get("discord", {}).get("text", {}).get("memory", {}).get("max_channels", 500)
+TEXT_MEMORY_SUMMARIZE = config_yaml.get("discord", {}).get("text", {}).get("memory", {}).get("summarize", True)
+TEXT_MEMORY_MAX_SUMMARY_TOKENS = config_yaml.get("discord", {}).get("text", {}).get("memory", {}).get("max_summary_tokens", 300)
+TEXT_BATCH_WINDOW = config_yaml.get("discord", {}).get("text", {}).get("batching", {}).get("window", 1.5)
+TEXT_BATCH_MAX_WAIT = config_yaml.get("discord", {}).get("text", {}).get("batching", {}).get("max_wait", 4.0)
+TEXT_BATCH_MAX_SIZE = config_yaml.get("discord", {}).get("text", {}).get("batching", {}).get("max_size", 10)
+DISCORD_MEMBER_QUERY_LIMIT = config_yaml.get("discord", {}).get("member_query", {}).get("default_limit", 50)
+DISCORD_MEMBER_QUERY_MAX_LIMIT = config_yaml.get("discord", {}).get("member_query", {}).get("max_limit", 200)
+DISCORD_MEMBER_EDIT_RATE_LIMIT = (
+    config_yaml.get("discord", {}).get("rate_limits", {}).get("member_edit", {}).get("limit", 10),
+    config_yaml.get("discord", {}).get("rate_limits", {}).get("member_edit", {}).get("per", 10),
+)
+DISCORD_RATE_LIMIT_MAX_RETRIES = config_yaml.get("discord", {}).get("rate_limits", {}).get("max_retries", 3)
 
 ###
 ## End Discord configuration options
@@ -134,6 +208,8 @@ OPENAI_TTS_MODEL = config_yaml.get("openai", {}).get("voice", {}).get("tts_model
 # Assistant
 OPENAI_ASSISTANT_ID = config_yaml.get("openai", {}).get("assistant", {}).get("id", "asst_ZUgOFB1c8RyXse4q888oTo5D")
 OPENAI_ASSISTANT_NAME = config_yaml.get("openai", {}).get("assistant", {}).get("name", "Bartender")
+OPENAI_ASSISTANT_POLL_INTERVAL = config_yaml.get("openai", {}).get("assistant", {}).get("poll_interval_ms", 100)
+TOKENS_SESSION_BUDGET = config_yaml.get("openai", {}).get("tokens", {}).get("session_budget", 0)
 
 # Vector store
 OPENAI_VECTOR_STORE_ID = config_yaml.get("openai", {}).get("vector_store", {}).get("id", "vs_dfpknpKmECiqIvaxAlo0bxuh")
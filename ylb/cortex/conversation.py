@@ -0,0 +1,176 @@
+import logging
+from collections import OrderedDict, deque
+
+from ylb import config
+from ylb import utils
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a Discord chat with the turns below. "
+    "Keep names, decisions, open questions and facts the assistant may need later. "
+    "Reply with the updated summary only, in at most {max_tokens} tokens."
+)
+
+
+class ChannelConversation:
+    """
+    Sliding window of chat turns for a single channel.
+
+    Turns are kept oldest first together with their token counts so the
+    window can be trimmed to a token budget without recounting.
+    """
+
+    def __init__(self):
+        self.turns = deque()
+        self.tokens = 0
+        self.summary = None
+
+    def append(self, role, content):
+        """
+        Appends a turn to the window.
+
+        Args:
+            role (str): The chat role of the turn (user or assistant).
+            content (str): The text of the turn.
+        """
+        tokens = utils.num_tokens_from_string(content)
+        self.turns.append((role, content, tokens))
+        self.tokens += tokens
+
+    def trim(self, max_tokens):
+        """
+        Drops the oldest turns until the window fits the token budget.
+
+        Args:
+            max_tokens (int): The token budget of the window.
+
+        Returns:
+            list: The evicted ``(role, content)`` turns, oldest first.
+        """
+        evicted = []
+        # Always keep the latest turn, even if it alone exceeds the budget
+        while self.tokens > max_tokens and len(self.turns) > 1:
+            role, content, tokens = self.turns.popleft()
+            self.tokens -= tokens
+            evicted.append((role, content))
+        return evicted
+
+    def messages(self):
+        """
+        Returns the window as chat completion messages.
+
+        Returns:
+            list: The summary (if any) followed by every buffered turn.
+        """
+        messages = []
+        if self.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation in this channel:\n{self.summary}",
+                }
+            )
+        messages.extend({"role": role, "content": content} for role, content, _ in self.turns)
+        return messages
+
+
+class ConversationStore:
+    """
+    Per-channel conversation memory for the text chat path.
+
+    Each channel keeps a token-bounded sliding window of recent turns, and
+    the store itself is an LRU over channels so memory stays bounded no
+    matter how many channels the bot talks in. Turns pushed out of a window
+    can optionally be folded into a rolling summary.
+    """
+
+    def __init__(self, max_tokens=None, max_channels=None, summarize=None):
+        self.max_tokens = max_tokens or config.TEXT_MEMORY_MAX_TOKENS
+        self.max_channels = max_channels or config.TEXT_MEMORY_MAX_CHANNELS
+        self.summarize = config.TEXT_MEMORY_SUMMARIZE if summarize is None else summarize
+        self.max_summary_tokens = config.TEXT_MEMORY_MAX_SUMMARY_TOKENS
+        self._channels = OrderedDict()
+
+    def get(self, channel_id):
+        """
+        Returns a channel's conversation, creating it and evicting the least
+        recently used channel if the store is full.
+
+        Args:
+            channel_id (int): The ID of the channel.
+
+        Returns:
+            ChannelConversation: The channel's conversation.
+        """
+        conversation = self._channels.get(channel_id)
+        if conversation is None:
+            conversation = self._channels[channel_id] = ChannelConversation()
+            if len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        self._channels.move_to_end(channel_id)
+        return conversation
+
+    def build_messages(self, channel_id, system_prompt, content):
+        """
+        Builds the chat completion messages for a new user turn.
+
+        Args:
+            channel_id (int): The ID of the channel.
+            system_prompt (str): The system prompt.
+            content (str): The new user message.
+
+        Returns:
+            list: The system prompt, the channel's memory and the new user message.
+        """
+        return (
+            [{"role": "system", "content": system_prompt}]
+            + self.get(channel_id).messages()
+            + [{"role": "user", "content": content}]
+        )
+
+    async def add_exchange(self, channel_id, user_content, assistant_content, client=None):
+        """
+        Records a completed user/assistant exchange and trims the channel's window.
+
+        Args:
+            channel_id (int): The ID of the channel.
+            user_content (str): The user message.
+            assistant_content (str): The assistant's reply.
+            client (openai.AsyncOpenAI, optional): Client used to summarize evicted turns.
+        """
+        conversation = self.get(channel_id)
+        conversation.append("user", user_content)
+        if assistant_content:
+            conversation.append("assistant", assistant_content)
+
+        evicted = conversation.trim(self.max_tokens)
+        if evicted and self.summarize and client is not None:
+            await self.summarize_turns(conversation, evicted, client)
+
+    async def summarize_turns(self, conversation, turns, client):
+        """
+        Folds evicted turns into the conversation's rolling summary.
+
+        Args:
+            conversation (ChannelConversation): The conversation to update.
+            turns (list): The evicted ``(role, content)`` turns.
+            client (openai.AsyncOpenAI): Client used for the summary completion.
+        """
+        transcript = "\n".join(f"{role}: {content}" for role, content in turns)
+        if conversation.summary:
+            transcript = f"Current summary:\n{conversation.summary}\n\nNew turns:\n{transcript}"
+        try:
+            completion = await client.chat.completions.create(
+                model=config.OPENAI_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SUMMARY_PROMPT.format(max_tokens=self.max_summary_tokens),
+                    },
+                    {"role": "user", "content": transcript},
+                ],
+                max_tokens=self.max_summary_tokens,
+                temperature=0.2,
+            )
+            conversation.summary = completion.choices[0].message.content.strip()
+        except Exception as e:
+            logging.warning(f"Failed to summarize evicted conversation turns: {e}")
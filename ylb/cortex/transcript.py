@@ -0,0 +1,73 @@
+import time
+from collections import deque
+
+from ylb import config
+from ylb import utils
+
+
+class TranscriptBuffer:
+    """
+    Rolling transcript of a voice session.
+
+    Tagged transcript lines are kept across recording windows until the
+    activation phrase is heard, so speech leading up to it can be sent to the
+    assistant as context. The buffer is bounded both in tokens and in age:
+    the oldest lines are dropped once either limit is exceeded.
+    """
+
+    def __init__(self, max_tokens=None, max_seconds=None):
+        """
+        Args:
+            max_tokens (int, optional): Maximum number of tokens kept in the buffer.
+            max_seconds (float, optional): Maximum age in seconds of a buffered line.
+        """
+        self.max_tokens = max_tokens or config.CONTINUOUS_LISTEN_CONTEXT_MAX_TOKENS
+        self.max_seconds = max_seconds or config.CONTINUOUS_LISTEN_CONTEXT_MAX_SECONDS
+        self._lines = deque()
+        self.tokens = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    def append(self, line, timestamp=None):
+        """
+        Appends a transcript line and drops lines outside the limits.
+
+        Args:
+            line (str): The tagged transcript line.
+            timestamp (float, optional): When the line was spoken. Defaults to now.
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        tokens = utils.num_tokens_from_string(line)
+        self._lines.append((timestamp, line, tokens))
+        self.tokens += tokens
+        self.prune(timestamp)
+
+    def prune(self, now=None):
+        """
+        Drops lines that are too old or exceed the token budget.
+
+        Args:
+            now (float, optional): The current time. Defaults to now.
+        """
+        now = now if now is not None else time.time()
+        while self._lines and (
+            now - self._lines[0][0] > self.max_seconds
+            # Always keep the latest line, even if it alone exceeds the budget
+            or (self.tokens > self.max_tokens and len(self._lines) > 1)
+        ):
+            _, _, tokens = self._lines.popleft()
+            self.tokens -= tokens
+
+    def flush(self):
+        """
+        Returns the buffered transcript and empties the buffer.
+
+        Returns:
+            str: The buffered lines, oldest first, one per line.
+        """
+        self.prune()
+        transcript = "\n".join(line for _, line, _ in self._lines)
+        self._lines.clear()
+        self.tokens = 0
+        return transcript
@@ -0,0 +1,246 @@
+import json
+import inspect
+import asyncio
+import logging
+import traceback
+
+from ylb import config
+from ylb.utils import TextColor
+
+
+class ConversationEngine:
+    """
+    Drives OpenAI assistant conversations on asyncio.
+
+    Covers everything between a front-end and the Assistants API: appending
+    messages, running the assistant, dispatching tool calls concurrently and
+    submitting their outputs. The Discord bot and the CLI conversation both
+    use it, so they share one implementation of the run loop.
+
+    Persistence is left to the front-end through ``on_record``, which
+    receives every user message, assistant reply and tool call in the shape
+    of a session history record, together with the context the front-end
+    passed in (the bot passes its voice session).
+    """
+
+    def __init__(self, tools, assistant_id, owner=None, on_record=None, on_usage=None, client=None, poll_interval=None):
+        """
+        Args:
+            tools (list): Tools wrapped with ``utils.function_info``.
+            assistant_id (str): The ID of the OpenAI assistant.
+            owner (object, optional): Object whose methods are among the tools; passed as ``self`` when they are called.
+            on_record (callable, optional): Called with ``(record, context)`` for every message and tool call. May be a coroutine function.
+            on_usage (callable, optional): Called with ``(usage, context)`` with the token usage of every finished run.
+            client (openai.AsyncOpenAI, optional): The OpenAI client. Defaults to the shared async client.
+            poll_interval (int, optional): Milliseconds between run status checks.
+        """
+        if client is None:
+            from ylb import async_openai_client as client
+
+        self.client = client
+        self.assistant_id = assistant_id
+        self.owner = owner
+        self.on_record = on_record
+        self.on_usage = on_usage
+        self.poll_interval = poll_interval or config.OPENAI_ASSISTANT_POLL_INTERVAL
+        self.tools = {tool.info["function"]["name"]: tool for tool in tools}
+
+    async def create_thread(self):
+        """
+        Creates a new assistant thread.
+
+        Returns:
+            str: The ID of the thread.
+        """
+        thread = await self.client.beta.threads.create()
+        return thread.id
+
+    async def add_message(self, thread_id, content, context=None, **metadata):
+        """
+        Appends a user message to a thread.
+
+        Args:
+            thread_id (str): The ID of the thread.
+            content (str): The message content.
+            context (object, optional): Passed through to ``on_record``.
+            **metadata: Extra fields stored in the message's record.
+
+        Returns:
+            openai.types.beta.threads.Message: The created message.
+        """
+        message = await self.client.beta.threads.messages.create(thread_id=thread_id, role="user", content=content)
+        await self.record(
+            {
+                "openai_thread_id": thread_id,
+                "openai_message_id": message.id,
+                **metadata,
+                "content": content,
+                "tool_call": None,
+            },
+            context,
+        )
+        return message
+
+    async def run(self, thread_id, context=None, instructions=None, temperature=None):
+        """
+        Runs the assistant on a thread until it replies, answering its tool calls.
+
+        Args:
+            thread_id (str): The ID of the thread.
+            context (object, optional): Passed through to ``on_record``.
+            instructions (str, optional): Run instructions. Defaults to the configured instruction prompt.
+            temperature (float, optional): Sampling temperature. Defaults to the configured temperature.
+
+        Returns:
+            str or None: The assistant's reply, or None if the run did not complete.
+        """
+        run = await self.client.beta.threads.runs.create_and_poll(
+            thread_id=thread_id,
+            assistant_id=self.assistant_id,
+            instructions=instructions or config.INSTRUCTION_PROMPT,
+            temperature=temperature if temperature is not None else config.OPENAI_MODEL_TEMPERATURE,
+            poll_interval_ms=self.poll_interval,
+        )
+
+        while run.status == "requires_action":
+            logging.info(f"Required action in {run.id} → {run.thread_id}")
+            tool_outputs = await self.dispatch_tool_calls(thread_id, run, context)
+            run = await self.client.beta.threads.runs.submit_tool_outputs_and_poll(
+                thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs, poll_interval_ms=self.poll_interval
+            )
+
+        if self.on_usage and getattr(run, "usage", None):
+            try:
+                self.on_usage(run.usage, context)
+            except Exception as e:
+                logging.error(f"Failed to account run usage: {e}")
+
+        if run.status != "completed":
+            error = f"{run.last_error.code} -> {run.last_error.message}" if run.last_error else run.status
+            logging.error(f"Run {run.id} failed with error: {error}")
+            return None
+
+        messages = await self.client.beta.threads.messages.list(thread_id=thread_id, limit=1)
+        reply = None
+        for message in messages.data:
+            if message.role == "assistant":
+                try:
+                    reply = message.content[0].text.value
+                except Exception:
+                    logging.error(f"Failed to read assistant message: {message}\n{traceback.format_exc()}")
+                    break
+                await self.record(
+                    {
+                        "openai_thread_id": thread_id,
+                        "openai_message_id": message.id,
+                        "content": reply,
+                        "tool_call": None,
+                    },
+                    context,
+                )
+                break
+        logging.info(f"Run {run.id} completed")
+        return reply
+
+    async def dispatch_tool_calls(self, thread_id, run, context=None):
+        """
+        Calls the tools a run asked for concurrently.
+
+        Args:
+            thread_id (str): The ID of the thread.
+            run (openai.types.beta.threads.Run): The run requiring action.
+            context (object, optional): Passed through to ``on_record``.
+
+        Returns:
+            list: Tool outputs ready to submit to the run.
+        """
+        tool_calls = getattr(run.required_action.submit_tool_outputs, "tool_calls", None)
+        if not tool_calls:
+            logging.info("No tool calls found in the required action.")
+            return []
+
+        arguments = [json.loads(tool_call.function.arguments or "{}") for tool_call in tool_calls]
+        results = await asyncio.gather(
+            *[self.call_tool(tool_call.function.name, args) for tool_call, args in zip(tool_calls, arguments)],
+            return_exceptions=True,
+        )
+
+        tool_outputs = []
+        for tool_call, args, result in zip(tool_calls, arguments, results):
+            if isinstance(result, Exception):
+                logging.error(f"Error during tool call {tool_call.id}: {str(result)}")
+                output = f"Error during tool call: {str(result)}"
+            else:
+                output = result
+            tool_outputs.append({"tool_call_id": tool_call.id, "output": output})
+
+            await self.record(
+                {
+                    "openai_thread_id": thread_id,
+                    "openai_message_id": None,
+                    "content": None,
+                    "tool_call": {
+                        "tool_call_id": tool_call.id,
+                        "function_name": tool_call.function.name,
+                        "arguments": args,
+                        "output": output,
+                    },
+                },
+                context,
+            )
+            logging.info(f"Tool call completed -> {TextColor.HEADER}{tool_call.function.name}(){TextColor.ENDC}")
+        return tool_outputs
+
+    async def call_tool(self, function_name, arguments):
+        """
+        Calls a tool by name.
+
+        Coroutine tools are awaited. Synchronous methods of the owner run on
+        the event loop, since they read the owner's state; other synchronous
+        tools may block on I/O and run in a worker thread.
+
+        Args:
+            function_name (str): The name of the tool.
+            arguments (dict): The arguments to call it with.
+
+        Returns:
+            str: The tool's output, or an error description.
+        """
+        logging.info(
+            f"Processing tool call -> {TextColor.HEADER}{function_name}({json.dumps(arguments, indent=2)}){TextColor.ENDC}"
+        )
+        tool = self.tools.get(function_name)
+        if tool is None:
+            logging.warning(f"Tool function '{function_name}' not found.")
+            return f"Error: Tool function '{function_name}' not found."
+
+        try:
+            is_method = self.owner is not None and hasattr(self.owner, tool.func.__name__)
+            args = (self.owner,) if is_method else ()
+            if inspect.iscoroutinefunction(tool.func):
+                function_response = await tool(*args, **arguments)
+            elif is_method:
+                function_response = tool(*args, **arguments)
+            else:
+                function_response = await asyncio.to_thread(tool, **arguments)
+            return str(function_response)
+        except Exception as e:
+            logging.warning(f"Error during tool call: {str(e)}\n{traceback.format_exc()}")
+            return f"Error during tool call: {str(e)}\n{traceback.format_exc()}"
+
+    async def record(self, record, context=None):
+        """
+        Passes a history record to the ``on_record`` hook.
+
+        Args:
+            record (dict): The message or tool call record.
+            context (object, optional): The front-end's context for the conversation.
+        """
+        if self.on_record is None:
+            return
+        try:
+            result = self.on_record(record, context)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logging.error(f"Failed to store conversation record: {e}")
@@ -1,27 +1,321 @@
-import numpy as np
-import subprocess
+import io
+import queue
 import logging
-import webrtcvad
+import threading
 import wave
 import time
+from collections import deque
 
 from ylb import config
 from ylb import utils
+from ylb.vad import contains_speech
 from ylb.utils import TextColor
+from ylb.transcription import create_transcriber
 from ylb import openai_client as client
 
+# OpenAI TTS returns raw PCM as 24 kHz, 16-bit, mono
+TTS_SAMPLE_RATE = 24000
+
+_transcriber = None
+_player = None
+
 
 def has_speech(audio_path):
-    vad = webrtcvad.Vad(3)  # Aggressiveness from 0 to 3
+    """
+    Returns whether a WAV file contains speech.
+
+    Args:
+        audio_path (str): Path to a 16-bit PCM WAV file.
+
+    Returns:
+        bool: True if at least one frame contains speech.
+    """
     with wave.open(audio_path, 'rb') as wf:
         frames = wf.readframes(wf.getnframes())
-        sample_rate = wf.getframerate()
-        frame_duration = 30  # in ms
-        frame_size = int(sample_rate * frame_duration / 1000) * wf.getsampwidth()
-        for i in range(0, len(frames), frame_size):
-            frame = frames[i:i+frame_size]
-            if len(frame) < frame_size:
+        return contains_speech(frames, wf.getframerate(), wf.getnchannels())
+
+
+class MicrophoneStream:
+    """
+    Streams microphone audio in fixed-size frames through PyAudio.
+
+    PyAudio fills a queue from its own callback thread, so no audio is lost
+    while the caller classifies frames. Use as a context manager to open and
+    release the input device.
+    """
+
+    def __init__(self, sample_rate=None, frame_duration=None, device=None):
+        """
+        Args:
+            sample_rate (int, optional): Capture sample rate.
+            frame_duration (int, optional): Frame length in milliseconds (10, 20 or 30).
+            device (int, optional): PyAudio input device index. The system default if not set.
+        """
+        self.sample_rate = sample_rate or config.LOCAL_VOICE_SAMPLE_RATE
+        self.frame_duration = frame_duration or config.LOCAL_VOICE_FRAME_DURATION
+        self.frame_samples = int(self.sample_rate * self.frame_duration / 1000)
+        self.device = device if device is not None else config.LOCAL_VOICE_INPUT_DEVICE
+        self.frames = queue.Queue()
+        self._pyaudio = None
+        self._stream = None
+        self._continue = None
+
+    def __enter__(self):
+        import pyaudio
+
+        self._continue = pyaudio.paContinue
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device,
+            frames_per_buffer=self.frame_samples,
+            stream_callback=self._callback,
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pyaudio.terminate()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.frames.put(in_data)
+        return None, self._continue
+
+    def read(self, timeout=None):
+        """
+        Returns the next frame of raw 16-bit mono PCM.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a frame.
+
+        Raises:
+            queue.Empty: If no frame arrived within the timeout.
+        """
+        return self.frames.get(timeout=timeout)
+
+
+class AudioPlayer:
+    """
+    Plays raw 16-bit mono PCM on a background thread.
+
+    Callers hand over an iterable of chunks and return immediately; chunks
+    are written to the output device as they arrive, so streamed TTS starts
+    playing before the whole response has been downloaded.
+    """
+
+    def __init__(self, sample_rate=TTS_SAMPLE_RATE, device=None):
+        """
+        Args:
+            sample_rate (int, optional): Sample rate of the audio.
+            device (int, optional): PyAudio output device index. The system default if not set.
+        """
+        self.sample_rate = sample_rate
+        self.device = device if device is not None else config.LOCAL_VOICE_OUTPUT_DEVICE
+        self.items = queue.Queue()
+        self._thread = None
+
+    def play(self, chunks):
+        """
+        Queues audio for playback.
+
+        Args:
+            chunks (iterable): Raw PCM byte chunks, consumed on the playback thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="audio-player", daemon=True)
+            self._thread.start()
+        self.items.put(chunks)
+
+    def wait(self):
+        """Blocks until all queued audio has been played."""
+        self.items.join()
+
+    def _work(self):
+        import pyaudio
+
+        pa = pyaudio.PyAudio()
+        stream = pa.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            output=True,
+            output_device_index=self.device,
+        )
+        try:
+            while True:
+                chunks = self.items.get()
+                try:
+                    for chunk in chunks:
+                        stream.write(chunk)
+                except Exception as e:
+                    logging.error(f"Audio playback failed: {e}")
+                finally:
+                    self.items.task_done()
+        finally:
+            stream.close()
+            pa.terminate()
+
+
+def get_transcriber():
+    """
+    Returns the shared transcription backend, creating it on first use.
+
+    Returns:
+        Transcriber: The configured transcription backend.
+    """
+    global _transcriber
+    if _transcriber is None:
+        _transcriber = create_transcriber()
+    return _transcriber
+
+
+def get_player():
+    """
+    Returns the shared audio player, creating it on first use.
+
+    Returns:
+        AudioPlayer: The audio player.
+    """
+    global _player
+    if _player is None:
+        _player = AudioPlayer()
+    return _player
+
+
+def record_utterance(max_duration, pre_roll=None, endpoint_silence=None, min_speech=None):
+    """
+    Records one utterance from the microphone.
+
+    Frames are classified with the VAD as they arrive. Recording starts once
+    ``min_speech`` seconds of speech are heard (keeping ``pre_roll`` seconds
+    of audio from before) and ends after ``endpoint_silence`` seconds of
+    silence, or after ``max_duration`` seconds.
+
+    Args:
+        max_duration (float): Maximum seconds to listen for.
+        pre_roll (float, optional): Seconds of audio kept from before speech starts.
+        endpoint_silence (float, optional): Seconds of silence that end the utterance.
+        min_speech (float, optional): Seconds of speech needed to start the utterance.
+
+    Returns:
+        bytes or None: The utterance as WAV bytes, or None if nobody spoke.
+    """
+    pre_roll = config.LOCAL_VOICE_PRE_ROLL if pre_roll is None else pre_roll
+    endpoint_silence = config.LOCAL_VOICE_ENDPOINT_SILENCE if endpoint_silence is None else endpoint_silence
+    min_speech = config.VAD_MIN_SPEECH if min_speech is None else min_speech
+
+    with MicrophoneStream() as mic:
+        frame_seconds = mic.frame_duration / 1000
+        start_frames = max(1, round(min_speech / frame_seconds))
+        recent = deque(maxlen=max(start_frames, round(pre_roll / frame_seconds)))
+        utterance = None
+        silence = 0.0
+        deadline = time.monotonic() + max_duration
+
+        while time.monotonic() < deadline:
+            try:
+                frame = mic.read(timeout=frame_seconds * 10)
+            except queue.Empty:
                 continue
-            if vad.is_speech(frame, sample_rate):
-                return True
-    return False
\ No newline at end of file
+            speech = contains_speech(frame, mic.sample_rate)
+
+            if utterance is None:
+                recent.append((frame, speech))
+                if sum(voiced for _, voiced in list(recent)[-start_frames:]) >= start_frames:
+                    utterance = [frame for frame, _ in recent]
+                continue
+
+            utterance.append(frame)
+            silence = 0.0 if speech else silence + frame_seconds
+            if silence >= endpoint_silence:
+                break
+
+    if utterance is None:
+        return None
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(mic.sample_rate)
+        wf.writeframes(b"".join(utterance))
+    return buffer.getvalue()
+
+
+def stream_speech(message):
+    """
+    Yields TTS audio for a message as raw PCM chunks while it is generated.
+
+    Args:
+        message (str): The text to speak.
+
+    Yields:
+        bytes: Raw 24 kHz 16-bit mono PCM chunks.
+    """
+    with client.audio.speech.with_streaming_response.create(
+        model=config.OPENAI_TTS_MODEL,
+        voice=config.OPENAI_TTS_VOICE,
+        input=message,
+        response_format="pcm",
+    ) as response:
+        # Keep chunks sample-aligned for the output stream
+        remainder = b""
+        for chunk in response.iter_bytes(4096):
+            chunk = remainder + chunk
+            cut = len(chunk) - len(chunk) % 2
+            remainder = chunk[cut:]
+            if cut:
+                yield chunk[:cut]
+
+
+@utils.function_info
+def listen(duration: int = config.CONTINUOUS_LISTEN_RECORDING_DURATION) -> str:
+    """
+    Listen to the user through the microphone and transcribe what they say. Returns as soon as the user stops talking.
+
+    :param duration: The maximum number of seconds to listen for.
+    :type duration: integer
+    :return: The transcribed speech.
+    :rtype: string
+    """
+    try:
+        # Don't record our own voice
+        if _player is not None:
+            _player.wait()
+
+        print(f"{TextColor.OKCYAN}[🎤] Listening...{TextColor.ENDC}")
+        started = time.time()
+        wav = record_utterance(duration)
+        if wav is None:
+            logging.info("No speech detected")
+            return ""
+
+        transcript = get_transcriber().transcribe(wav)
+        logging.info(f"Transcribed microphone input in {time.time() - started:.2f} seconds: {transcript}")
+        print(f"{TextColor.WARNING}{TextColor.BOLD}[🗣️] {transcript}{TextColor.ENDC}")
+        return transcript
+    except Exception as e:
+        logging.error(f"Failed to listen: {e}")
+        return f"Failed to listen: {e}"
+
+
+@utils.function_info
+def speak(message: str) -> str:
+    """
+    Use TTS to speak a message out loud to the user. Playback continues in the background.
+
+    :param message: The text to be spoken.
+    :type message: string
+    :return: The spoken message.
+    :rtype: string
+    """
+    try:
+        get_player().play(stream_speech(message))
+        return message
+    except Exception as e:
+        logging.error(f"Failed to speak: {e}")
+        return f"Failed to speak: {e}"
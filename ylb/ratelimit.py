@@ -0,0 +1,188 @@
+import time
+import asyncio
+import logging
+
+import discord
+
+from ylb import config
+
+# Discord rate limit routes used by moderation actions. Buckets are keyed by
+# route and major parameter (the guild ID), matching how Discord shares them.
+ROUTE_MEMBER_EDIT = "PATCH /guilds/{guild_id}/members/{user_id}"
+
+
+class RouteBucket:
+    """
+    Token bucket pacing requests on a single Discord rate limit route.
+
+    The bucket starts full so small batches go out immediately, then refills
+    at ``limit / per`` requests per second. A 429 response empties the bucket
+    for the ``Retry-After`` Discord sent with it.
+    """
+
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self._tokens = float(limit)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.limit, self._tokens + (now - self._updated) * self.limit / self.per
+        )
+        self._updated = now
+
+    async def acquire(self):
+        """Waits until a request may be sent on this route."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.per / self.limit)
+
+    def penalize(self, retry_after):
+        """
+        Blocks the route after Discord answered with a 429.
+
+        Args:
+            retry_after (float): Seconds to wait before the next request.
+        """
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+
+def retry_after(error):
+    """
+    Returns how long Discord asked to wait after a 429, from the response headers.
+
+    Args:
+        error (discord.HTTPException): The failed request.
+
+    Returns:
+        float or None: Seconds to wait, or None if the response did not say.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header in ("Retry-After", "X-RateLimit-Reset-After"):
+        try:
+            return float(headers[header])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class ModerationScheduler:
+    """
+    Paces and coalesces moderation requests against Discord's per-route buckets.
+
+    Edits queued for the same member (mute, voice channel move, role changes)
+    are merged into a single ``Member.edit`` call, requests are released as
+    fast as the route bucket allows instead of all at once, and a batch
+    reports partial progress as it goes.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self.route_limits = {ROUTE_MEMBER_EDIT: config.DISCORD_MEMBER_EDIT_RATE_LIMIT}
+        self.max_retries = config.DISCORD_RATE_LIMIT_MAX_RETRIES
+
+    def bucket(self, route, guild_id):
+        """
+        Returns the bucket for a route within a guild, creating it if needed.
+
+        Args:
+            route (str): The rate limit route.
+            guild_id (int): The major parameter of the route.
+
+        Returns:
+            RouteBucket: The route bucket.
+        """
+        key = (route, guild_id)
+        if key not in self._buckets:
+            limit, per = self.route_limits[route]
+            self._buckets[key] = RouteBucket(limit, per)
+        return self._buckets[key]
+
+    async def edit_member(self, member, **edits):
+        """
+        Edits a single member through the member edit bucket.
+
+        The HTTP client already waits out and retries ordinary 429s itself.
+        A 429 that still reaches this method is retried only if Discord said
+        how long to wait, and the whole route bucket is paused for that long.
+
+        Args:
+            member (discord.Member): The member to edit.
+            **edits: Keyword arguments for ``discord.Member.edit``.
+        """
+        bucket = self.bucket(ROUTE_MEMBER_EDIT, member.guild.id)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                return await member.edit(**edits)
+            except discord.HTTPException as e:
+                wait = retry_after(e) if e.status == 429 else None
+                if wait is None or attempt == self.max_retries:
+                    raise
+                logging.warning(
+                    f"Rate limited on {ROUTE_MEMBER_EDIT} in guild {member.guild.id}, retrying in {wait:.2f}s"
+                )
+                bucket.penalize(wait)
+
+    async def edit_members(self, edits, progress=None, progress_every=10):
+        """
+        Applies a batch of member edits as fast as the rate limits allow.
+
+        Args:
+            edits (list): ``(member, kwargs)`` pairs. Pairs for the same member are coalesced.
+            progress (callable, optional): Coroutine called with ``(done, total)`` as the batch advances.
+            progress_every (int, optional): Number of completed edits between progress reports.
+
+        Returns:
+            dict: Names of members that succeeded and failed, with per-member error messages, and their counts.
+        """
+        coalesced = {}
+        for member, kwargs in edits:
+            entry = coalesced.setdefault(member.id, (member, {}))
+            entry[1].update(kwargs)
+
+        total = len(coalesced)
+        done = 0
+        succeeded, failed = [], {}
+        started = time.monotonic()
+
+        async def run(member, kwargs):
+            nonlocal done
+            try:
+                await self.edit_member(member, **kwargs)
+                succeeded.append(member.display_name)
+            except Exception as e:
+                # One failed edit must not lose the progress of the rest of the batch
+                logging.error(f"Error editing member {member.id}: {e}")
+                failed[member.display_name] = str(e)
+            done += 1
+            if progress and (done % progress_every == 0 or done == total):
+                try:
+                    await progress(done, total)
+                except Exception as e:
+                    logging.warning(f"Failed to report moderation progress: {e}")
+
+        await asyncio.gather(*[run(member, kwargs) for member, kwargs in coalesced.values()])
+        logging.info(
+            f"Applied {len(succeeded)}/{total} member edits in {time.monotonic() - started:.2f} seconds"
+        )
+        return {
+            "succeeded": succeeded,
+            "failed": failed,
+            "succeeded_count": len(succeeded),
+            "failed_count": len(failed),
+            "total": total,
+        }
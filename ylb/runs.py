@@ -0,0 +1,131 @@
+import time
+import asyncio
+import logging
+from contextvars import ContextVar
+
+
+# The turn queue whose turn is being processed; inherited by the tasks running its tool calls
+processing_queue = ContextVar("processing_queue", default=None)
+
+
+class Turn:
+    """A single input waiting to be added to an assistant thread."""
+
+    def __init__(self, content, run, metadata):
+        self.content = content
+        self.run = run
+        self.metadata = metadata
+        self.submitted = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+        # Failures are logged by the queue, so callers may drop the future
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+
+class TurnQueue:
+    """
+    Serializes assistant runs on a single OpenAI thread.
+
+    The Assistants API rejects new messages and runs while a run is active,
+    so every input for a thread goes through this queue. Inputs that arrive
+    while a run is in progress are merged into the next turn: they are posted
+    as one combined thread message once the active run finishes, and a new
+    run is started if any of them asked for one. Each input is therefore
+    posted exactly once.
+    """
+
+    def __init__(self, thread_id, post_message, run_assistant):
+        """
+        Args:
+            thread_id (str): The ID of the OpenAI thread.
+            post_message (callable): Coroutine called with ``(content, turns)`` to add a message to the thread.
+            run_assistant (callable): Coroutine called with ``(turns)`` to run the assistant on the thread.
+        """
+        self.thread_id = thread_id
+        self.post_message = post_message
+        self.run_assistant = run_assistant
+        self._pending = []
+        self._worker = None
+        self.turns = 0
+        self.inputs = 0
+        self.max_depth = 0
+        self.last_latency = None
+
+    @property
+    def depth(self):
+        """Number of inputs waiting for the next turn."""
+        return len(self._pending)
+
+    @property
+    def busy(self):
+        """Whether a turn is currently being processed."""
+        return self._worker is not None and not self._worker.done()
+
+    def metrics(self):
+        """
+        Returns the queue's metrics.
+
+        Returns:
+            dict: Queue depth, peak depth, processed turns and inputs, and the latest input latency.
+        """
+        return {
+            "thread_id": self.thread_id,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "turns": self.turns,
+            "inputs": self.inputs,
+            "last_latency": self.last_latency,
+        }
+
+    def submit(self, content, run=True, **metadata):
+        """
+        Queues an input for the thread.
+
+        Args:
+            content (str): The message content to add to the thread.
+            run (bool, optional): Whether the input should trigger an assistant run.
+            **metadata: Extra data passed through to the post/run callbacks.
+
+        Returns:
+            asyncio.Future: Resolves once the turn containing the input has been processed.
+        """
+        turn = Turn(content, run, metadata)
+        self._pending.append(turn)
+        self.max_depth = max(self.max_depth, self.depth)
+        if not self.busy:
+            self._worker = asyncio.create_task(self._work())
+        return turn.future
+
+    async def close(self):
+        """Waits for queued turns to finish."""
+        # A tool call inside a turn may close the queue it is running on. Tool calls
+        # run in child tasks of the worker, so the worker is recognized by context
+        if self._worker is not None and processing_queue.get() is not self:
+            await asyncio.gather(self._worker, return_exceptions=True)
+
+    async def _work(self):
+        processing_queue.set(self)
+        while self._pending:
+            turns, self._pending = self._pending, []
+            started = time.monotonic()
+            try:
+                await self.post_message("\n".join(turn.content for turn in turns), turns)
+                if any(turn.run for turn in turns):
+                    await self.run_assistant(turns)
+            except Exception as e:
+                logging.error(f"Failed to process turn on thread {self.thread_id}: {e}")
+                for turn in turns:
+                    if not turn.future.done():
+                        turn.future.set_exception(e)
+            else:
+                for turn in turns:
+                    if not turn.future.done():
+                        turn.future.set_result(None)
+
+            now = time.monotonic()
+            self.turns += 1
+            self.inputs += len(turns)
+            self.last_latency = now - min(turn.submitted for turn in turns)
+            logging.info(
+                f"Processed turn of {len(turns)} input(s) on thread {self.thread_id} in "
+                f"{now - started:.2f}s (latency {self.last_latency:.2f}s, queued {self.depth})"
+            )
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+
+from ylb import config
+from ylb.capture import UtteranceStitcher, SpeakerBufferPool
+from ylb.cortex.transcript import TranscriptBuffer
+from ylb.wake import AudioRingBuffer
+
+# The voice session an assistant run (and the tool calls it makes) belongs to
+active_session = ContextVar("active_session", default=None)
+
+
+class VoiceSession:
+    """
+    State of one guild's voice conversation.
+
+    Every guild the bot listens in gets its own session, so the capture loop,
+    capture queue, assistant thread, turn queue, transcript and audio buffers,
+    speak lock and session record of one guild never interfere with another's.
+    """
+
+    def __init__(self, guild_id, voice_client, text_channel=None):
+        """
+        Args:
+            guild_id (int): The ID of the guild.
+            voice_client (discord.VoiceClient): The connected voice client.
+            text_channel (discord.TextChannel, optional): The text channel the session was started from.
+        """
+        self.guild_id = guild_id
+        self.voice_client = voice_client
+        self.text_channel = text_channel
+        self.thread = None
+        self.session_id = None
+        self.turn_queue = None
+        self.capture_queue = None
+        self.listen_task = None
+        self.is_recording = False
+        self.transcript_buffer = TranscriptBuffer()
+        self.audio_buffer = AudioRingBuffer()
+        self.stitcher = UtteranceStitcher() if config.CONTINUOUS_LISTEN_STITCH else None
+        self.buffer_pool = SpeakerBufferPool()
+        self.speak_lock = asyncio.Lock()
+
+    @property
+    def connected(self):
+        """Whether the session's voice client is connected."""
+        return self.voice_client is not None and self.voice_client.is_connected()
+
+    async def close(self, disconnect=True):
+        """
+        Stops the capture loop, waits for queued turns and optionally leaves the voice channel.
+
+        Args:
+            disconnect (bool, optional): Whether to disconnect the voice client.
+        """
+        if self.listen_task and self.listen_task is not asyncio.current_task():
+            self.listen_task.cancel()
+        if self.is_recording and self.connected:
+            self.voice_client.stop_recording()
+            self.is_recording = False
+        if self.capture_queue:
+            await self.capture_queue.close()
+            logging.info(f"Capture queue of guild {self.guild_id}: {self.capture_queue.metrics()}")
+        if self.turn_queue:
+            await self.turn_queue.close()
+            logging.info(f"Turn queue of guild {self.guild_id}: {self.turn_queue.metrics()}")
+        if disconnect and self.connected:
+            await self.voice_client.disconnect()
+        logging.info(f"Closed voice session in guild {self.guild_id}, capture memory: {self.buffer_pool.metrics()}")
+
+
+class VoiceSessionRegistry:
+    """Voice sessions of the bot, keyed by guild ID."""
+
+    def __init__(self, on_close=None):
+        """
+        Args:
+            on_close (callable, optional): Called with each session after it is closed and unregistered.
+        """
+        self.on_close = on_close
+        self._sessions = {}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __iter__(self):
+        return iter(list(self._sessions.values()))
+
+    def get(self, guild_id):
+        """
+        Returns a guild's voice session.
+
+        Args:
+            guild_id (int): The ID of the guild.
+
+        Returns:
+            VoiceSession or None: The session, or None if the bot has none in the guild.
+        """
+        return self._sessions.get(guild_id)
+
+    def current(self, guild_id=None):
+        """
+        Returns the session of the running assistant turn, falling back to a guild's session.
+
+        Args:
+            guild_id (int, optional): The guild to fall back to.
+
+        Returns:
+            VoiceSession or None: The session, if any.
+        """
+        return active_session.get() or self._sessions.get(guild_id)
+
+    def add(self, session):
+        """
+        Registers a session, replacing the guild's previous one.
+
+        Args:
+            session (VoiceSession): The session to register.
+        """
+        self._sessions[session.guild_id] = session
+        logging.info(f"Started voice session in guild {session.guild_id} ({len(self._sessions)} active)")
+
+    async def remove(self, guild_id, disconnect=True):
+        """
+        Closes and unregisters a guild's session.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            disconnect (bool, optional): Whether to disconnect the voice client.
+        """
+        session = self._sessions.pop(guild_id, None)
+        if session:
+            await session.close(disconnect=disconnect)
+            if self.on_close:
+                self.on_close(session)
+
+    async def close(self):
+        """Closes every session."""
+        await asyncio.gather(*[self.remove(guild_id) for guild_id in list(self._sessions)])
@@ -0,0 +1,476 @@
+import json
+import uuid
+import sqlite3
+import datetime
+import threading
+from abc import ABC, abstractmethod
+
+from ylb import config
+from ylb import utils
+
+
+class Storage(ABC):
+    """
+    Base interface for the bot's persistence backends.
+
+    Backends store voice sessions and their messages, guild snapshots (with
+    the member list kept apart from the guild record so it can be updated
+    incrementally) and conversation transcripts. Callers pass plain
+    dictionaries; backends are responsible for stamping
+    ``created_at``/``updated_at`` on sessions and ``timestamp`` on session
+    messages.
+    """
+
+    @abstractmethod
+    def create_session(self, data: dict) -> str:
+        """
+        Creates a new session record.
+
+        Args:
+            data (dict): The session fields to store.
+
+        Returns:
+            str: The ID of the new session.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_session(self, session_id: str, data: dict):
+        """
+        Merges fields into an existing session record.
+
+        Args:
+            session_id (str): The ID of the session to update.
+            data (dict): The fields to merge into the session.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_session_message(self, session_id: str, data: dict):
+        """
+        Appends a message (user transcript, assistant reply or tool call) to a session.
+
+        Args:
+            session_id (str): The ID of the session the message belongs to.
+            data (dict): The message fields to store.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def store_guild_info(self, guild_id: str, data: dict, member_ids: list):
+        """
+        Stores a full snapshot of a guild, replacing its previous member list.
+
+        Args:
+            guild_id (str): The ID of the guild.
+            data (dict): The guild fields to store.
+            member_ids (list): IDs of every member of the guild.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_guild_members(self, guild_id: str, member_ids: list):
+        """
+        Adds members to a stored guild snapshot.
+
+        Args:
+            guild_id (str): The ID of the guild.
+            member_ids (list): IDs of the members that joined.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_guild_members(self, guild_id: str, member_ids: list):
+        """
+        Removes members from a stored guild snapshot.
+
+        Args:
+            guild_id (str): The ID of the guild.
+            member_ids (list): IDs of the members that left.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_guild_member_ids(self, guild_id: str) -> set:
+        """
+        Returns the member IDs stored for a guild.
+
+        Args:
+            guild_id (str): The ID of the guild.
+
+        Returns:
+            set: The stored member IDs.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_transcript(self, data: dict):
+        """
+        Appends an entry to the conversation transcript log.
+
+        Args:
+            data (dict): The transcript fields to store.
+        """
+        raise NotImplementedError
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class FirestoreStorage(Storage):
+    """
+    Persistence backend storing everything in Google Cloud Firestore.
+
+    Guild member lists are spread over a fixed number of chunk documents in the
+    ``instances/{guild_id}/member_chunks`` subcollection (a member lives in chunk
+    ``member_id % chunk_count``), keeping every document well under Firestore's
+    1 MiB limit and letting join/leave deltas touch a single small document.
+    """
+
+    # Firestore rejects batches with more than 500 writes
+    MAX_BATCH_SIZE = 500
+
+    def __init__(self, chunk_count=None):
+        from google.cloud import firestore
+
+        self._firestore = firestore
+        self.db = firestore.Client()
+        self.chunk_count = chunk_count or config.STORAGE_GUILD_MEMBER_CHUNKS
+
+    def create_session(self, data):
+        doc_ref = self.db.collection("sessions").document()
+        doc_ref.set(
+            {
+                "id": doc_ref.id,
+                **data,
+                "created_at": self._firestore.SERVER_TIMESTAMP,
+                "updated_at": self._firestore.SERVER_TIMESTAMP,
+            }
+        )
+        return doc_ref.id
+
+    def update_session(self, session_id, data):
+        self.db.collection("sessions").document(session_id).set(
+            {**data, "updated_at": self._firestore.SERVER_TIMESTAMP}, merge=True
+        )
+
+    def add_session_message(self, session_id, data):
+        self.db.collection("sessions").document(session_id).collection("messages").add(
+            {**data, "timestamp": self._firestore.SERVER_TIMESTAMP}
+        )
+
+    def _member_chunks(self, guild_id):
+        return (
+            self.db.collection("instances")
+            .document(str(guild_id))
+            .collection("member_chunks")
+        )
+
+    def _group_by_chunk(self, member_ids):
+        chunks = {}
+        for member_id in member_ids:
+            chunks.setdefault(int(member_id) % self.chunk_count, []).append(int(member_id))
+        return chunks
+
+    def _commit_in_batches(self, writes):
+        """Applies (document reference, data, merge) writes using as few batches as possible."""
+        for start in range(0, len(writes), self.MAX_BATCH_SIZE):
+            batch = self.db.batch()
+            for doc_ref, data, merge in writes[start : start + self.MAX_BATCH_SIZE]:
+                batch.set(doc_ref, data, merge=merge)
+            batch.commit()
+
+    def store_guild_info(self, guild_id, data, member_ids):
+        chunks = self._group_by_chunk(member_ids)
+        member_chunks = self._member_chunks(guild_id)
+        writes = [
+            (
+                self.db.collection("instances").document(str(guild_id)),
+                {
+                    **data,
+                    "member_count": len(member_ids),
+                    "member_chunk_count": self.chunk_count,
+                    "updated_at": self._firestore.SERVER_TIMESTAMP,
+                },
+                False,
+            )
+        ]
+        # Every chunk is rewritten so members that left while offline are dropped
+        for index in range(self.chunk_count):
+            writes.append(
+                (
+                    member_chunks.document(str(index)),
+                    {"member_ids": chunks.get(index, [])},
+                    False,
+                )
+            )
+        self._commit_in_batches(writes)
+
+    def _member_count_write(self, guild_id, delta):
+        # Deltas only carry members that actually joined or left, so the count can be adjusted in place
+        return (
+            self.db.collection("instances").document(str(guild_id)),
+            {"member_count": self._firestore.Increment(delta)},
+            True,
+        )
+
+    def add_guild_members(self, guild_id, member_ids):
+        member_chunks = self._member_chunks(guild_id)
+        self._commit_in_batches(
+            [
+                (
+                    member_chunks.document(str(index)),
+                    {"member_ids": self._firestore.ArrayUnion(ids)},
+                    True,
+                )
+                for index, ids in self._group_by_chunk(member_ids).items()
+            ]
+            + [self._member_count_write(guild_id, len(member_ids))]
+        )
+
+    def remove_guild_members(self, guild_id, member_ids):
+        member_chunks = self._member_chunks(guild_id)
+        self._commit_in_batches(
+            [
+                (
+                    member_chunks.document(str(index)),
+                    {"member_ids": self._firestore.ArrayRemove(ids)},
+                    True,
+                )
+                for index, ids in self._group_by_chunk(member_ids).items()
+            ]
+            + [self._member_count_write(guild_id, -len(member_ids))]
+        )
+
+    def get_guild_member_ids(self, guild_id):
+        member_ids = set()
+        for chunk in self._member_chunks(guild_id).stream():
+            member_ids.update(chunk.to_dict().get("member_ids", []))
+        return member_ids
+
+    def add_transcript(self, data):
+        self.db.collection("transcripts").document().set(data)
+
+
+class SQLiteStorage(Storage):
+    """
+    Persistence backend storing everything in a local SQLite database.
+
+    Records are kept as JSON documents so the layout mirrors the Firestore
+    collections. The connection is shared between threads and guarded by a lock.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.STORAGE_SQLITE_PATH
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS session_messages_session_id
+                    ON session_messages (session_id);
+                CREATE TABLE IF NOT EXISTS instances (
+                    guild_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS guild_members (
+                    guild_id TEXT NOT NULL,
+                    member_id INTEGER NOT NULL,
+                    PRIMARY KEY (guild_id, member_id)
+                );
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data TEXT NOT NULL
+                );
+                """
+            )
+
+    def create_session(self, data):
+        session_id = uuid.uuid4().hex
+        now = _now().isoformat()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO sessions (id, data, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps({"id": session_id, **data}, default=str), now, now),
+            )
+        return session_id
+
+    def update_session(self, session_id, data):
+        now = _now().isoformat()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT data FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO sessions (id, data, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (session_id, json.dumps({"id": session_id, **data}, default=str), now, now),
+                )
+            else:
+                merged = {**json.loads(row[0]), **data}
+                self.conn.execute(
+                    "UPDATE sessions SET data = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(merged, default=str), now, session_id),
+                )
+
+    def add_session_message(self, session_id, data):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO session_messages (session_id, data, timestamp) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data, default=str), _now().isoformat()),
+            )
+
+    def store_guild_info(self, guild_id, data, member_ids):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO instances (guild_id, data) VALUES (?, ?)",
+                (str(guild_id), json.dumps({**data, "member_count": len(member_ids)}, default=str)),
+            )
+            self.conn.execute("DELETE FROM guild_members WHERE guild_id = ?", (str(guild_id),))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO guild_members (guild_id, member_id) VALUES (?, ?)",
+                [(str(guild_id), int(member_id)) for member_id in member_ids],
+            )
+
+    def _update_member_count(self, guild_id):
+        self.conn.execute(
+            "UPDATE instances SET data = json_set(data, '$.member_count', "
+            "(SELECT COUNT(*) FROM guild_members WHERE guild_id = ?)) WHERE guild_id = ?",
+            (str(guild_id), str(guild_id)),
+        )
+
+    def add_guild_members(self, guild_id, member_ids):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO guild_members (guild_id, member_id) VALUES (?, ?)",
+                [(str(guild_id), int(member_id)) for member_id in member_ids],
+            )
+            self._update_member_count(guild_id)
+
+    def remove_guild_members(self, guild_id, member_ids):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM guild_members WHERE guild_id = ? AND member_id = ?",
+                [(str(guild_id), int(member_id)) for member_id in member_ids],
+            )
+            self._update_member_count(guild_id)
+
+    def get_guild_member_ids(self, guild_id):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT member_id FROM guild_members WHERE guild_id = ?", (str(guild_id),)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_transcript(self, data):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO transcripts (data) VALUES (?)",
+                (json.dumps(data, default=str),),
+            )
+
+
+class MemoryStorage(Storage):
+    """
+    Persistence backend keeping everything in process memory.
+
+    Nothing survives a restart. Useful for local development, tests and
+    benchmarks that should not touch the network.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = {}
+        self.session_messages = {}
+        self.instances = {}
+        self.guild_members = {}
+        self.transcripts = []
+
+    def create_session(self, data):
+        session_id = uuid.uuid4().hex
+        now = _now()
+        with self._lock:
+            self.sessions[session_id] = {
+                "id": session_id,
+                **data,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self.session_messages[session_id] = []
+        return session_id
+
+    def update_session(self, session_id, data):
+        with self._lock:
+            self.sessions.setdefault(session_id, {"id": session_id}).update(
+                {**data, "updated_at": _now()}
+            )
+
+    def add_session_message(self, session_id, data):
+        with self._lock:
+            self.session_messages.setdefault(session_id, []).append(
+                {**data, "timestamp": _now()}
+            )
+
+    def store_guild_info(self, guild_id, data, member_ids):
+        with self._lock:
+            self.instances[str(guild_id)] = {**data, "member_count": len(member_ids)}
+            self.guild_members[str(guild_id)] = {int(member_id) for member_id in member_ids}
+
+    def _update_member_count(self, guild_id):
+        if str(guild_id) in self.instances:
+            self.instances[str(guild_id)]["member_count"] = len(self.guild_members[str(guild_id)])
+
+    def add_guild_members(self, guild_id, member_ids):
+        with self._lock:
+            self.guild_members.setdefault(str(guild_id), set()).update(
+                int(member_id) for member_id in member_ids
+            )
+            self._update_member_count(guild_id)
+
+    def remove_guild_members(self, guild_id, member_ids):
+        with self._lock:
+            self.guild_members.setdefault(str(guild_id), set()).difference_update(
+                int(member_id) for member_id in member_ids
+            )
+            self._update_member_count(guild_id)
+
+    def get_guild_member_ids(self, guild_id):
+        with self._lock:
+            return set(self.guild_members.get(str(guild_id), ()))
+
+    def add_transcript(self, data):
+        with self._lock:
+            self.transcripts.append(dict(data))
+
+
+STORAGE_BACKENDS = {
+    "firestore": FirestoreStorage,
+    "sqlite": SQLiteStorage,
+    "memory": MemoryStorage,
+}
+
+
+def create_storage(backend=None) -> Storage:
+    """
+    Creates the persistence backend selected in ylb-config.yaml.
+
+    Args:
+        backend (str, optional): Overrides the configured backend name.
+
+    Returns:
+        Storage: The persistence backend instance.
+    """
+    return utils.create_backend("storage backend", STORAGE_BACKENDS, backend or config.STORAGE_BACKEND)
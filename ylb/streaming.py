@@ -0,0 +1,201 @@
+import time
+import logging
+
+from ylb import config
+
+# Discord rejects messages longer than this
+DISCORD_MESSAGE_LIMIT = 2000
+
+
+def split_point(text):
+    """
+    Returns where to cut text that is longer than a Discord message.
+
+    Prefers splitting after a newline, then after a space, as long as the
+    first part keeps at least half the limit.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        int: The length of the first part.
+    """
+    for separator in ("\n", " "):
+        index = text.rfind(separator, 0, DISCORD_MESSAGE_LIMIT)
+        if index > DISCORD_MESSAGE_LIMIT // 2:
+            return index + 1
+    return DISCORD_MESSAGE_LIMIT
+
+
+def split_message(text):
+    """
+    Splits text into parts that fit in Discord messages.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list: The parts, in order. Empty for empty text.
+    """
+    parts = []
+    while len(text) > DISCORD_MESSAGE_LIMIT:
+        split = split_point(text)
+        parts.append(text[:split])
+        text = text[split:]
+    if text:
+        parts.append(text)
+    return parts
+
+
+async def send_message(channel, text):
+    """
+    Sends text to a channel, continuing past the message limit in follow-up messages.
+
+    Args:
+        channel (discord.abc.Messageable): The channel to send to.
+        text (str): The text to send.
+
+    Returns:
+        discord.Message or None: The first message sent, or None for empty text.
+    """
+    first = None
+    for part in split_message(text):
+        sent = await channel.send(part)
+        first = first or sent
+    return first
+
+
+async def send_reply(message, text):
+    """
+    Replies to a message, continuing past the message limit in follow-up messages.
+
+    Args:
+        message (discord.Message): The message to reply to.
+        text (str): The reply text.
+
+    Returns:
+        discord.Message or None: The reply, or None for empty text.
+    """
+    parts = split_message(text)
+    if not parts:
+        return None
+    reply = await message.reply(parts[0])
+    for part in parts[1:]:
+        await message.channel.send(part)
+    return reply
+
+
+class StreamingReply:
+    """
+    Progressively edits a Discord reply as completion tokens arrive.
+
+    A placeholder reply is posted first, then edited at most once per
+    ``edit_interval`` seconds with the text received so far. Text past the
+    2000 character limit continues in follow-up messages.
+    """
+
+    def __init__(self, message, edit_interval=None, placeholder="…"):
+        """
+        Args:
+            message (discord.Message): The message being replied to.
+            edit_interval (float, optional): Minimum seconds between edits of the same message.
+            placeholder (str, optional): Content of the reply before the first tokens arrive.
+        """
+        self.message = message
+        self.edit_interval = edit_interval or config.DISCORD_STREAM_EDIT_INTERVAL
+        self.placeholder = placeholder
+        self.text = ""
+        self._current = None
+        self._current_offset = 0
+        self._last_edit = 0.0
+        self._rendered = None
+
+    async def start(self):
+        """Posts the placeholder reply."""
+        self._current = await self.message.reply(self.placeholder)
+        self._last_edit = time.monotonic()
+
+    async def append(self, delta):
+        """
+        Adds newly streamed text, editing the reply if the edit interval has passed.
+
+        Args:
+            delta (str): The text received since the last call.
+        """
+        self.text += delta
+        if time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._flush()
+
+    async def finish(self):
+        """Writes out all remaining text."""
+        await self._flush()
+
+    async def fail(self, notice="⚠️ Sorry, I couldn't finish this reply."):
+        """
+        Ends a reply whose stream failed, so the placeholder is not left behind.
+
+        Text streamed so far is kept and the notice is appended to it.
+
+        Args:
+            notice (str, optional): The error notice shown in the reply.
+        """
+        self.text += f"\n\n{notice}" if self.text else notice
+        await self._flush()
+
+    async def _flush(self):
+        if self._current is None:
+            await self.start()
+
+        pending = self.text[self._current_offset :]
+        # Move completed 2000 character chunks into their own messages
+        while len(pending) > DISCORD_MESSAGE_LIMIT:
+            split = split_point(pending)
+            await self._edit(pending[:split])
+            self._current_offset += split
+            pending = self.text[self._current_offset :]
+            self._current = await self._current.channel.send(self.placeholder)
+            self._rendered = None
+
+        if pending:
+            await self._edit(pending)
+        self._last_edit = time.monotonic()
+
+    async def _edit(self, content):
+        if content == self._rendered:
+            return
+        try:
+            await self._current.edit(content=content)
+            self._rendered = content
+        except Exception as e:
+            logging.warning(f"Failed to edit streamed reply: {e}")
+
+
+async def stream_chat_completion(client, message, messages, **kwargs):
+    """
+    Streams a chat completion into a progressively edited reply to a message.
+
+    Args:
+        client (openai.AsyncOpenAI): The async OpenAI client.
+        message (discord.Message): The message to reply to.
+        messages (list): The chat completion messages.
+        **kwargs: Extra arguments for ``chat.completions.create``.
+
+    Returns:
+        str or None: The complete response text, or None if the stream failed. The reply then
+        ends with an error notice, so callers should not report the failure again.
+    """
+    reply = StreamingReply(message)
+    await reply.start()
+    try:
+        stream = await client.chat.completions.create(
+            messages=messages, stream=True, **kwargs
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                await reply.append(chunk.choices[0].delta.content)
+    except Exception as e:
+        logging.error(f"Failed to stream chat completion: {e}")
+        await reply.fail()
+        return None
+    await reply.finish()
+    return reply.text
@@ -0,0 +1,181 @@
+import time
+import random
+import asyncio
+import inspect
+import logging
+import traceback
+from collections import deque
+
+from ylb import config
+
+
+class SupervisedTask:
+    """Health record of one supervised coroutine."""
+
+    def __init__(self, name, factory, on_failure=None):
+        self.name = name
+        self.factory = factory
+        self.on_failure = on_failure
+        self.task = None
+        self.state = "starting"
+        self.restarts = 0
+        self.failures = deque()
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.started_at = None
+
+    def health(self):
+        """
+        Returns the task's health state.
+
+        Returns:
+            dict: State, restart count, latest error and seconds since the last (re)start.
+        """
+        return {
+            "state": self.state,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "uptime": time.monotonic() - self.started_at if self.started_at and self.state == "running" else None,
+        }
+
+
+class TaskSupervisor:
+    """
+    Runs the bot's long-running coroutines and restarts them when they crash.
+
+    A crashed coroutine is restarted after an exponential backoff with
+    jitter, so a persistent failure cannot become a hot loop. A coroutine
+    that crashes more than ``max_restarts`` times within ``restart_window``
+    seconds is marked failed and not restarted again, and its
+    ``on_failure`` hook is called so the owner can clean up. A coroutine
+    that returns normally is not restarted.
+    """
+
+    def __init__(
+        self,
+        initial_backoff=None,
+        max_backoff=None,
+        max_restarts=None,
+        restart_window=None,
+        healthy_after=None,
+    ):
+        """
+        Args:
+            initial_backoff (float, optional): Seconds to wait before the first restart.
+            max_backoff (float, optional): Maximum seconds to wait between restarts.
+            max_restarts (int, optional): Restarts allowed within ``restart_window`` before giving up.
+            restart_window (float, optional): Window in seconds over which restarts are counted.
+            healthy_after (float, optional): Seconds of uptime after which the backoff resets.
+        """
+        self.initial_backoff = initial_backoff or config.SUPERVISOR_INITIAL_BACKOFF
+        self.max_backoff = max_backoff or config.SUPERVISOR_MAX_BACKOFF
+        self.max_restarts = max_restarts or config.SUPERVISOR_MAX_RESTARTS
+        self.restart_window = restart_window or config.SUPERVISOR_RESTART_WINDOW
+        self.healthy_after = healthy_after or config.SUPERVISOR_HEALTHY_AFTER
+        self._tasks = {}
+        self._hooks = set()
+
+    def start(self, name, factory, on_failure=None):
+        """
+        Starts supervising a coroutine, replacing any task of the same name.
+
+        Args:
+            name (str): Unique name of the task.
+            factory (callable): Called with no arguments to create the coroutine, on start and on every restart.
+            on_failure (callable, optional): Called with the latest error when the task is given up on. May be a
+                coroutine function; it runs in a task of its own, so it may cancel the supervised task.
+
+        Returns:
+            asyncio.Task: The supervising task. Cancelling it stops the coroutine for good.
+        """
+        previous = self._tasks.get(name)
+        if previous and previous.task and not previous.task.done():
+            previous.task.cancel()
+
+        supervised = self._tasks[name] = SupervisedTask(name, factory, on_failure)
+        supervised.task = asyncio.create_task(self._run(supervised), name=name)
+        return supervised.task
+
+    def health(self):
+        """
+        Returns the health of every supervised task.
+
+        Returns:
+            dict: Health records keyed by task name.
+        """
+        return {name: supervised.health() for name, supervised in self._tasks.items()}
+
+    async def cancel(self, name):
+        """
+        Stops a supervised task.
+
+        Args:
+            name (str): The name of the task.
+        """
+        supervised = self._tasks.get(name)
+        if supervised and supervised.task and supervised.task is not asyncio.current_task():
+            supervised.task.cancel()
+            await asyncio.gather(supervised.task, return_exceptions=True)
+
+    async def close(self):
+        """Cancels every supervised task and waits for them to finish."""
+        await asyncio.gather(*[self.cancel(name) for name in list(self._tasks)])
+
+    def _notify_failure(self, supervised):
+        if supervised.on_failure is None:
+            return
+        try:
+            result = supervised.on_failure(supervised.last_error)
+            if inspect.isawaitable(result):
+                hook = asyncio.ensure_future(result)
+                self._hooks.add(hook)
+                hook.add_done_callback(self._hooks.discard)
+        except Exception as e:
+            logging.error(f"Failure hook of task {supervised.name} failed: {e}")
+
+    def _backoff(self, supervised):
+        delay = min(self.max_backoff, self.initial_backoff * 2 ** (supervised.consecutive_failures - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def _run(self, supervised):
+        try:
+            while True:
+                supervised.state = "running"
+                supervised.started_at = time.monotonic()
+                try:
+                    await supervised.factory()
+                    supervised.state = "stopped"
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    now = time.monotonic()
+                    if now - supervised.started_at >= self.healthy_after:
+                        supervised.consecutive_failures = 0
+                    supervised.consecutive_failures += 1
+                    supervised.last_error = f"{type(e).__name__}: {e}"
+                    supervised.failures.append(now)
+                    while supervised.failures and now - supervised.failures[0] > self.restart_window:
+                        supervised.failures.popleft()
+                    logging.error(f"Task {supervised.name} crashed: {supervised.last_error}\n{traceback.format_exc()}")
+
+                    if len(supervised.failures) > self.max_restarts:
+                        supervised.state = "failed"
+                        logging.error(
+                            f"Task {supervised.name} crashed {len(supervised.failures)} times in "
+                            f"{self.restart_window}s, not restarting"
+                        )
+                        self._notify_failure(supervised)
+                        return
+
+                supervised.state = "backoff"
+                delay = self._backoff(supervised)
+                logging.warning(f"Restarting task {supervised.name} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                supervised.restarts += 1
+        except asyncio.CancelledError:
+            supervised.state = "cancelled"
+            raise
+        finally:
+            if self._tasks.get(supervised.name) is supervised and supervised.state in ("stopped", "cancelled"):
+                del self._tasks[supervised.name]
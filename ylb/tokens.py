@@ -0,0 +1,205 @@
+from collections import Counter
+
+from ylb import config
+from ylb import utils
+
+# Number of discarded session IDs remembered, so late counts are not taken for new sessions
+DISCARDED_SESSIONS_KEPT = 1024
+
+# What the counted text was: user prompts, voice transcripts, tool outputs and assistant replies
+TOKEN_CATEGORIES = ("prompt", "transcript", "tool_output", "completion")
+
+
+class SessionTokens:
+    """Token counts of one conversation session."""
+
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.estimated = Counter()
+        self.sources = Counter()
+        self.billed = Counter()
+        self.runs = 0
+
+    @property
+    def total(self):
+        """Billed tokens if any run reported usage, otherwise the estimated tokens."""
+        return sum(self.billed.values()) if self.runs else sum(self.estimated.values())
+
+    def totals(self):
+        """
+        Returns the session's token totals.
+
+        Returns:
+            dict: Estimated tokens per category, billed prompt and completion tokens, and the overall total.
+        """
+        return {
+            **{category: self.estimated[category] for category in TOKEN_CATEGORIES},
+            "billed_prompt": self.billed["prompt"],
+            "billed_completion": self.billed["completion"],
+            "runs": self.runs,
+            "total": self.total,
+        }
+
+
+class TokenAccountant:
+    """
+    Counts the tokens spent per conversation session and per guild.
+
+    Text going into and out of the assistant is estimated locally with the
+    model's tiktoken encoding, by category and by source (the tool or
+    speaker it came from), which shows what drives context size. Runs also
+    report the prompt and completion tokens that were actually billed; once
+    a session has any, its budget is checked against those. Sessions are
+    kept until ``discard`` is called; their totals then stay in the guild's
+    totals. Tokens counted for a session after it was discarded (the rest of
+    the run that ended it) go straight to the guild's totals; since they are
+    estimates, only billed usage adds to the total there.
+    """
+
+    def __init__(self, model=None, session_budget=None):
+        """
+        Args:
+            model (str, optional): Model whose encoding is used for estimates.
+            session_budget (int, optional): Maximum tokens per session. 0 disables the budget.
+        """
+        self.encoding = utils.get_encoding_for_model(model or config.OPENAI_MODEL)
+        self.session_budget = session_budget if session_budget is not None else config.TOKENS_SESSION_BUDGET
+        self._sessions = {}
+        self._discarded = {}
+        # Insertion-ordered, so the oldest IDs are forgotten first
+        self._discarded_sessions = {}
+
+    def session(self, session_id, guild_id=None):
+        """
+        Returns a session's token counts, creating them if needed.
+
+        Args:
+            session_id (str): The ID of the session.
+            guild_id (int, optional): The guild the session belongs to.
+
+        Returns:
+            SessionTokens: The session's token counts.
+        """
+        if session_id not in self._sessions:
+            self._sessions[session_id] = SessionTokens(guild_id)
+        return self._sessions[session_id]
+
+    def discard(self, session_id):
+        """
+        Forgets a finished session, keeping its totals in its guild's totals.
+
+        Args:
+            session_id (str): The ID of the session.
+        """
+        usage = self._sessions.pop(session_id, None)
+        if usage is not None:
+            self._discarded.setdefault(usage.guild_id, Counter()).update(usage.totals())
+            self._discarded_sessions[session_id] = None
+            while len(self._discarded_sessions) > DISCARDED_SESSIONS_KEPT:
+                del self._discarded_sessions[next(iter(self._discarded_sessions))]
+
+    def count(self, session_id, guild_id, category, text, source=None):
+        """
+        Estimates and records the tokens of a piece of text.
+
+        Args:
+            session_id (str): The ID of the session.
+            guild_id (int): The guild the session belongs to.
+            category (str): One of ``TOKEN_CATEGORIES``.
+            text (str): The counted text.
+            source (str, optional): Where the text came from, such as a tool name.
+
+        Returns:
+            int: The number of tokens in the text.
+        """
+        if category not in TOKEN_CATEGORIES:
+            raise ValueError(f"Unknown token category '{category}'. Expected one of: {', '.join(TOKEN_CATEGORIES)}")
+        tokens = len(self.encoding.encode_ordinary(text or ""))
+        if session_id in self._discarded_sessions:
+            self._discarded.setdefault(guild_id, Counter())[category] += tokens
+            return tokens
+        usage = self.session(session_id, guild_id)
+        usage.estimated[category] += tokens
+        usage.sources[(category, source or category)] += tokens
+        return tokens
+
+    def add_usage(self, session_id, guild_id, usage):
+        """
+        Records the billed token usage of an assistant run.
+
+        Args:
+            session_id (str): The ID of the session.
+            guild_id (int): The guild the session belongs to.
+            usage (openai.types.beta.threads.run.Usage): The run's ``usage`` field.
+        """
+        if usage is None:
+            return
+        if session_id in self._discarded_sessions:
+            totals = self._discarded.setdefault(guild_id, Counter())
+            totals.update(
+                billed_prompt=usage.prompt_tokens,
+                billed_completion=usage.completion_tokens,
+                runs=1,
+                total=usage.prompt_tokens + usage.completion_tokens,
+            )
+            return
+        tokens = self.session(session_id, guild_id)
+        tokens.billed["prompt"] += usage.prompt_tokens
+        tokens.billed["completion"] += usage.completion_tokens
+        tokens.runs += 1
+
+    def over_budget(self, session_id):
+        """
+        Returns whether a session has used up its token budget.
+
+        Args:
+            session_id (str): The ID of the session.
+
+        Returns:
+            bool: True if the budget is enabled and exhausted.
+        """
+        return bool(self.session_budget) and session_id in self._sessions and (
+            self._sessions[session_id].total >= self.session_budget
+        )
+
+    def session_totals(self, session_id):
+        """
+        Returns a session's token totals.
+
+        Args:
+            session_id (str): The ID of the session.
+
+        Returns:
+            dict: The session's totals, see ``SessionTokens.totals``. All zero for unknown sessions.
+        """
+        return self._sessions.get(session_id, SessionTokens(None)).totals()
+
+    def guild_totals(self, guild_id):
+        """
+        Returns the token totals of every session in a guild combined, including discarded sessions.
+
+        Args:
+            guild_id (int): The ID of the guild.
+
+        Returns:
+            dict: The summed totals.
+        """
+        totals = Counter(self._discarded.get(guild_id, {}))
+        for usage in self._sessions.values():
+            if usage.guild_id == guild_id:
+                totals.update(usage.totals())
+        return dict(totals)
+
+    def top_sources(self, session_id, limit=5):
+        """
+        Returns the sources that added the most tokens to a session.
+
+        Args:
+            session_id (str): The ID of the session.
+            limit (int, optional): Number of sources to return.
+
+        Returns:
+            list: ``((category, source), tokens)`` tuples, largest first.
+        """
+        usage = self._sessions.get(session_id)
+        return usage.sources.most_common(limit) if usage else []
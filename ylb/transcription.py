@@ -0,0 +1,261 @@
+import io
+import time
+import wave
+import zlib
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+from ylb import config
+from ylb import utils
+
+# Upload formats accepted by the OpenAI transcription endpoint, by file extension
+UPLOAD_FORMATS = ("wav", "flac", "ogg")
+
+_encoder_pool = None
+
+
+def encode_audio(wav, upload_format, bitrate=None):
+    """
+    Encodes WAV audio into a compact upload format.
+
+    See ``encode_audio_with_encoder``.
+
+    Args:
+        wav (bytes): The audio as 16-bit PCM WAV bytes.
+        upload_format (str): The target format (wav, flac or ogg).
+        bitrate (str, optional): Opus bitrate for the ffmpeg encoder (e.g. 24k).
+
+    Returns:
+        bytes: The encoded audio.
+    """
+    return encode_audio_with_encoder(wav, upload_format, bitrate)[0]
+
+
+def encode_audio_with_encoder(wav, upload_format, bitrate=None):
+    """
+    Encodes WAV audio into a compact upload format and reports which encoder ran.
+
+    FLAC is lossless; OGG uses the Opus codec, which is lossy but much
+    smaller and still transcribes well at speech bitrates. Encoding uses
+    libsndfile through ``soundfile`` when it is installed and falls back to
+    ffmpeg through ``pydub``. Only ffmpeg takes a bitrate: libsndfile
+    encodes Opus at its own default quality and ``bitrate`` is ignored.
+
+    Args:
+        wav (bytes): The audio as 16-bit PCM WAV bytes.
+        upload_format (str): The target format (wav, flac or ogg).
+        bitrate (str, optional): Opus bitrate for the ffmpeg encoder (e.g. 24k).
+
+    Returns:
+        tuple: The encoded audio, and the encoder that produced it (none, soundfile or ffmpeg).
+    """
+    if upload_format == "wav":
+        return wav, "none"
+    if upload_format not in UPLOAD_FORMATS:
+        raise ValueError(f"Unknown upload format '{upload_format}'. Expected one of: {', '.join(UPLOAD_FORMATS)}")
+
+    try:
+        import soundfile
+
+        data, sample_rate = soundfile.read(io.BytesIO(wav), dtype="int16")
+        buffer = io.BytesIO()
+        if upload_format == "flac":
+            soundfile.write(buffer, data, sample_rate, format="FLAC")
+        else:
+            soundfile.write(buffer, data, sample_rate, format="OGG", subtype="OPUS")
+        return buffer.getvalue(), "soundfile"
+    except (ImportError, RuntimeError, TypeError, ValueError):
+        # soundfile missing, or a libsndfile build without Opus support
+        from pydub import AudioSegment
+
+        sound = AudioSegment.from_wav(io.BytesIO(wav))
+        buffer = io.BytesIO()
+        if upload_format == "flac":
+            sound.export(buffer, format="flac")
+        else:
+            sound.export(buffer, format="ogg", codec="libopus", bitrate=bitrate or config.TRANSCRIPTION_UPLOAD_BITRATE)
+        return buffer.getvalue(), "ffmpeg"
+
+
+def get_encoder_pool():
+    """
+    Returns the shared process pool used for upload encoding, creating it if needed.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor or None: The pool, or None if encoding runs in-process.
+    """
+    global _encoder_pool
+    if _encoder_pool is None and config.TRANSCRIPTION_UPLOAD_WORKERS > 0:
+        _encoder_pool = ProcessPoolExecutor(max_workers=config.TRANSCRIPTION_UPLOAD_WORKERS)
+    return _encoder_pool
+
+
+class Transcriber(ABC):
+    """
+    Base interface for speech-to-text backends.
+
+    Backends take a complete WAV file as bytes and return the transcript as
+    plain text. ``transcribe`` is blocking; callers on the event loop run it
+    in a worker thread.
+    """
+
+    name = None
+
+    @abstractmethod
+    def transcribe(self, wav: bytes) -> str:
+        """
+        Transcribes WAV audio.
+
+        Args:
+            wav (bytes): The audio as WAV bytes.
+
+        Returns:
+            str: The transcribed text.
+        """
+        raise NotImplementedError
+
+
+class OpenAITranscriber(Transcriber):
+    """
+    Transcribes audio with the OpenAI transcription API.
+
+    Audio is encoded into the configured upload format first, either
+    in-process or in the shared encoder pool, to keep request bodies small.
+    """
+
+    name = "openai"
+
+    def __init__(self, model=None, upload_format=None):
+        """
+        Args:
+            model (str, optional): The transcription model.
+            upload_format (str, optional): The upload format (wav, flac or ogg).
+        """
+        from ylb import openai_client
+
+        self.client = openai_client
+        self.model = model or config.OPENAI_VOICE_MODEL
+        self.upload_format = (upload_format or config.TRANSCRIPTION_UPLOAD_FORMAT).lower()
+        if self.upload_format not in UPLOAD_FORMATS:
+            raise ValueError(
+                f"Unknown upload format '{self.upload_format}'. Expected one of: {', '.join(UPLOAD_FORMATS)}"
+            )
+
+    def encode(self, wav):
+        """
+        Encodes WAV audio into the upload format.
+
+        Args:
+            wav (bytes): The audio as WAV bytes.
+
+        Returns:
+            bytes: The encoded audio.
+        """
+        pool = get_encoder_pool()
+        if pool is None or self.upload_format == "wav":
+            return encode_audio(wav, self.upload_format)
+        return pool.submit(encode_audio, wav, self.upload_format).result()
+
+    def transcribe(self, wav):
+        audio = self.encode(wav)
+        transcript = self.client.audio.transcriptions.create(
+            model=self.model, file=(f"audio.{self.upload_format}", audio), response_format="text"
+        )
+        return str(transcript).strip()
+
+
+class LocalWhisperTranscriber(Transcriber):
+    """
+    Transcribes audio on the local CPU with faster-whisper.
+
+    The quantized model is loaded once when the backend is created and kept
+    in memory, so each utterance only pays for inference. Requires the
+    optional ``faster-whisper`` package.
+    """
+
+    name = "local"
+
+    def __init__(self, model=None, device=None, compute_type=None, cpu_threads=None, beam_size=None, language=None):
+        """
+        Args:
+            model (str, optional): Model size or path (e.g. tiny.en, base.en, small).
+            device (str, optional): Device to run on (cpu or cuda).
+            compute_type (str, optional): Quantization of the model weights (e.g. int8).
+            cpu_threads (int, optional): Number of CPU threads used by inference. 0 uses the library default.
+            beam_size (int, optional): Beam size used for decoding.
+            language (str, optional): Language of the speech. Detected per utterance if not set.
+        """
+        from faster_whisper import WhisperModel
+
+        self.model_name = model or config.TRANSCRIPTION_LOCAL_MODEL
+        self.beam_size = beam_size or config.TRANSCRIPTION_LOCAL_BEAM_SIZE
+        self.language = language or config.TRANSCRIPTION_LOCAL_LANGUAGE
+
+        started = time.time()
+        self.model = WhisperModel(
+            self.model_name,
+            device=device or config.TRANSCRIPTION_LOCAL_DEVICE,
+            compute_type=compute_type or config.TRANSCRIPTION_LOCAL_COMPUTE_TYPE,
+            cpu_threads=cpu_threads if cpu_threads is not None else config.TRANSCRIPTION_LOCAL_CPU_THREADS,
+        )
+        logging.info(f"Loaded local transcription model '{self.model_name}' in {time.time() - started:.2f} seconds")
+
+    def transcribe(self, wav):
+        segments, _ = self.model.transcribe(
+            io.BytesIO(wav), beam_size=self.beam_size, language=self.language
+        )
+        # Segments are decoded lazily while iterating
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+class FakeTranscriber(Transcriber):
+    """
+    Deterministic transcriber for benchmarks and offline load tests.
+
+    Returns the configured text (or a label derived from the audio checksum
+    and duration) after an optional fixed latency, without any model or
+    network access.
+    """
+
+    name = "fake"
+
+    def __init__(self, text=None, latency=None):
+        """
+        Args:
+            text (str, optional): Text returned for every utterance.
+            latency (float, optional): Seconds each transcription takes.
+        """
+        self.text = text if text is not None else config.TRANSCRIPTION_FAKE_TEXT
+        self.latency = latency if latency is not None else config.TRANSCRIPTION_FAKE_LATENCY
+
+    def transcribe(self, wav):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.text:
+            return self.text
+        with wave.open(io.BytesIO(wav), "rb") as wf:
+            duration = wf.getnframes() / wf.getframerate()
+        return f"utterance {zlib.crc32(wav):08x} ({duration:.2f}s)"
+
+
+TRANSCRIPTION_BACKENDS = {
+    "openai": OpenAITranscriber,
+    "local": LocalWhisperTranscriber,
+    "fake": FakeTranscriber,
+}
+
+
+def create_transcriber(backend=None) -> Transcriber:
+    """
+    Creates the transcription backend selected in ylb-config.yaml.
+
+    Args:
+        backend (str, optional): Overrides the configured backend name.
+
+    Returns:
+        Transcriber: The transcription backend instance.
+    """
+    return utils.create_backend(
+        "transcription backend", TRANSCRIPTION_BACKENDS, backend or config.TRANSCRIPTION_BACKEND
+    )
@@ -1,4 +1,6 @@
 import inspect
+import logging
+import functools
 import ast
 import tiktoken
 import os
@@ -158,6 +160,35 @@ def print_section(text: str, color: str = "", depth: int = 1, reset_color: bool
 
 
 
+@functools.lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "cl100k_base"):
+    """
+    Returns a tiktoken encoding, loading it only once per process.
+
+    :param encoding_name: The name of the encoding.
+    :type encoding_name: str
+    :return: The encoding.
+    :rtype: tiktoken.Encoding
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding_for_model(model: str):
+    """
+    Returns the tiktoken encoding used by a model, falling back to cl100k_base for unknown models.
+
+    :param model: The model name.
+    :type model: str
+    :return: The encoding.
+    :rtype: tiktoken.Encoding
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return get_encoding("cl100k_base")
+
+
 def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> int:
     """
     Returns the number of tokens in a text string.
@@ -169,11 +200,33 @@ def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> i
     :return: The number of tokens in the text string.
     :rtype: int
     """
-    encoding = tiktoken.get_encoding(encoding_name)
+    encoding = get_encoding(encoding_name)
     num_tokens = len(encoding.encode(string))
     return num_tokens
 
 
+def create_backend(kind: str, backends: dict, name: str, *args, **kwargs):
+    """
+    Creates a backend by name from a registry of implementations.
+
+    :param kind: What the backend is, used in log and error messages (e.g. "storage backend").
+    :type kind: str
+    :param backends: Backend classes keyed by lowercase name.
+    :type backends: dict
+    :param name: The name of the backend to create. Case-insensitive.
+    :type name: str
+    :param args: Positional arguments for the backend's constructor.
+    :param kwargs: Keyword arguments for the backend's constructor.
+    :return: The backend instance.
+    :raises ValueError: If no backend has that name.
+    """
+    name = name.lower()
+    if name not in backends:
+        raise ValueError(f"Unknown {kind} '{name}'. Expected one of: {', '.join(backends)}")
+    logging.info(f"Using '{name}' {kind}")
+    return backends[name](*args, **kwargs)
+
+
 class FunctionWrapper:
     def __init__(self, func):
         """Initialize the class with function
@@ -203,6 +256,10 @@ class FunctionWrapper:
         # Extract function arguments and their types
         args = tree.body[0].args
         parameters = {"type": "object", "properties": {}}
+        # Arguments with default values are optional for the model
+        optional_arguments = {
+            arg.arg for arg in args.args[len(args.args) - len(args.defaults) :]
+        }
         for arg in args.args:
             argument_name = arg.arg
             if argument_name == "self":
@@ -226,7 +283,11 @@ class FunctionWrapper:
                 "parameters": {
                     "type": "object",
                     "properties": parameters["properties"],
-                    "required": list(parameters["properties"].keys()),
+                    "required": [
+                        name
+                        for name in parameters["properties"]
+                        if name not in optional_arguments
+                    ],
                 },
             },
         }
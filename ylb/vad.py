@@ -0,0 +1,183 @@
+import threading
+
+import numpy as np
+import webrtcvad
+
+from ylb import config
+
+# Sample rates and frame lengths accepted by webrtcvad
+VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+VAD_FRAME_DURATIONS = (10, 20, 30)
+
+_local = threading.local()
+
+
+def get_vad(aggressiveness=None):
+    """
+    Returns a reusable webrtcvad instance for the current thread.
+
+    ``webrtcvad.Vad`` objects hold native state and are not safe to share
+    between threads, so one instance is kept per thread and aggressiveness.
+
+    Args:
+        aggressiveness (int, optional): VAD aggressiveness from 0 to 3.
+
+    Returns:
+        webrtcvad.Vad: The VAD instance.
+    """
+    aggressiveness = config.VAD_AGGRESSIVENESS if aggressiveness is None else aggressiveness
+    instances = getattr(_local, "instances", None)
+    if instances is None:
+        instances = _local.instances = {}
+    if aggressiveness not in instances:
+        instances[aggressiveness] = webrtcvad.Vad(aggressiveness)
+    return instances[aggressiveness]
+
+
+def to_mono(pcm, channels=1):
+    """
+    Converts raw 16-bit PCM to a mono sample array.
+
+    Args:
+        pcm (bytes): Raw 16-bit PCM audio.
+        channels (int, optional): Number of interleaved channels.
+
+    Returns:
+        numpy.ndarray: The mono int16 samples.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // (2 * channels) * channels)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples
+
+
+def frame_features(samples, frame_samples):
+    """
+    Computes per-frame energy and zero-crossing rate.
+
+    Args:
+        samples (numpy.ndarray): Mono int16 samples.
+        frame_samples (int): Number of samples per frame. A trailing partial frame is ignored.
+
+    Returns:
+        tuple: Frame energies in dBFS and zero-crossing rates (crossings per sample), as arrays.
+    """
+    frames = samples[: len(samples) // frame_samples * frame_samples].reshape(-1, frame_samples)
+    floats = frames.astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(floats * floats, axis=1))
+    energy = 20 * np.log10(np.maximum(rms, 1e-10))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_samples
+    return energy, zcr
+
+
+def speech_frames(
+    pcm,
+    sample_rate,
+    channels=1,
+    frame_duration=30,
+    aggressiveness=None,
+    energy_threshold=None,
+    max_zero_crossing_rate=None,
+    first_only=False,
+):
+    """
+    Classifies each frame of raw 16-bit PCM audio as speech or not.
+
+    Frames that are too quiet, or cross zero too often to be voice (hiss,
+    clicks), are rejected with vectorized NumPy gates. Only the remaining
+    candidate frames are passed to webrtcvad.
+
+    Args:
+        pcm (bytes): Raw 16-bit PCM audio.
+        sample_rate (int): Sample rate of the audio.
+        channels (int, optional): Number of interleaved channels. Multi-channel audio is downmixed.
+        frame_duration (int, optional): Frame length in milliseconds (10, 20 or 30).
+        aggressiveness (int, optional): VAD aggressiveness from 0 to 3.
+        energy_threshold (float, optional): Minimum frame energy in dBFS considered for speech.
+        max_zero_crossing_rate (float, optional): Maximum zero-crossing rate considered for speech.
+        first_only (bool, optional): Stop classifying after the first speech frame.
+
+    Returns:
+        numpy.ndarray: A boolean per full frame, True where speech was detected.
+    """
+    if frame_duration not in VAD_FRAME_DURATIONS:
+        raise ValueError(f"Unsupported VAD frame duration: {frame_duration} ms")
+    energy_threshold = config.VAD_ENERGY_THRESHOLD if energy_threshold is None else energy_threshold
+    max_zero_crossing_rate = (
+        config.VAD_MAX_ZERO_CROSSING_RATE if max_zero_crossing_rate is None else max_zero_crossing_rate
+    )
+
+    samples = to_mono(pcm, channels)
+    frame_samples = int(sample_rate * frame_duration / 1000)
+    energy, zcr = frame_features(samples, frame_samples)
+    voiced = (energy >= energy_threshold) & (zcr <= max_zero_crossing_rate)
+
+    # Without a rate webrtcvad accepts, the NumPy gates are the whole decision
+    if sample_rate not in VAD_SAMPLE_RATES:
+        return voiced
+
+    vad = get_vad(aggressiveness)
+    frame_bytes = frame_samples * 2
+    mono = samples.tobytes()
+    for index in np.flatnonzero(voiced):
+        start = index * frame_bytes
+        voiced[index] = vad.is_speech(mono[start : start + frame_bytes], sample_rate)
+        if first_only and voiced[index]:
+            voiced[index + 1 :] = False
+            break
+    return voiced
+
+
+def contains_speech(pcm, sample_rate, channels=1, **kwargs):
+    """
+    Returns whether raw 16-bit PCM audio contains any speech.
+
+    Args:
+        pcm (bytes): Raw 16-bit PCM audio.
+        sample_rate (int): Sample rate of the audio.
+        channels (int, optional): Number of interleaved channels.
+        **kwargs: Extra options for ``speech_frames``.
+
+    Returns:
+        bool: True if at least one frame contains speech.
+    """
+    return bool(speech_frames(pcm, sample_rate, channels, first_only=True, **kwargs).any())
+
+
+def speech_segments(pcm, sample_rate, channels=1, frame_duration=30, min_pause=None, min_speech=None, **kwargs):
+    """
+    Finds the timestamped speech segments of raw 16-bit PCM audio.
+
+    Args:
+        pcm (bytes): Raw 16-bit PCM audio.
+        sample_rate (int): Sample rate of the audio.
+        channels (int, optional): Number of interleaved channels.
+        frame_duration (int, optional): Frame length in milliseconds (10, 20 or 30).
+        min_pause (float, optional): Seconds of silence that separate two segments.
+        min_speech (float, optional): Segments shorter than this many seconds are dropped.
+        **kwargs: Extra options for ``speech_frames``.
+
+    Returns:
+        list: ``(start, end)`` tuples in seconds from the start of the audio.
+    """
+    min_pause = config.VAD_MIN_PAUSE if min_pause is None else min_pause
+    min_speech = config.VAD_MIN_SPEECH if min_speech is None else min_speech
+
+    voiced = speech_frames(pcm, sample_rate, channels, frame_duration, **kwargs)
+    if not voiced.any():
+        return []
+
+    # Run boundaries: indices where the voiced state flips
+    padded = np.concatenate(([False], voiced, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    frame_seconds = frame_duration / 1000
+
+    segments = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        start, end = int(start) * frame_seconds, int(end) * frame_seconds
+        if segments and start - segments[-1][1] < min_pause:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return [(round(start, 3), round(end, 3)) for start, end in segments if end - start >= min_speech]
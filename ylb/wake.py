@@ -0,0 +1,236 @@
+import io
+import time
+import wave
+import zlib
+import asyncio
+import logging
+import importlib.util
+from abc import ABC, abstractmethod
+from collections import deque
+
+import speech_recognition as sr
+
+from ylb import config
+from ylb import utils
+from ylb.vad import speech_segments, to_mono
+
+
+class AudioRingBuffer:
+    """
+    Compressed per-speaker ring buffer of recent recording windows.
+
+    While waiting for the activation phrase the bot keeps each speaker's
+    recent audio instead of transcribing it. Windows are stored as
+    zlib-compressed WAV bytes and dropped once they are older than
+    ``max_seconds``, so memory stays bounded however long people talk.
+    """
+
+    def __init__(self, max_seconds=None, max_windows=None):
+        """
+        Args:
+            max_seconds (float, optional): Maximum age in seconds of a buffered window.
+            max_windows (int, optional): Maximum number of windows kept per speaker.
+        """
+        self.max_seconds = max_seconds or config.CONTINUOUS_LISTEN_WAKE_BUFFER_SECONDS
+        self.max_windows = max_windows or max(
+            1, int(self.max_seconds // max(config.CONTINUOUS_LISTEN_RECORDING_DURATION, 1)) + 1
+        )
+        self._speakers = {}
+
+    @property
+    def size(self):
+        """Compressed size in bytes of every buffered window."""
+        return sum(
+            len(entry["audio"]) for windows in self._speakers.values() for entry in windows
+        )
+
+    def add(self, user_id, wav, label, timestamp=None, transcript=None):
+        """
+        Buffers a speaker's recording window.
+
+        Args:
+            user_id (int): The ID of the speaker.
+            wav (bytes): The window's audio as WAV bytes.
+            label (str): Display label of the speaker, used to tag the transcript.
+            timestamp (float, optional): When the window was recorded. Defaults to now.
+            transcript (str, optional): The window's transcript, if already known.
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        windows = self._speakers.setdefault(user_id, deque(maxlen=self.max_windows))
+        windows.append(
+            {
+                "timestamp": timestamp,
+                "label": label,
+                "audio": zlib.compress(wav, 1),
+                "transcript": transcript,
+            }
+        )
+        self.prune(timestamp)
+
+    def prune(self, now=None):
+        """
+        Drops windows older than ``max_seconds``.
+
+        Args:
+            now (float, optional): The current time. Defaults to now.
+        """
+        now = now if now is not None else time.time()
+        for user_id in list(self._speakers):
+            windows = self._speakers[user_id]
+            while windows and now - windows[0]["timestamp"] > self.max_seconds:
+                windows.popleft()
+            if not windows:
+                del self._speakers[user_id]
+
+    def drain(self):
+        """
+        Returns every buffered window and empties the buffer.
+
+        Returns:
+            list: ``(user_id, timestamp, label, wav, transcript)`` tuples, oldest first.
+        """
+        self.prune()
+        windows = [
+            (user_id, entry["timestamp"], entry["label"], zlib.decompress(entry["audio"]), entry["transcript"])
+            for user_id, entries in self._speakers.items()
+            for entry in entries
+        ]
+        self._speakers.clear()
+        return sorted(windows, key=lambda window: window[1])
+
+
+class WakeDetector(ABC):
+    """Base class for activation phrase detectors."""
+
+    def __init__(self, phrase=None):
+        self.phrase = (phrase or config.CONTINUOUS_LISTEN_ACTIVATION_PHRASE).lower()
+
+    @abstractmethod
+    async def detect(self, wav):
+        """
+        Checks a recording window for the activation phrase.
+
+        Args:
+            wav (bytes): The window's audio as WAV bytes.
+
+        Returns:
+            tuple: Whether the phrase was heard, and the window's transcript if one was produced.
+        """
+        raise NotImplementedError
+
+
+class SphinxWakeDetector(WakeDetector):
+    """
+    Local keyword spotter backed by CMU PocketSphinx.
+
+    Runs offline on the CPU, so detecting the activation phrase costs no API
+    calls. Requires the optional ``pocketsphinx`` package.
+    """
+
+    def __init__(self, phrase=None, sensitivity=None):
+        super().__init__(phrase)
+        self.sensitivity = sensitivity if sensitivity is not None else config.CONTINUOUS_LISTEN_WAKE_SENSITIVITY
+        self.recognizer = sr.Recognizer()
+
+    def _detect(self, wav):
+        with sr.AudioFile(io.BytesIO(wav)) as source:
+            audio = self.recognizer.record(source)
+        try:
+            heard = self.recognizer.recognize_sphinx(
+                audio, keyword_entries=[(self.phrase, self.sensitivity)]
+            )
+        except sr.UnknownValueError:
+            return False
+        return self.phrase in heard.lower()
+
+    async def detect(self, wav):
+        return await asyncio.to_thread(self._detect, wav), None
+
+
+class ProbeWakeDetector(WakeDetector):
+    """
+    Detects the activation phrase with a probe transcription of the window.
+
+    Used when no local keyword spotter is available. Only the first
+    ``probe_seconds`` of speech in a window are transcribed, and windows
+    without speech are not transcribed at all, so probing costs a fraction
+    of transcribing every window. The activation phrase is expected near
+    the start of what someone says.
+    """
+
+    def __init__(self, transcribe, phrase=None, probe_seconds=None):
+        """
+        Args:
+            transcribe (callable): Coroutine transcribing WAV bytes to text.
+            phrase (str, optional): The activation phrase.
+            probe_seconds (float, optional): Seconds of speech transcribed per window.
+        """
+        super().__init__(phrase)
+        self.transcribe = transcribe
+        self.probe_seconds = probe_seconds or config.CONTINUOUS_LISTEN_WAKE_PROBE_SECONDS
+
+    def leading_slice(self, wav):
+        """
+        Cuts the first ``probe_seconds`` of speech out of a window.
+
+        Args:
+            wav (bytes): The window's audio as 16-bit PCM WAV bytes.
+
+        Returns:
+            bytes or None: Mono WAV bytes of the slice, or None if the window has no speech.
+        """
+        with wave.open(io.BytesIO(wav), "rb") as wf:
+            rate, channels = wf.getframerate(), wf.getnchannels()
+            samples = to_mono(wf.readframes(wf.getnframes()), channels)
+        segments = speech_segments(samples.tobytes(), rate)
+        if not segments:
+            return None
+
+        # Keep a little audio before the speech so the first word is not clipped
+        start = max(0, int((segments[0][0] - 0.1) * rate))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(rate)
+            wf.writeframes(samples[start : start + int(self.probe_seconds * rate)].tobytes())
+        return buffer.getvalue()
+
+    async def detect(self, wav):
+        probe = await asyncio.to_thread(self.leading_slice, wav)
+        if probe is None:
+            return False, ""
+        transcript = await self.transcribe(probe)
+        # The probe covers only part of the window, so the window is still transcribed in full on wake
+        return self.phrase in transcript.lower(), None
+
+
+WAKE_DETECTORS = {
+    "sphinx": SphinxWakeDetector,
+    "probe": ProbeWakeDetector,
+}
+
+
+def create_wake_detector(transcribe, detector=None):
+    """
+    Creates the configured wake detector.
+
+    Falls back to probe transcription if PocketSphinx is not installed, which is logged as a warning.
+
+    Args:
+        transcribe (callable): Coroutine transcribing WAV bytes to text, used by the probe detector.
+        detector (str, optional): Detector name (sphinx or probe). Defaults to the configured detector.
+
+    Returns:
+        WakeDetector: The wake detector.
+    """
+    detector = (detector or config.CONTINUOUS_LISTEN_WAKE_DETECTOR).lower()
+    if detector == "sphinx" and importlib.util.find_spec("pocketsphinx") is None:
+        logging.warning("pocketsphinx is not installed (install the wake-word extra), falling back to probe transcription")
+        detector = "probe"
+    if detector == "probe":
+        logging.warning(
+            "Wake mode is running without a local keyword spotter: every window with speech costs a probe transcription"
+        )
+    kwargs = {"transcribe": transcribe} if detector == "probe" else {}
+    return utils.create_backend("wake detector", WAKE_DETECTORS, detector, **kwargs)